@@ -0,0 +1,255 @@
+import os
+import sys
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MEDITATION_RESOURCES_PATH, set_start_hour, set_end_hour
+from utils.partitioned_store import PARTITIONED_TABLES, partition_dir, split_table
+from utils.appointment_archive import archive_dir, archive_appointments
+
+# Deterministic synthetic data for every CSV in config.py, written in the stored
+# (user id) format. `scale` is the target row count of each table: users, the
+# activity tables and the computed 28-day schedule all come out at roughly `scale` rows.
+# Every generated account has the password "password".
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+PASSWORD_HASH = hashlib.sha256("password".encode()).hexdigest()
+SCHEDULE_DAYS = 28
+
+MAJOR_CONDITIONS = {
+    "Emotional Management": ["Anxiety", "Depression", "PTSD", "Bipolar Disorder"],
+    "Behavioral Therapy": ["OCD", "ADHD", "Eating Disorder", "Substance Abuse"],
+    "Severe Disorders": ["Schizophrenia", "Borderline Personality Disorder"],
+    "General Wellbeing": ["Other/General Wellbeing"]
+}
+# Share of patients per condition; anxiety and depression dominate real caseloads
+CONDITION_WEIGHTS = {
+    "Anxiety": 0.26, "Depression": 0.24, "PTSD": 0.06, "Bipolar Disorder": 0.04,
+    "OCD": 0.05, "ADHD": 0.08, "Eating Disorder": 0.04, "Substance Abuse": 0.05,
+    "Schizophrenia": 0.02, "Borderline Personality Disorder": 0.03, "Other/General Wellbeing": 0.13
+}
+MOOD_COLORS = {"Green": 0.25, "Blue": 0.25, "Yellow": 0.22, "Orange": 0.16, "Red": 0.12}
+JOURNAL_WORDS = ("feel anxious tired calm happy sad stressed work sleep family friends "
+                 "better worse today hopeful overwhelmed rest walk talk therapy breathe").split()
+NOTE_CONDITIONS = ["Anxiety", "Depression", "Autism", "Stress"]
+ASSESSMENT_STATUSES = ["Normal", "Anxiety", "Depression", "Depression, Anxiety", "Anxiety, Autism",
+                       "Depression, Anxiety, Autism"]
+# States of a template's free slot on a schedule day: still free, booked, confirmed
+BOOKING_WEIGHTS = {"■": 0.8, "▲": 0.1, "●": 0.1}
+# Share of MHWP days taken as leave
+LEAVE_RATE = 0.03
+
+
+def parse_scale(value):
+    """Accept '1k', '100k', '1m' or a plain row count."""
+    value = str(value).lower()
+    if value in SCALES:
+        return SCALES[value]
+    return int(float(value[:-1]) * 1000) if value.endswith("k") else int(value)
+
+
+def _pick(rng, choices, size):
+    """Draw from a {value: weight} dict."""
+    values = list(choices)
+    weights = np.array(list(choices.values()), dtype=float)
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+
+def _activity(rng, patient_ids, size):
+    """Draw patients for activity rows with a heavy tail: a few patients log most entries."""
+    weights = rng.pareto(1.5, len(patient_ids)) + 1
+    return patient_ids[rng.choice(len(patient_ids), size=size, p=weights / weights.sum())]
+
+
+def _timestamps(rng, now, size, days_back=365):
+    """Timestamps over the last year, during waking hours."""
+    days = rng.integers(0, days_back, size)
+    seconds = rng.integers(7 * 3600, 23 * 3600, size)
+    times = pd.to_datetime(now.date()) - pd.to_timedelta(days, unit="D") + pd.to_timedelta(seconds, unit="s")
+    return pd.Series(times)
+
+
+def _sentences(rng, size, words=6):
+    picks = np.array(JOURNAL_WORDS, dtype=object)[rng.integers(0, len(JOURNAL_WORDS), (size, words))]
+    return pd.Series([" ".join(row) for row in picks])
+
+
+def generate_dataset(data_dir, scale, seed=42, now=None):
+    """
+    Fill data_dir with a synthetic dataset of about `scale` rows per table.
+    The same seed and date always produce the same files.
+    :return: Dict of file name -> row count
+    """
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now()
+    os.makedirs(data_dir, exist_ok=True)
+    slots = [f"{hour:02d}:00-{hour + 1:02d}:00 ({i})" for i, hour in enumerate(range(set_start_hour, set_end_hour))]
+    tables = {}
+
+    # Users: a few admins, one MHWP per 28 schedule rows, everyone else a patient
+    n_mhwps = max(scale // SCHEDULE_DAYS, 4)
+    n_admins = max(scale // 10_000, 1)
+    n_patients = max(scale - n_mhwps - n_admins, 10)
+    roles = np.array(["admin"] * n_admins + ["mhwp"] * n_mhwps + ["patient"] * n_patients, dtype=object)
+    user_ids = np.arange(1, len(roles) + 1)
+    usernames = pd.Series(roles).str.cat(pd.Series(user_ids).astype(str))
+    emails = usernames + "@example.com"
+    tables["user_data.csv"] = pd.DataFrame({
+        "user_id": user_ids, "username": usernames, "password": PASSWORD_HASH, "role": roles,
+        "email": emails, "emergency_email": "contact." + emails
+    })
+
+    mhwp_ids = user_ids[roles == "mhwp"]
+    patient_ids = user_ids[roles == "patient"]
+    registered = _timestamps(rng, now, len(user_ids), days_back=730).dt.strftime("%Y-%m-%d")
+    status = np.where(rng.random(len(user_ids)) < 0.95, "active", "inactive")
+    majors = _pick(rng, {major: len(conditions) for major, conditions in MAJOR_CONDITIONS.items()}, n_mhwps)
+    symptoms = _pick(rng, CONDITION_WEIGHTS, n_patients)
+    for file, ids, extra in (("mhwp.csv", mhwp_ids, {"major": majors}), ("patients.csv", patient_ids, {"symptoms": symptoms})):
+        rows = user_ids.searchsorted(ids)
+        tables[file] = pd.DataFrame({
+            "user_id": ids, "account_status": status[rows], "registration_date": registered.values[rows],
+            "email": emails.values[rows], "emergency_email": "contact." + emails.values[rows], **extra
+        })
+
+    # Assignments: 90% of patients, each to a random MHWP whose major covers their condition
+    assigned_mhwp = np.zeros(n_patients, dtype=np.int64)
+    for major, conditions in MAJOR_CONDITIONS.items():
+        candidates = mhwp_ids[majors == major]
+        if not len(candidates):
+            candidates = mhwp_ids
+        matching = np.isin(symptoms, conditions)
+        assigned_mhwp[matching] = candidates[rng.integers(0, len(candidates), matching.sum())]
+    assigned = rng.random(n_patients) < 0.9
+    tables["assignments.csv"] = pd.DataFrame({"patient_id": patient_ids[assigned], "mhwp_id": assigned_mhwp[assigned]})
+    mhwp_of = dict(zip(patient_ids[assigned], assigned_mhwp[assigned]))
+    assigned_ids = patient_ids[assigned]
+
+    # Weekly templates, and the next 28 days as leave and bookings on top of them
+    template_glyphs = _pick(rng, {"■": 0.75, "□": 0.25}, (n_mhwps * 7, len(slots)))
+    template = pd.DataFrame(template_glyphs, columns=slots)
+    template.insert(0, "weekday", np.tile(np.arange(7), n_mhwps))
+    template.insert(0, "mhwp_id", np.repeat(mhwp_ids, 7))
+    tables["mhwp_schedule_template.csv"] = template
+
+    days = pd.date_range(pd.Timestamp(now.date()), periods=SCHEDULE_DAYS, freq="D")
+    base = template_glyphs.reshape(n_mhwps, 7, len(slots))[:, days.weekday, :]
+    glyphs = base.copy()
+    glyphs[rng.random((n_mhwps, SCHEDULE_DAYS)) < LEAVE_RATE] = "□"
+    draws = _pick(rng, BOOKING_WEIGHTS, glyphs.shape)
+    booked = (glyphs == "■") & (draws != "■")
+    glyphs[booked] = draws[booked]
+
+    # Appointments: the past half year plus the booked slots of the schedule
+    n_past = max(scale - int(np.isin(glyphs, ["▲", "●"]).sum()), 0)
+    past_patients = _activity(rng, assigned_ids, n_past)
+    past_dates = pd.Timestamp(now.date()) - pd.to_timedelta(rng.integers(1, 180, n_past), unit="D")
+    past = pd.DataFrame({
+        "patient_id": past_patients,
+        "mhwp_id": pd.Series(past_patients).map(mhwp_of).values,
+        "date": past_dates.strftime("%Y/%m/%d"),
+        "timeslot": np.array([slot.split(" ")[0] for slot in slots], dtype=object)[rng.integers(0, len(slots), n_past)],
+        "status": _pick(rng, {"completed": 0.78, "cancelled": 0.22}, n_past)
+    })
+    m, d, s = np.nonzero(np.isin(glyphs, ["▲", "●"]))
+    caseloads = pd.Series(assigned_ids).groupby(pd.Series(assigned_ids).map(mhwp_of)).apply(list).to_dict()
+    upcoming_patients = [caseloads[mhwp_ids[i]][rng.integers(0, len(caseloads[mhwp_ids[i]]))]
+                         if mhwp_ids[i] in caseloads else None for i in m]
+    upcoming = pd.DataFrame({
+        "patient_id": upcoming_patients,
+        "mhwp_id": mhwp_ids[m],
+        "date": days[d].strftime("%Y/%m/%d"),
+        "timeslot": np.array([slot.split(" ")[0] for slot in slots], dtype=object)[s],
+        "status": np.where(glyphs[m, d, s] == "●", "confirmed", "pending")
+    })
+    # A booked slot without any patient in the MHWP's caseload is simply left free
+    glyphs[m[upcoming["patient_id"].isna().values], d[upcoming["patient_id"].isna().values],
+           s[upcoming["patient_id"].isna().values]] = "■"
+    appointments = pd.concat([past, upcoming.dropna(subset=["patient_id"])], ignore_index=True)
+    appointments = appointments.sort_values("date", kind="stable").reset_index(drop=True)
+    appointments.insert(0, "id", np.arange(1, len(appointments) + 1))
+    appointments["patient_id"] = appointments["patient_id"].astype("int64")
+    tables["appointments.csv"] = appointments
+
+    # Only the slots that differ from the template are stored (see utils/schedule_store.py)
+    em, ed, es = np.nonzero(glyphs != base)
+    tables["mhwp_schedule_exceptions.csv"] = pd.DataFrame({
+        "mhwp_id": mhwp_ids[em], "Date": days[ed].strftime("%Y/%m/%d"),
+        "slot": np.array(slots, dtype=object)[es], "value": glyphs[em, ed, es]
+    })
+
+    # Activity tables, skewed towards a minority of very active patients
+    mood_patients = _activity(rng, patient_ids, scale)
+    tables["mood_data.csv"] = pd.DataFrame({
+        "user_id": mood_patients, "color_code": _pick(rng, MOOD_COLORS, scale),
+        "comments": _sentences(rng, scale, 4), "timestamp": _timestamps(rng, now, scale).dt.strftime("%Y-%m-%d %H:%M:%S")
+    }).sort_values("timestamp", kind="stable")
+    tables["patient_journaling.csv"] = pd.DataFrame({
+        "patient_id": _activity(rng, patient_ids, scale), "entry": _sentences(rng, scale, 12),
+        "timestamp": _timestamps(rng, now, scale).dt.strftime("%Y-%m-%d %H:%M:%S")
+    }).sort_values("timestamp", kind="stable")
+
+    assessed = _activity(rng, assigned_ids, scale)
+    tables["mental_assessments.csv"] = pd.DataFrame({
+        "patient_id": assessed, "mhwp_id": pd.Series(assessed).map(mhwp_of).values,
+        "date": _timestamps(rng, now, scale).dt.strftime("%Y-%m-%d"),
+        "score": rng.binomial(45, 0.5, scale),
+        "status": _pick(rng, {status: 1 for status in ASSESSMENT_STATUSES}, scale)
+    }).sort_values("date", kind="stable")
+
+    # Notes and comments belong to completed appointments
+    completed = past[past["status"] == "completed"].merge(appointments[["id", "patient_id", "date", "timeslot"]],
+                                                          on=["patient_id", "date", "timeslot"])
+    completed = completed.drop_duplicates("id")
+    noted = completed.sample(n=min(scale, len(completed)), random_state=seed)
+    tables["patient_notes.csv"] = pd.DataFrame({
+        "patient_id": noted["patient_id"].values, "mhwp_id": noted["mhwp_id"].values,
+        "date": pd.to_datetime(noted["date"], format="%Y/%m/%d").dt.strftime("%Y-%m-%d").values,
+        "condition": np.array(NOTE_CONDITIONS, dtype=object)[rng.integers(0, len(NOTE_CONDITIONS), len(noted))],
+        "notes": _sentences(rng, len(noted), 10).values, "id": noted["id"].values
+    })
+    rated = completed.sample(n=min(scale, len(completed) // 2), random_state=seed + 1)
+    start = pd.to_datetime(rated["date"] + " " + rated["timeslot"].str.split("-").str[0], format="%Y/%m/%d %H:%M")
+    tables["comments.csv"] = pd.DataFrame({
+        "patient_id": rated["patient_id"].values, "mhwp_id": rated["mhwp_id"].values,
+        "rating": np.clip(np.round(rng.normal(4.1, 0.9, len(rated))), 0, 5),
+        "comment": _sentences(rng, len(rated), 8).values,
+        "timestamp": (start + pd.Timedelta(hours=2)).dt.strftime("%Y-%m-%d %H:%M:%S").values,
+        "appointment_id": rated["id"].values,
+        "appointment_datetime": start.dt.strftime("%Y-%m-%d %H:%M:%S").values
+    })
+
+    for file, df in tables.items():
+        df.to_csv(os.path.join(data_dir, file), index=False)
+    # Time-series tables are stored in monthly partitions, as after migration
+    for file in PARTITIONED_TABLES:
+        shutil.rmtree(partition_dir(os.path.join(data_dir, file)), ignore_errors=True)
+        split_table(os.path.join(data_dir, file))
+    # Cancelled, completed and past appointments are archived, as after the first archival run
+    shutil.rmtree(archive_dir(os.path.join(data_dir, "appointments.csv")), ignore_errors=True)
+    archive_appointments(os.path.join(data_dir, "appointments.csv"), today=now.date())
+    shutil.copy2(MEDITATION_RESOURCES_PATH, os.path.join(data_dir, "meditation_resources.csv"))
+    # A generated schedule left from an older layout would be migrated over the new exceptions
+    if os.path.exists(os.path.join(data_dir, "mhwp_schedule.csv")):
+        os.remove(os.path.join(data_dir, "mhwp_schedule.csv"))
+    # Derived files are rebuilt from the tables on first use
+    for derived in ("mhwp_capacity.csv", "last_assessment.csv", "completed_appointments.csv", "record_index.pkl",
+                    "comments.idx", "mental_assessments.idx"):
+        if os.path.exists(os.path.join(data_dir, derived)):
+            os.remove(os.path.join(data_dir, derived))
+    return {file: len(df) for file, df in tables.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Breeze dataset.")
+    parser.add_argument("data_dir")
+    parser.add_argument("--scale", default="1k", help="Rows per table: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for file, rows in generate_dataset(args.data_dir, parse_scale(args.scale), args.seed).items():
+        print(f"{file}: {rows} rows")
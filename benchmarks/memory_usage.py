@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ROOT_DIR)
+
+# Compares the in-memory size of the largest tables (appointments with its archive) loaded two ways:
+#   "strings":     pd.read_csv with user ids mapped to plain username strings, as the
+#                  tables were loaded before username/status/colour columns became categorical;
+#   "categorical": read_partitioned/read_appointments, with the table schemas and the
+#                  shared username categories.
+# Username columns hold int32 codes into one dictionary of all usernames; a table is
+# charged for its codes, and the dictionary is reported once, since every table shares it.
+# Also times an equality filter on a username column, the most common query on these tables.
+#
+#   python benchmarks/memory_usage.py --scale 1m
+
+TABLES = {"mood_data.csv": "username", "appointments.csv": "patient_username"}
+
+
+def _strings_table(file_path):
+    import pandas as pd
+    from utils.data_store import FOREIGN_KEYS
+    from utils.user_directory import load_directory
+    from utils.partitioned_store import table_files
+    from utils.appointment_archive import archive_files
+
+    id_to_username = load_directory()[0]
+    paths = table_files(file_path)
+    if os.path.basename(file_path) == "appointments.csv":
+        paths += archive_files(file_path)
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    for key, name in FOREIGN_KEYS.items():
+        if key in df.columns:
+            df[key] = df[key].map(id_to_username).astype(object)
+    return df.rename(columns=FOREIGN_KEYS)
+
+
+def _table_bytes(df, shared_dtype):
+    """Deep memory use of a table, counting only the codes of columns that use the shared username categories."""
+    return int(sum(
+        df[column].cat.codes.memory_usage(index=False) if df[column].dtype == shared_dtype
+        else df[column].memory_usage(index=False, deep=True)
+        for column in df.columns
+    ) + df.index.memory_usage())
+
+
+def _filter_seconds(df, column, value, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        (df[column] == value).sum()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure(dataset_dir):
+    """Measure every table in TABLES. BREEZE_DATA_DIR must point at dataset_dir before config is imported."""
+    from utils.user_directory import load_username_categories
+    from utils.partitioned_store import PARTITIONED_TABLES, read_partitioned
+    from utils.appointment_archive import read_appointments
+
+    shared_dtype = load_username_categories()[0]
+    results = {"shared_username_categories": {"bytes": int(shared_dtype.categories.memory_usage(deep=True))}}
+    for table, column in TABLES.items():
+        file_path = os.path.join(dataset_dir, table)
+        loaders = {"strings": _strings_table,
+                   "categorical": read_partitioned if table in PARTITIONED_TABLES else read_appointments}
+        results[table] = {"rows": 0}
+        for variant, loader in loaders.items():
+            df = loader(file_path)
+            value = df[column].dropna().iloc[0]
+            results[table]["rows"] = len(df)
+            results[table][variant] = {
+                "bytes": _table_bytes(df, shared_dtype),
+                "filter_seconds": _filter_seconds(df, column, value)
+            }
+            del df
+    return results
+
+
+def print_results(results):
+    from tabulate import tabulate
+
+    rows = []
+    tables = {table: result for table, result in results.items() if "rows" in result}
+    for table, result in tables.items():
+        before, after = result["strings"], result["categorical"]
+        rows.append([table, result["rows"], f"{before['bytes'] / 2 ** 20:.1f}", f"{after['bytes'] / 2 ** 20:.1f}",
+                     f"{before['bytes'] / after['bytes']:.1f}x",
+                     f"{before['filter_seconds'] * 1000:.1f}", f"{after['filter_seconds'] * 1000:.1f}"])
+    print(tabulate(rows, headers=["Table", "Rows", "Strings MiB", "Categorical MiB", "Smaller by",
+                                  "Strings filter ms", "Categorical filter ms"], tablefmt="grid"))
+    shared_bytes = results["shared_username_categories"]["bytes"]
+    print(f"Username categories shared by all tables: {shared_bytes / 2 ** 20:.1f} MiB, held once per process")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare table memory use with string and categorical columns.")
+    parser.add_argument("--scale", default="1m", help="Rows per table: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-root", default=os.path.join(BENCHMARK_DIR, "data"), help="Where generated datasets are kept")
+    parser.add_argument("--output", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    dataset_dir = os.path.abspath(os.path.join(args.data_root, f"{args.scale}-seed{args.seed}"))
+    os.environ["BREEZE_DATA_DIR"] = dataset_dir
+    from benchmarks.generate_data import parse_scale, generate_dataset
+    if not os.path.exists(os.path.join(dataset_dir, "user_data.csv")):
+        print(f"Generating {args.scale} dataset in {dataset_dir} ...")
+        generate_dataset(dataset_dir, parse_scale(args.scale), args.seed)
+
+    results = measure(dataset_dir)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"scale": args.scale, "seed": args.seed, "tables": results}, file, indent=2)
+        print(f"\nResults saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
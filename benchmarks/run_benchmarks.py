@@ -0,0 +1,293 @@
+import os
+import io
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ROOT_DIR)
+
+# Times the main user actions against generated datasets (see generate_data.py).
+# Each scale runs in its own process on a scratch copy of the dataset, with
+# BREEZE_DATA_DIR pointing the application at it, so the dataset stays pristine
+# and module-level caches start cold. CSV reads and writes are counted per benchmark,
+# and any I/O budget violation (see utils/instrumentation.py) fails the run.
+#
+#   python benchmarks/run_benchmarks.py --scales 1k 100k --repeat 3
+#   python benchmarks/run_benchmarks.py --scales 1k --compare benchmarks/results/<previous>.json
+
+
+def _last_appointment_id(appointments_path):
+    from utils.data_store import read_table
+    return int(read_table(appointments_path, usecols=["id"])["id"].max())
+
+
+def prepare_context():
+    """Pick the users and slots the benchmarks act on. Runs once, untimed."""
+    from config import SCHEDULE_DATA_PATH, ASSIGNMENTS_DATA_PATH
+    from utils.schedule_store import read_schedule
+    from utils.assignment_store import get_assignments_by_mhwp
+
+    caseloads = get_assignments_by_mhwp(ASSIGNMENTS_DATA_PATH)
+    busiest_mhwp = max(caseloads, key=lambda mhwp: len(caseloads[mhwp]))
+    schedule = read_schedule(SCHEDULE_DATA_PATH, caseloads.keys())
+    slot_columns = [col for col in schedule.columns if "(" in col]
+    # The first free slot of an MHWP with patients; booking then cancelling frees it again
+    for _, row in schedule.iterrows():
+        free = [col for col in slot_columns if row[col] == "■"]
+        if free:
+            return {
+                "patient": sorted(caseloads[row["mhwp_username"]])[0],
+                "mhwp": busiest_mhwp,
+                "date": row["Date"],
+                "timeslot": free[0].split(" ")[0]
+            }
+    raise RuntimeError("The dataset has no free schedule slot to book.")
+
+
+def bench_login(ctx):
+    from model.user_account_management.user import User
+    user = User(ctx["patient"], "password", "temp")
+    assert user.load_from_csv()
+
+
+def bench_booking(ctx):
+    from config import SCHEDULE_DATA_PATH, ASSIGNMENTS_DATA_PATH, APPOINTMENTS_DATA_PATH
+    from model.user_account_management.user import User
+    from model.patient_management.appointment import book_appointment
+    user = User(ctx["patient"], "password", "patient")
+    assert book_appointment(user, ctx["date"], ctx["timeslot"], SCHEDULE_DATA_PATH, ASSIGNMENTS_DATA_PATH, APPOINTMENTS_DATA_PATH)
+
+
+def setup_cancellation(ctx):
+    from config import APPOINTMENTS_DATA_PATH
+    ctx["appointment_id"] = _last_appointment_id(APPOINTMENTS_DATA_PATH)
+
+
+def bench_cancellation(ctx):
+    from config import SCHEDULE_DATA_PATH, APPOINTMENTS_DATA_PATH
+    from model.user_account_management.user import User
+    from model.patient_management.appointment import cancel_appointment
+    user = User(ctx["patient"], "password", "patient")
+    assert cancel_appointment(user, ctx["appointment_id"], SCHEDULE_DATA_PATH, APPOINTMENTS_DATA_PATH)
+
+
+def bench_next_free_slot(ctx):
+    from model.admin_management.slot_search import find_next_free_slots
+    assert find_next_free_slots("Anxiety", count=10)
+
+
+def bench_schedule_rollover(ctx):
+    from model.mhwp_management.mhwp_schedule import update_mhwp_schedules
+    update_mhwp_schedules(silent=True)
+
+
+def bench_appointment_archival(ctx):
+    from utils.appointment_archive import archive_appointments
+    archive_appointments()
+
+
+def bench_completion_sweep(ctx):
+    from services.appointment_completion import complete_past_appointments
+    complete_past_appointments()
+
+
+def bench_mood_entry(ctx):
+    from services.mood_tracking import MoodEntry
+    with redirect_stdout(io.StringIO()):
+        assert MoodEntry(ctx["patient"], "2", "benchmark entry").save_mood_entry()
+    assert not MoodEntry.get_user_mood_history(ctx["patient"], limit=5).empty
+
+
+def bench_dashboard_summary(ctx):
+    from services.dashboard import generate_summary
+    assert not generate_summary(ctx["mhwp"]).empty
+
+
+def bench_admin_summary(ctx):
+    from services.summary import calculate_mhwp_patient_counts, get_bookings, load_appointments
+    calculate_mhwp_patient_counts()
+    today = datetime.now()
+    get_bookings(load_appointments(), today - timedelta(days=30), today, "Separate statistics")
+
+
+def bench_meditation_search(ctx):
+    from services.meditation import search_meditation
+    search_meditation("trouble sleeping and anxiety")
+
+
+def bench_model_training(ctx):
+    from services.trainModal import train_modal
+    train_modal()
+
+
+# name -> (untimed setup or None, timed action); run in this order on every repeat
+BENCHMARKS = {
+    "login": (None, bench_login),
+    "booking": (None, bench_booking),
+    "cancellation": (setup_cancellation, bench_cancellation),
+    "next_free_slot": (None, bench_next_free_slot),
+    "schedule_rollover": (None, bench_schedule_rollover),
+    "completion_sweep": (None, bench_completion_sweep),
+    "appointment_archival": (None, bench_appointment_archival),
+    "mood_entry": (None, bench_mood_entry),
+    "dashboard_summary": (None, bench_dashboard_summary),
+    "admin_summary": (None, bench_admin_summary),
+    "meditation_search": (None, bench_meditation_search),
+    "model_training": (None, bench_model_training)
+}
+
+
+def _io_per_call(stats):
+    calls = stats["calls"]
+    return {
+        "reads": stats["reads"] / calls,
+        "writes": stats["writes"] / calls,
+        "tables": {
+            table: {kind: count / calls for kind, count in counts.items()}
+            for table, counts in sorted(stats["tables"].items())
+        }
+    }
+
+
+def run_worker(repeat, only=None):
+    """Run the benchmarks in this process against BREEZE_DATA_DIR and return their timings and I/O counts."""
+    from utils.instrumentation import enable_instrumentation, instrument, get_stats, get_budget_violations
+
+    enable_instrumentation(strict=False)
+    runs = {name: [] for name in BENCHMARKS if not only or name in only}
+    errors = {}
+    with redirect_stdout(io.StringIO()):
+        ctx = prepare_context()
+        for _ in range(repeat):
+            for name in runs:
+                setup, action = BENCHMARKS[name]
+                action = instrument(action, name=name)
+                try:
+                    if setup:
+                        setup(ctx)
+                    start = time.perf_counter()
+                    action(ctx)
+                    runs[name].append(time.perf_counter() - start)
+                except Exception as e:
+                    errors[name] = f"{type(e).__name__}: {e}"
+    timings = {
+        name: {"runs": times, "min": min(times), "median": statistics.median(times)}
+        for name, times in runs.items() if times
+    }
+    stats = get_stats()
+    io_counts = {name: _io_per_call(stats[name]) for name in runs if stats.get(name, {}).get("calls")}
+    return {"timings": timings, "io": io_counts, "budget_violations": sorted(set(get_budget_violations())),
+            "errors": errors}
+
+
+def run_scale(label, scale, repeat, seed, data_root, regenerate=False, only=None):
+    """Generate (or reuse) the dataset for a scale and benchmark it in a fresh process."""
+    from benchmarks.generate_data import generate_dataset
+
+    dataset_dir = os.path.join(data_root, f"{label}-seed{seed}")
+    if regenerate or not os.path.exists(os.path.join(dataset_dir, "user_data.csv")):
+        print(f"Generating {label} dataset in {dataset_dir} ...")
+        generate_dataset(dataset_dir, scale, seed)
+
+    rows = {}
+    for file in sorted(os.listdir(dataset_dir)):
+        if file.endswith(".csv"):
+            with open(os.path.join(dataset_dir, file), "rb") as f:
+                rows[file] = sum(1 for _ in f) - 1
+        elif os.path.exists(os.path.join(dataset_dir, file, "manifest.csv")):
+            # Monthly partitions of a time-series table
+            with open(os.path.join(dataset_dir, file, "manifest.csv"), "r", encoding="utf-8") as f:
+                rows[f"{file}.csv"] = sum(int(entry["rows"]) for entry in csv.DictReader(f))
+
+    scratch_dir = tempfile.mkdtemp(prefix=f"breeze-bench-{label}-")
+    try:
+        shutil.copytree(dataset_dir, scratch_dir, dirs_exist_ok=True)
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "--repeat", str(repeat)]
+        if only:
+            command += ["--only", *only]
+        result = subprocess.run(command, cwd=ROOT_DIR, capture_output=True, text=True,
+                                env={**os.environ, "BREEZE_DATA_DIR": scratch_dir})
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark worker for {label} failed:\n{result.stderr}")
+    return {"scale": scale, "rows": rows, **json.loads(result.stdout.strip().splitlines()[-1])}
+
+
+def print_results(results, baseline=None):
+    for label, result in results["scales"].items():
+        base = (baseline or {}).get("scales", {}).get(label, {}).get("timings", {})
+        print(f"\nScale {label} ({result['scale']} rows per table)")
+        for name, timing in result["timings"].items():
+            line = f"  {name:<20} median {timing['median'] * 1000:10.1f} ms   min {timing['min'] * 1000:10.1f} ms"
+            io_counts = result.get("io", {}).get(name)
+            if io_counts:
+                line += f"   {io_counts['reads']:5.1f} reads {io_counts['writes']:4.1f} writes"
+            if name in base:
+                line += f"   {timing['median'] / base[name]['median']:6.2f}x baseline"
+            print(line)
+        for message in result.get("budget_violations", []):
+            print(f"  I/O budget exceeded: {message}")
+        for name, error in result["errors"].items():
+            print(f"  {name:<20} FAILED: {error}")
+
+
+def main():
+    from benchmarks.generate_data import parse_scale
+
+    parser = argparse.ArgumentParser(description="Benchmark Breeze user actions at several data scales.")
+    parser.add_argument("--scales", nargs="+", default=["1k"], help="Rows per table: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--data-root", default=os.path.join(BENCHMARK_DIR, "data"), help="Where generated datasets are kept")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate datasets even if they exist")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeat, args.only)))
+        return 0
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "scales": {}
+    }
+    for label in args.scales:
+        results["scales"][label] = run_scale(label, parse_scale(label), args.repeat, args.seed,
+                                             args.data_root, args.regenerate, args.only)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    print(f"\nResults saved to {output}")
+    failed = any(result["errors"] or result["budget_violations"] for result in results["scales"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+import os
+import sys
+import argparse
+from tabulate import tabulate
+from config import *
+
+
+# Batch interface for admin and maintenance work. Every command calls the same
+# functions as the interactive menus, without prompts, so it can be scripted:
+#   breeze admin assign --balanced
+#   breeze users import new_users.csv
+#   breeze schedule rollover
+#   breeze jobs run
+# (or `python main.py ...` / `python cli.py ...` when running from source)
+
+
+def _read_usernames(names, from_file):
+    """Collect usernames from the command line and/or a file with one username per line."""
+    usernames = list(names)
+    if from_file:
+        with open(from_file, "r", encoding="utf-8") as file:
+            usernames.extend(line.strip() for line in file if line.strip())
+    return usernames
+
+
+def cmd_admin_assign(args):
+    from model.admin_management import balanced_assign_patients_and_mhwps, record_assignment_changes
+    from utils.data_store import read_table
+
+    if args.balanced:
+        balanced_assign_patients_and_mhwps(weight_by_schedule=args.weighted)
+        return 0
+    if not args.patient or not args.mhwp:
+        print("Use --balanced, or give both --patient and --mhwp.")
+        return 1
+    roles = read_table(USER_DATA_PATH).set_index("username")["role"]
+    if roles.get(args.patient) != "patient" or roles.get(args.mhwp) != "mhwp":
+        print("Unknown patient or MHWP.")
+        return 1
+    record_assignment_changes({args.patient: args.mhwp})
+    return 0
+
+
+def cmd_admin_reassign(args):
+    from model.admin_management import reassign_caseload, get_mhwps_with_major
+
+    mhwps = get_mhwps_with_major()
+    for mhwp in (args.from_mhwp, args.to_mhwp):
+        if mhwp not in mhwps:
+            print(f"MHWP '{mhwp}' does not exist.")
+            return 1
+    if args.from_mhwp == args.to_mhwp:
+        print("Give two different MHWPs.")
+        return 1
+    changes = reassign_caseload(args.from_mhwp, args.to_mhwp)
+    print(f"Reassigned {len(changes)} patients from '{args.from_mhwp}' to '{args.to_mhwp}'.")
+    return 0
+
+
+def cmd_admin_compact(args):
+    from model.admin_management import compact_assignment_store
+
+    compact_assignment_store()
+    print("Assignment store compacted.")
+    return 0
+
+
+def cmd_admin_assignments(args):
+    from model.admin_management import display_assignments, display_unassigned_users
+
+    if args.unassigned:
+        display_unassigned_users()
+    else:
+        display_assignments()
+    return 0
+
+
+def cmd_admin_capacity(args):
+    from model.admin_management import display_mhwp_capacity
+
+    display_mhwp_capacity()
+    return 0
+
+
+def cmd_users_list(args):
+    from utils.data_store import read_table
+
+    path = PATIENTS_DATA_PATH if args.role == "patient" else MHWP_DATA_PATH
+    df = read_table(path)
+    if args.status:
+        df = df[df["account_status"] == args.status]
+    print(tabulate(df.drop(columns=["email", "emergency_email"], errors="ignore"),
+                   headers="keys", tablefmt="grid", showindex=False))
+    print(f"{len(df)} {args.role} accounts.")
+    return 0
+
+
+def cmd_users_import(args):
+    from services.registration import import_users
+
+    return 0 if import_users(args.file) else 1
+
+
+def cmd_users_status(args):
+    from model.user_account_management.user_data_manage import set_account_status
+
+    usernames = _read_usernames(args.usernames, args.file)
+    if not usernames:
+        print("No usernames given.")
+        return 1
+    updated, skipped = set_account_status(usernames, args.status)
+    print(f"Set {len(updated)} accounts to {args.status}.")
+    if skipped:
+        print(f"Skipped {len(skipped)} (unknown, admin or already {args.status}): {', '.join(skipped)}")
+    return 0
+
+
+def cmd_schedule_rollover(args):
+    from model.mhwp_management.mhwp_schedule import update_mhwp_schedules
+
+    update_mhwp_schedules()
+    return 0
+
+
+def cmd_schedule_leave(args):
+    from model.mhwp_management.bulk_availability import apply_bulk_availability, print_conflicts, AVAILABLE, UNAVAILABLE
+
+    mhwps = _read_usernames(args.mhwps, args.file) or None
+    if mhwps is None and not args.all:
+        print("Give MHWP usernames (or --file), or --all for the whole clinic.")
+        return 1
+    try:
+        changed, conflicts = apply_bulk_availability(mhwps, args.start.replace("-", "/"), args.end.replace("-", "/"),
+                                                     slots=args.slots, weekdays=args.weekdays,
+                                                     value=AVAILABLE if args.open else UNAVAILABLE)
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"{changed} slots marked {'available' if args.open else 'unavailable'}.")
+    print_conflicts(conflicts)
+    return 0
+
+
+def cmd_schedule_holidays(args):
+    from model.mhwp_management.bulk_availability import apply_holidays, print_conflicts
+
+    try:
+        changed, conflicts = apply_holidays(args.calendar, _read_usernames(args.mhwps, None) or None)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        return 1
+    print(f"{changed} slots closed for holidays.")
+    print_conflicts(conflicts)
+    return 0
+
+
+def cmd_schedule_next_free(args):
+    from model.admin_management.slot_search import (
+        eligible_mhwps, find_next_free_slots, display_next_free_slots, parse_search_time
+    )
+
+    try:
+        after = parse_search_time(args.after or "")
+    except ValueError as e:
+        print(e)
+        return 1
+    mhwps = _read_usernames(args.mhwps, None) or eligible_mhwps(args.symptom)
+    if not mhwps:
+        print(f"No eligible MHWPs found for symptom '{args.symptom}'.")
+        return 1
+    display_next_free_slots(find_next_free_slots(after=after, count=args.count, mhwps=mhwps))
+    return 0
+
+
+def cmd_schedule_capacity(args):
+    from model.mhwp_management.mhwp_capacity import refresh_capacity
+    from utils.schedule_store import read_schedule
+
+    refresh_capacity(read_schedule(SCHEDULE_DATA_PATH))
+    print("MHWP capacity summary rebuilt.")
+    return 0
+
+
+def cmd_data_migrate(args):
+    from utils.migrate_user_ids import migrate_to_user_ids
+    from utils.migrate_partitions import migrate_to_partitions
+    from utils.migrate_schedule import migrate_to_schedule_exceptions
+
+    migrated = migrate_to_user_ids(DATA_DIR)
+    migrated += migrate_to_partitions(DATA_DIR)
+    migrated += migrate_to_schedule_exceptions(DATA_DIR)
+    if not migrated:
+        print("Data files are already up to date.")
+    return 0
+
+
+def cmd_data_reindex(args):
+    from services.questionnaire import rebuild_last_assessment_index
+    from services.record_search import update_record_index
+    from services.appointment_completion import rebuild_completed_index
+
+    rebuild_last_assessment_index()
+    update_record_index()
+    rebuild_completed_index()
+    print("Assessment, record search and completed appointment indexes rebuilt.")
+    return 0
+
+
+def cmd_data_verify_offsets(args):
+    from utils.offset_index import verify_offset_indexes
+
+    results = verify_offset_indexes(DATA_DIR)
+    rows = [[os.path.relpath(path, DATA_DIR), status] for path, status in results.items()]
+    print(tabulate(rows, headers=["File", "Offset index"], tablefmt="grid"))
+    # "behind" and "missing" indexes catch up on their next use; only a mismatch is an error
+    return 1 if "mismatch" in results.values() else 0
+
+
+def cmd_data_rebuild_offsets(args):
+    from utils.offset_index import rebuild_offset_indexes
+
+    print(f"Byte-offset indexes rebuilt for {rebuild_offset_indexes(DATA_DIR)} files.")
+    return 0
+
+
+def cmd_jobs_list(args):
+    from services.maintenance import register_maintenance_jobs
+    from utils.scheduler import get_jobs
+
+    register_maintenance_jobs()
+    rows = [[name, f"{job['interval'] // 60} min", f"{job['jitter']:.0%}"] for name, job in get_jobs().items()]
+    print(tabulate(rows, headers=["Job", "Interval", "Jitter"], tablefmt="grid"))
+    return 0
+
+
+def cmd_jobs_run(args):
+    from services.maintenance import register_maintenance_jobs
+    from utils.scheduler import get_jobs, run_job, get_job_stats
+
+    register_maintenance_jobs()
+    names = args.names or list(get_jobs())
+    unknown = [name for name in names if name not in get_jobs()]
+    if unknown:
+        print(f"Unknown jobs: {', '.join(unknown)}")
+        return 1
+    ok = all([run_job(name) for name in names])
+    stats = get_job_stats()
+    rows = [[name, "skipped (locked)" if stats[name]["skipped"] else stats[name]["last_error"] or "ok",
+             f"{stats[name]['last_seconds'] * 1000:.1f}"] for name in names]
+    print(tabulate(rows, headers=["Job", "Result", "ms"], tablefmt="grid"))
+    return 0 if ok else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="breeze", description="Breeze Mental Health System batch commands.")
+    groups = parser.add_subparsers(dest="group", required=True)
+
+    # admin: assignments and capacity
+    admin = groups.add_parser("admin", help="Patient/MHWP assignments").add_subparsers(dest="command", required=True)
+    assign = admin.add_parser("assign", help="Assign patients to MHWPs")
+    assign.add_argument("--balanced", action="store_true", help="Assign all unassigned patients by load")
+    assign.add_argument("--weighted", action="store_true", help="With --balanced, weight load by free schedule hours")
+    assign.add_argument("--patient", help="Assign a single patient")
+    assign.add_argument("--mhwp", help="MHWP for --patient")
+    assign.set_defaults(func=cmd_admin_assign)
+    reassign = admin.add_parser("reassign", help="Move a whole caseload to another MHWP")
+    reassign.add_argument("from_mhwp")
+    reassign.add_argument("to_mhwp")
+    reassign.set_defaults(func=cmd_admin_reassign)
+    admin.add_parser("compact", help="Fold the assignment log to one row per patient").set_defaults(func=cmd_admin_compact)
+    assignments = admin.add_parser("assignments", help="Show current assignments")
+    assignments.add_argument("--unassigned", action="store_true", help="Show unassigned users instead")
+    assignments.set_defaults(func=cmd_admin_assignments)
+    admin.add_parser("capacity", help="Show MHWP capacity").set_defaults(func=cmd_admin_capacity)
+
+    # users: accounts
+    users = groups.add_parser("users", help="User accounts").add_subparsers(dest="command", required=True)
+    listing = users.add_parser("list", help="List patient or MHWP accounts")
+    listing.add_argument("role", choices=["patient", "mhwp"])
+    listing.add_argument("--status", choices=["active", "inactive"])
+    listing.set_defaults(func=cmd_users_list)
+    importing = users.add_parser("import", help="Register users from a CSV file")
+    importing.add_argument("file", help="CSV with username,password,role,email[,emergency_email,symptoms,major]")
+    importing.set_defaults(func=cmd_users_import)
+    for status, verb in (("inactive", "deactivate"), ("active", "activate")):
+        command = users.add_parser(verb, help=f"Set accounts to {status}")
+        command.add_argument("usernames", nargs="*")
+        command.add_argument("--file", help="File with one username per line")
+        command.set_defaults(func=cmd_users_status, status=status)
+
+    # schedule: rolling schedule maintenance
+    schedule = groups.add_parser("schedule", help="MHWP schedules").add_subparsers(dest="command", required=True)
+    schedule.add_parser("rollover", help="Drop past schedule exceptions and rebuild capacity").set_defaults(func=cmd_schedule_rollover)
+    schedule.add_parser("capacity", help="Rebuild the MHWP capacity summary").set_defaults(func=cmd_schedule_capacity)
+    leave = schedule.add_parser("leave", help="Mark slots unavailable (or available) over a date range")
+    leave.add_argument("mhwps", nargs="*", help="MHWP usernames")
+    leave.add_argument("--file", help="File with one MHWP username per line")
+    leave.add_argument("--all", action="store_true", help="Every MHWP in the clinic")
+    leave.add_argument("--from", dest="start", required=True, help="First date, YYYY/MM/DD")
+    leave.add_argument("--to", dest="end", required=True, help="Last date, YYYY/MM/DD")
+    leave.add_argument("--slots", nargs="+", help="Slot indexes or times, e.g. 0 1 or 09:00 (default: all)")
+    leave.add_argument("--weekdays", nargs="+", help="Only these days, e.g. Monday Friday")
+    leave.add_argument("--open", action="store_true", help="Mark the slots available instead")
+    leave.set_defaults(func=cmd_schedule_leave)
+    holidays = schedule.add_parser("holidays", help="Close every slot on the dates of a holiday calendar")
+    holidays.add_argument("calendar", help="File with one date (YYYY/MM/DD) per line, optionally followed by ,name")
+    holidays.add_argument("mhwps", nargs="*", help="Only these MHWPs (default: the whole clinic)")
+    holidays.set_defaults(func=cmd_schedule_holidays)
+    next_free = schedule.add_parser("next-free", help="Find the earliest available slots across MHWPs")
+    next_free.add_argument("mhwps", nargs="*", help="Only these MHWPs (default: those eligible for --symptom)")
+    next_free.add_argument("--symptom", help="Patient symptom, e.g. Anxiety (default: every MHWP)")
+    next_free.add_argument("--after", help="Earliest slot start, YYYY/MM/DD [HH:MM] (default: now)")
+    next_free.add_argument("-n", dest="count", type=int, default=10, help="Number of slots (default: 10)")
+    next_free.set_defaults(func=cmd_schedule_next_free)
+
+    # data: file maintenance
+    data = groups.add_parser("data", help="Data file maintenance").add_subparsers(dest="command", required=True)
+    data.add_parser("migrate", help="Move data files to user ids and monthly partitions").set_defaults(func=cmd_data_migrate)
+    data.add_parser("reindex", help="Rebuild derived indexes").set_defaults(func=cmd_data_reindex)
+    data.add_parser("verify-offsets", help="Check the byte-offset indexes of the history tables").set_defaults(func=cmd_data_verify_offsets)
+    data.add_parser("rebuild-offsets", help="Rebuild the byte-offset indexes of the history tables").set_defaults(func=cmd_data_rebuild_offsets)
+
+    # jobs: the periodic maintenance jobs, run once (e.g. from cron)
+    jobs = groups.add_parser("jobs", help="Maintenance jobs").add_subparsers(dest="command", required=True)
+    jobs.add_parser("list", help="Show the maintenance jobs").set_defaults(func=cmd_jobs_list)
+    run = jobs.add_parser("run", help="Run maintenance jobs now")
+    run.add_argument("names", nargs="*", help="Jobs to run (default: all)")
+    run.set_defaults(func=cmd_jobs_run)
+    return parser
+
+
+def run_cli(argv=None):
+    """
+    Parse and run one batch command.
+    :return: Process exit code
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except FileNotFoundError as e:
+        print(f"File not found: {e.filename}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
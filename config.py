@@ -7,8 +7,9 @@ if getattr(sys, 'frozen', False):
 else:
     APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Set data directory in program folder
-DATA_DIR = os.path.join(APP_DIR, 'data')
+# Set data directory in program folder; BREEZE_DATA_DIR points the program at another
+# copy of the data (the benchmark suite uses it to run against generated datasets)
+DATA_DIR = os.environ.get('BREEZE_DATA_DIR') or os.path.join(APP_DIR, 'data')
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
@@ -18,6 +19,8 @@ MOOD_DATA_PATH = os.path.join(DATA_DIR, 'mood_data.csv')
 PATIENTS_DATA_PATH = os.path.join(DATA_DIR, 'patients.csv')
 MHWP_DATA_PATH = os.path.join(DATA_DIR, 'mhwp.csv')
 APPOINTMENTS_DATA_PATH = os.path.join(DATA_DIR, 'appointments.csv')
+# Schedules are computed from mhwp_schedule_template.csv and mhwp_schedule_exceptions.csv
+# (see utils/schedule_store.py); mhwp_schedule.csv only exists in older data directories
 SCHEDULE_DATA_PATH = os.path.join(DATA_DIR, 'mhwp_schedule.csv')
 MHWP_SCHEDULE_TEMPLATE_PATH = os.path.join(DATA_DIR, 'mhwp_schedule_template.csv')
 JOURNAL_ENTRIES_PATH = os.path.join(DATA_DIR,'patient_journaling.csv')
@@ -26,6 +29,11 @@ MENTAL_ASSESSMENTS_PATH = os.path.join(DATA_DIR, 'mental_assessments.csv')
 PATIENT_NOTES_PATH = os.path.join(DATA_DIR, 'patient_notes.csv')
 MEDITATION_RESOURCES_PATH = os.path.join(DATA_DIR, 'meditation_resources.csv')
 COMMENTS_PATH = os.path.join(DATA_DIR, 'comments.csv')
+MHWP_CAPACITY_PATH = os.path.join(DATA_DIR, 'mhwp_capacity.csv')
+LAST_ASSESSMENT_INDEX_PATH = os.path.join(DATA_DIR, 'last_assessment.csv')
+COMPLETED_APPOINTMENTS_INDEX_PATH = os.path.join(DATA_DIR, 'completed_appointments.csv')
+RECORD_INDEX_PATH = os.path.join(DATA_DIR, 'record_index.pkl')
+LOCK_DIR = os.path.join(DATA_DIR, 'locks')
 # OTHER_DATA_PATH = os.path.join(DATA_DIR, '#place your csv file name here')
 set_start_hour = 9 # start hour of the day's schedule
 set_end_hour = 16 # end hour of the day's schedule
\ No newline at end of file
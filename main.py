@@ -3,11 +3,20 @@ from services.login import handle_login
 import os
 import sys
 import shutil
+import argparse
 from utils.display_banner import display_banner
+from utils.migrate_user_ids import migrate_to_user_ids
+from utils.migrate_partitions import migrate_to_partitions
+from utils.migrate_schedule import migrate_to_schedule_exceptions
+from utils.instrumentation import start_profiling
+from utils.scheduler import start_scheduler, stop_scheduler
+from services.maintenance import rollover_schedules, complete_appointments, archive_old_appointments, register_maintenance_jobs
+from services.record_search import save_record_index
 from services import *
 from model import *
 from config import *
 from model.mhwp_management.mhwp_schedule import *
+from model.mhwp_management.schedule_session import recover_schedule_edits
 
 def check_data_directory_permissions():
     try:
@@ -39,8 +48,8 @@ def initialize_data_directory():
         'mhwp.csv', 
         'patients.csv',
         'assignments.csv',
-        'mhwp_schedule.csv',
         'mhwp_schedule_template.csv',
+        'mhwp_schedule_exceptions.csv',
         'meditation_resources.csv',
         'mood_data.csv',
         'patient_journaling.csv',
@@ -50,10 +59,15 @@ def initialize_data_directory():
         'appointments.csv'
     ]:
         target_file = os.path.join(data_dir, csv_file)
-        if not os.path.exists(target_file):
+        # Tables split into monthly partitions are a directory instead of a single file
+        target_dir = os.path.splitext(target_file)[0]
+        if not os.path.exists(target_file) and not os.path.isdir(target_dir):
             source_file = os.path.join(app_dir, 'data', csv_file)
+            source_dir = os.path.splitext(source_file)[0]
             if os.path.exists(source_file):
                 shutil.copy2(source_file, target_file)
+            elif os.path.isdir(source_dir):
+                shutil.copytree(source_dir, target_dir)
     
     return data_dir
 
@@ -85,7 +99,20 @@ def main():
         pass
         # print(f"Using data directory: {data_dir}")
     
-    update_mhwp_schedules(silent=True)
+    # Older data files refer to users by username; move them to user ids once
+    migrate_to_user_ids(DATA_DIR)
+    # Split the mood and journal files into monthly partitions once
+    migrate_to_partitions(DATA_DIR)
+    # Replace a generated mhwp_schedule.csv with exceptions to the weekly templates once
+    migrate_to_schedule_exceptions(DATA_DIR)
+    # Save schedule edits left unsaved when the program last stopped
+    recover_schedule_edits()
+    rollover_schedules()
+    complete_appointments()
+    archive_old_appointments()
+    # Keep the maintenance jobs running in the background while the menus are open
+    register_maintenance_jobs()
+    start_scheduler()
     display_banner()
     choice = show_menu()
     
@@ -97,8 +124,23 @@ def main():
 
     while menu_actions.get(choice, handle_invalid)():
         choice = show_menu()
+    stop_scheduler()
+    # Save search index entries added since the record_index_refresh job last ran
+    save_record_index()
 
  
 if __name__ == "__main__":
+    # --profile prints per-action timings and CSV I/O on exit; --profile-output also saves a cProfile dump
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--profile-output", metavar="FILE.prof")
+    options, command = parser.parse_known_args()
+    if options.profile or options.profile_output:
+        start_profiling(options.profile_output)
+
+    # Arguments run a batch command instead of the interactive menus
+    if command:
+        from cli import run_cli
+        sys.exit(run_cli(command))
     main()
    
\ No newline at end of file
@@ -71,9 +71,11 @@ def admin_manage_assignment_menu(user):
         print("2. Assign Patients to MHWPs")
         print("3. Modify Assignments")
         print("4. Display Unassigned Patients and MHWPs")
-        print("5. return main meun") 
+        print("5. View MHWP Capacity")
+        print("6. Find Next Available Slots")
+        print("7. return main meun") 
         
-        info_choice = input("Select an option (1-5): ").strip()
+        info_choice = input("Select an option (1-7): ").strip()
 
         if info_choice == '1':  # View all assignments
             print("\n--- All Assignments ---")
@@ -96,7 +98,16 @@ def admin_manage_assignment_menu(user):
                 mhwp_data_path=MHWP_DATA_PATH,
                 assignments_path=ASSIGNMENTS_DATA_PATH
             )
-        elif info_choice == '5':
+        elif info_choice == '5': # Display remaining schedule capacity
+            print("\n--- MHWP Capacity ---")
+            display_mhwp_capacity(
+                mhwp_data_path=MHWP_DATA_PATH,
+                assignments_path=ASSIGNMENTS_DATA_PATH
+            )
+        elif info_choice == '6': # Earliest free slots across eligible MHWPs
+            print("\n--- Next Available Slots ---")
+            search_next_free_slots()
+        elif info_choice == '7':
             break
         else:
             print("Invalid input. Please try.")
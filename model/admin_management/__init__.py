@@ -1,16 +1,28 @@
 from .admin_assignment import *
 from .admin_assign_patient import *
+from .slot_search import *
 
 __all__ = [
     'modify_assignments',
     'balanced_assign_patients_and_mhwps',
     'get_mhwps_with_schedule',
+    'get_mhwp_free_hours',
+    'build_eligibility_index',
+    'assign_patients_by_load',
+    'calculate_load_spread',
+    'display_load_spread',
     'get_patients_with_symptoms',
     'get_mhwps_with_major', 
     'get_current_assignments',
     'save_assignments',
-    'update_mhwp_csv_with_assignments',
-    'update_patients_csv_with_assignments',
+    'record_assignment_changes',
+    'reassign_caseload',
+    'compact_assignment_store',
     'display_assignments',
-    'display_unassigned_users'
+    'display_unassigned_users',
+    'display_mhwp_capacity',
+    'eligible_mhwps',
+    'find_next_free_slots',
+    'display_next_free_slots',
+    'search_next_free_slots'
 ]
\ No newline at end of file
@@ -1,5 +1,6 @@
 from .admin_assignment import *
 from config import *
+from utils.instrumentation import instrument
 
 def get_patients(patient_data_path=PATIENTS_DATA_PATH):
     """Get patient usernames from patients.csv"""
@@ -9,10 +10,8 @@ def get_patients(patient_data_path=PATIENTS_DATA_PATH):
         return patients
 
     try:
-        with open(patient_data_path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                patients.append(row["username"])
+        for row in read_records(patient_data_path):
+            patients.append(row["username"])
     except Exception as e:
         print(f"Error reading patient data: {str(e)}")
     return patients
@@ -25,10 +24,8 @@ def get_mhwps(mhwp_data_path=MHWP_DATA_PATH):
         return mhwps
 
     try:
-        with open(mhwp_data_path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                mhwps.append(row["username"])
+        for row in read_records(mhwp_data_path):
+            mhwps.append(row["username"])
     except Exception as e:
         print(f"Error reading MHWP data: {str(e)}")
     return mhwps
@@ -58,13 +55,18 @@ def display_unassigned_users(
     else:
         print("\nAll patients and MHWPs are assigned.")
 
+@instrument
 def balanced_assign_patients_and_mhwps(
     patient_data_path=PATIENTS_DATA_PATH,
     mhwp_data_path=MHWP_DATA_PATH,
     assignments_path=ASSIGNMENTS_DATA_PATH,
-    schedule_path=SCHEDULE_DATA_PATH
+    schedule_path=SCHEDULE_DATA_PATH,
+    weight_by_schedule=False
 ):
-    """Assign patients to MHWPs"""
+    """
+    Assign unassigned patients to the least loaded eligible MHWP.
+    With weight_by_schedule, load is measured per free schedule hour instead of per MHWP.
+    """
 
     # Load necessary data
     eligible_mhwps = get_mhwps_with_schedule(schedule_path)  # get schedule with MHWPs
@@ -83,8 +85,6 @@ def balanced_assign_patients_and_mhwps(
         for mhwp in mhwps_without_schedule:
             print(f" MHWP '{mhwp}' can't be assigned due to no schedule.")
 
-    assignments = {mhwp: patients.copy() for mhwp, patients in current_assignments.items()}
-
     # Get currently assigned patients
     already_assigned_patients = {patient for patients in current_assignments.values() for patient in patients}
 
@@ -93,35 +93,20 @@ def balanced_assign_patients_and_mhwps(
                           for patient, symptom in patients_with_symptoms.items() 
                           if patient not in already_assigned_patients}
 
-    assigned_mhwp_tracker = {mhwp: False for mhwp in eligible_mhwps}
-
-    # assign to unassigned patients only
-    for patient, symptom in unassigned_patients.items():
-        # obtain mhwps who set schedules (according matching rules)
-        eligible_mhwps_for_patient = [
-            mhwp for mhwp, major in mhwps_with_major.items()
-            if mhwp in eligible_mhwps and symptom in MATCHING_RULES.get(major, set())
-        ]
-
-        if eligible_mhwps_for_patient:
-            unassigned_mhwps = [mhwp for mhwp in eligible_mhwps_for_patient if not assigned_mhwp_tracker[mhwp]]
-
-            if unassigned_mhwps:
-                # priority to assign unassigned mhwp
-                selected_mhwp = random.choice(unassigned_mhwps)
-                assigned_mhwp_tracker[selected_mhwp] = True
-            else:
-                selected_mhwp = random.choice(eligible_mhwps_for_patient)
-
-            assignments.setdefault(selected_mhwp, []).append(patient)
-            print(f"Patient '{patient}' -> MHWP '{selected_mhwp}' (Major: {mhwps_with_major[selected_mhwp]})")
-        else:
-            print(f"Patient '{patient}'  can't be assigned due to no eligible MHWP.")
-
-    # save assignments
-    save_assignments(assignments, assignments_path)
-    # unpdate files
-    update_mhwp_csv_with_assignments(assignments_path=assignments_path, mhwp_data_path=mhwp_data_path)
-    update_patients_csv_with_assignments(assignments_path=assignments_path, patient_data_path=patient_data_path)
-    assignments_completed = True
+    # Precompute symptom -> eligible MHWPs once and balance by current load
+    eligibility_index = build_eligibility_index(mhwps_with_major, eligible_mhwps)
+    current_loads = {mhwp: len(patients) for mhwp, patients in current_assignments.items() if mhwp in eligible_mhwps}
+    free_hours = get_mhwp_free_hours(schedule_path) if weight_by_schedule else None
+    new_assignments, no_match, loads = assign_patients_by_load(
+        unassigned_patients, eligibility_index, current_loads, free_hours
+    )
+
+    for patient, selected_mhwp in new_assignments.items():
+        print(f"Patient '{patient}' -> MHWP '{selected_mhwp}' (Major: {mhwps_with_major[selected_mhwp]})")
+    for patient in no_match:
+        print(f"Patient '{patient}'  can't be assigned due to no eligible MHWP.")
+
+    # save only the new assignments
+    record_assignment_changes(new_assignments, assignments_path)
+    display_load_spread(loads)
     print("Assignments completed successfully.")
\ No newline at end of file
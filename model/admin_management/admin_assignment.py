@@ -1,11 +1,17 @@
 import os
-import csv
+import heapq
+import statistics
 from tabulate import tabulate
-import random
 from config import *
+from utils.data_store import read_records
+from utils.assignment_store import (
+    get_assignments_by_mhwp, get_patients_for_mhwp, assign_patients, write_assignments, compact_assignments
+)
+from model.mhwp_management.mhwp_capacity import load_capacity, rank_mhwps_by_capacity
 from model.user_account_management.user_data_manage import toggle_user_account_status
 from utils.list_all_user import list_all_users
 from services.summary import display_summary
+from utils.instrumentation import instrument
 
 MATCHING_RULES = {
     "Emotional Management": {"Anxiety", "Depression", "PTSD", "Bipolar Disorder"},
@@ -14,6 +20,113 @@ MATCHING_RULES = {
     "General Wellbeing": {"Other/General Wellbeing"}
 }
 
+def build_eligibility_index(mhwps_with_major, eligible_mhwps=None):
+    """
+    Precompute symptom -> eligible MHWPs from MATCHING_RULES.
+    :param mhwps_with_major: Dict of MHWP username -> major
+    :param eligible_mhwps: Optional set of MHWPs allowed to take patients (e.g. those with a schedule)
+    :return: Dict of symptom -> sorted list of MHWP usernames
+    """
+    index = {}
+    for mhwp, major in mhwps_with_major.items():
+        if eligible_mhwps is not None and mhwp not in eligible_mhwps:
+            continue
+        for symptom in MATCHING_RULES.get(major, set()):
+            index.setdefault(symptom, []).append(mhwp)
+    for mhwps in index.values():
+        mhwps.sort()
+    return index
+
+def match_symptom(symptom, eligibility_index):
+    """
+    Return the eligibility index key used for a patient's symptom, or None if no MHWP is eligible.
+    Patients with several comma separated conditions are matched on the first condition that has an eligible MHWP.
+    """
+    if symptom in eligibility_index:
+        return symptom
+    for condition in str(symptom).split(","):
+        condition = condition.strip()
+        if condition in eligibility_index:
+            return condition
+    return None
+
+def assign_patients_by_load(patients_with_symptoms, eligibility_index, current_loads=None, free_hours=None):
+    """
+    Deterministically assign patients to the least loaded eligible MHWP.
+    Each symptom keeps a min-heap of its MHWPs keyed by load (or by load per free schedule hour when
+    free_hours is given). Loads are shared between symptoms, so stale heap entries are refreshed lazily.
+    :param patients_with_symptoms: Dict of patient username -> symptom
+    :param eligibility_index: Output of build_eligibility_index()
+    :param current_loads: Dict of MHWP username -> number of patients already assigned
+    :param free_hours: Optional dict of MHWP username -> free schedule hours used to weight the load
+    :return: (dict of patient -> MHWP, list of patients with no eligible MHWP, dict of final loads)
+    """
+    loads = {mhwp: 0 for mhwps in eligibility_index.values() for mhwp in mhwps}
+    for mhwp, load in (current_loads or {}).items():
+        loads[mhwp] = load
+
+    def load_key(mhwp):
+        if free_hours is None:
+            return loads[mhwp]
+        return (loads[mhwp] + 1) / max(free_hours.get(mhwp, 0), 1)
+
+    heaps = {}
+    for symptom, mhwps in eligibility_index.items():
+        heap = [(load_key(mhwp), loads[mhwp], mhwp) for mhwp in mhwps]
+        heapq.heapify(heap)
+        heaps[symptom] = heap
+
+    assignments = {}
+    unassigned = []
+    for patient, symptom in patients_with_symptoms.items():
+        key = match_symptom(symptom, eligibility_index)
+        if key is None:
+            unassigned.append(patient)
+            continue
+        heap = heaps[key]
+        while True:
+            _, seen_load, mhwp = heap[0]
+            if seen_load == loads[mhwp]:
+                break
+            # Load changed through another symptom's heap; refresh the entry
+            heapq.heapreplace(heap, (load_key(mhwp), loads[mhwp], mhwp))
+        loads[mhwp] += 1
+        heapq.heapreplace(heap, (load_key(mhwp), loads[mhwp], mhwp))
+        assignments[patient] = mhwp
+
+    return assignments, unassigned, loads
+
+def calculate_load_spread(loads):
+    """
+    Summarise how evenly patients are spread over MHWPs.
+    :param loads: Dict of MHWP username -> number of assigned patients
+    :return: Dict with min, max, mean, standard deviation and spread (max - min)
+    """
+    values = list(loads.values())
+    if not values:
+        return {"MHWPs": 0, "Min": 0, "Max": 0, "Mean": 0.0, "Std Dev": 0.0, "Spread": 0}
+    return {
+        "MHWPs": len(values),
+        "Min": min(values),
+        "Max": max(values),
+        "Mean": round(statistics.mean(values), 2),
+        "Std Dev": round(statistics.pstdev(values), 2),
+        "Spread": max(values) - min(values)
+    }
+
+def display_load_spread(loads):
+    """
+    Display the patient load per MHWP and the resulting load spread.
+    """
+    if not loads:
+        print("\nNo MHWP workload to report.")
+        return
+    print("\nMHWP Workload:")
+    table_data = [{"MHWP Username": mhwp, "Patients": load} for mhwp, load in sorted(loads.items())]
+    print(tabulate(table_data, headers="keys", tablefmt="grid"))
+    print("\nLoad Spread:")
+    print(tabulate([calculate_load_spread(loads)], headers="keys", tablefmt="grid"))
+
 def get_patients_with_symptoms(PATIENTS_DATA_PATH=PATIENTS_DATA_PATH):
     """
     Get a dictionary of patients with their symptoms from patients.csv.
@@ -24,10 +137,8 @@ def get_patients_with_symptoms(PATIENTS_DATA_PATH=PATIENTS_DATA_PATH):
         return patients
 
     try:
-        with open(PATIENTS_DATA_PATH, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                patients[row["username"]] = row["symptoms"]
+        for row in read_records(PATIENTS_DATA_PATH):
+            patients[row["username"]] = row["symptoms"]
     except Exception as e:
         print(f"Error reading patient data: {str(e)}")
     return patients
@@ -42,118 +153,63 @@ def get_mhwps_with_major(mhwp_data_path=MHWP_DATA_PATH):
         return mhwps
 
     try:
-        with open(mhwp_data_path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                mhwps[row["username"]] = row["major"]
+        for row in read_records(mhwp_data_path):
+            mhwps[row["username"]] = row["major"]
     except Exception as e:
         print(f"Error reading MHWP data: {str(e)}")
     return mhwps
 
-def get_current_assignments(assignments_path="data/assignments.csv"):
+def get_current_assignments(assignments_path=ASSIGNMENTS_DATA_PATH):
     """
-    Load current assignments from assignments.csv.
+    Load current assignments from assignments.csv as a dict of MHWP -> list of patients.
     """
-    assignments = {}
-    if os.path.exists(assignments_path):
-        with open(assignments_path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                mhwp_username = row["mhwp_username"]
-                patient_username = row["patient_username"]
-                if mhwp_username not in assignments:
-                    assignments[mhwp_username] = []
-                assignments[mhwp_username].append(patient_username)
-    return assignments
-
-def update_mhwp_csv_with_assignments(assignments_path=ASSIGNMENTS_DATA_PATH, mhwp_data_path=MHWP_DATA_PATH):
-    """
-    Update the `assigned_patients` column in mhwp.csv based on the assignments.
-    """
-    # Load current assignments
-    current_assignments = get_current_assignments(assignments_path)
-
-    # Load MHWP data
-    if not os.path.exists(mhwp_data_path):
-        print(f"Error: MHWP data file '{mhwp_data_path}' not found.")
-        return
-
-    try:
-        with open(mhwp_data_path, "r", encoding="utf-8") as file:
-            rows = list(csv.DictReader(file))
-            
-        # Update assigned_patients for each MHWP
-        for row in rows:
-            username = row["username"]
-            if username in current_assignments:
-                # Convert to set to remove duplicates
-                assigned_patients = set(current_assignments[username])
-                row["assigned_patients"] = ",".join(assigned_patients)
-            else:
-                row["assigned_patients"] = ""
-
-        # Save updated MHWP data
-        with open(mhwp_data_path, "w", newline='', encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=rows[0].keys())
-            writer.writeheader()
-            writer.writerows(rows)
-        print("Updated `assigned_patients` in MHWP data.")
-    except Exception as e:
-        print(f"Error processing MHWP data: {str(e)}")
+    return get_assignments_by_mhwp(assignments_path)
 
-def update_patients_csv_with_assignments(assignments_path=ASSIGNMENTS_DATA_PATH, patient_data_path=PATIENTS_DATA_PATH):
+def save_assignments(assignments, assignments_path=ASSIGNMENTS_DATA_PATH):
     """
-    Update the `assigned_mhwp` column in patients.csv based on the assignments.
+    Replace assignments.csv with the given MHWP -> patients assignments.
     """
-    # Load current assignments
-    current_assignments = get_current_assignments(assignments_path)
+    table_data = write_assignments(
+        {patient: mhwp for mhwp, patients in assignments.items() for patient in set(patients)},
+        assignments_path
+    )
 
-    # Create patient to MHWP mapping
-    patient_to_mhwp = {patient: mhwp for mhwp, patients in current_assignments.items() for patient in patients}
-
-    # Load patient data
-    if not os.path.exists(patient_data_path):
-        print(f"Error: Patient data file '{patient_data_path}' not found.")
-        return
+    print("\nUpdated Assignments:")
+    print(tabulate(table_data, headers=["Patient Username", "MHWP Username"], tablefmt="grid"))
 
+def record_assignment_changes(changes, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """
+    Append changed assignments to the assignment store and display them.
+    :param changes: Dict of patient username -> new MHWP username
+    :return: False if the changes could not be recorded
+    """
+    if not changes:
+        print("\nNo assignment changes to save.")
+        return True
     try:
-        with open(patient_data_path, "r", encoding="utf-8") as file:
-            rows = list(csv.DictReader(file))
-
-        # Update assigned_mhwp for each patient
-        for row in rows:
-            username = row["username"]
-            row["assigned_mhwp"] = patient_to_mhwp.get(username, "")
-
-        # Save updated patient data
-        with open(patient_data_path, "w", newline='', encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=rows[0].keys())
-            writer.writeheader()
-            writer.writerows(rows)
-        print("Updated `assigned_mhwp` in patient data.")
-    except Exception as e:
-        print(f"Error processing patient data: {str(e)}")
+        assign_patients(changes, assignments_path)
+    except ValueError as e:
+        print(f"Error: {e}. No assignments were changed.")
+        return False
+    print("\nUpdated Assignments:")
+    print(tabulate(sorted(changes.items()), headers=["Patient Username", "MHWP Username"], tablefmt="grid"))
+    return True
 
-def save_assignments(assignments, assignments_path=ASSIGNMENTS_DATA_PATH):
+def reassign_caseload(from_mhwp, to_mhwp, assignments_path=ASSIGNMENTS_DATA_PATH):
     """
-    Save assignments to assignments.csv.
+    Move every patient of one MHWP to another with a single append to the assignment store.
+    :return: Dict of patient username -> new MHWP username
     """
-    # Convert to set of tuples to remove duplicates
-    unique_assignments = {(patient, mhwp) 
-                        for mhwp, patients in assignments.items() 
-                        for patient in set(patients)}
-    
-    # Convert back to list for writing
-    table_data = sorted(list(unique_assignments))
-
-    with open(assignments_path, "w", newline='', encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["patient_username", "mhwp_username"])
-        writer.writerows(table_data)
-
-    print("\nUpdated Assignments:")
-    print(tabulate(table_data, headers=["Patient Username", "MHWP Username"], tablefmt="grid"))
+    changes = {patient: to_mhwp for patient in get_patients_for_mhwp(from_mhwp, assignments_path)}
+    if not record_assignment_changes(changes, assignments_path):
+        return {}
+    return changes
 
+def compact_assignment_store(assignments_path=ASSIGNMENTS_DATA_PATH):
+    """
+    Fold the assignment log to one row per patient.
+    """
+    return compact_assignments(assignments_path)
 
 def display_assignments(assignments_path=ASSIGNMENTS_DATA_PATH):
     """
@@ -169,26 +225,42 @@ def display_assignments(assignments_path=ASSIGNMENTS_DATA_PATH):
     else:
         print("No assignments found.")
         
-def get_mhwps_with_schedule(schedule_path="data/mhwp_schedule.csv"):
+def get_mhwps_with_schedule(schedule_path=SCHEDULE_DATA_PATH, min_free=1):
     """
-    Get a list of MHWPs that have an available schedule in mhwp_schedule.csv.
+    Get the MHWPs that still have at least min_free available slots, from the capacity summary.
     """
-    mhwps_with_schedule = set()
-    if not os.path.exists(schedule_path):
-        print(f"Error: Schedule file '{schedule_path}' not found.")
-        return mhwps_with_schedule
+    return {mhwp for mhwp, free in get_mhwp_free_hours(schedule_path).items() if free >= min_free}
 
-    try:
-        with open(schedule_path, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row["mhwp_username"] and any(value == "□" for value in row.values()):
-                    mhwps_with_schedule.add(row["mhwp_username"])
-    except Exception as e:
-        print(f"Error reading schedule: {str(e)}")
+def get_mhwp_free_hours(schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Get the number of available (■) one-hour slots of each MHWP from the capacity summary.
+    """
+    return {mhwp: counts["free_slots"] for mhwp, counts in load_capacity(schedule_path=schedule_path).items()}
 
-    return mhwps_with_schedule
+def display_mhwp_capacity(mhwp_data_path=MHWP_DATA_PATH, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """
+    Display every MHWP's remaining schedule capacity alongside their current patient count.
+    """
+    capacity = load_capacity()
+    patient_counts = {mhwp: len(patients) for mhwp, patients in get_assignments_by_mhwp(assignments_path).items()}
+    table_data = []
+    for mhwp, free in rank_mhwps_by_capacity(get_mhwps_with_major(mhwp_data_path).keys(), capacity):
+        counts = capacity.get(mhwp, {})
+        table_data.append({
+            "MHWP Username": mhwp,
+            "Free Slots": free,
+            "Booked": counts.get("booked_slots", 0),
+            "Confirmed": counts.get("confirmed_slots", 0),
+            "Patients": patient_counts.get(mhwp, 0)
+        })
+
+    print("\nMHWP Capacity:")
+    if table_data:
+        print(tabulate(table_data, headers="keys", tablefmt="grid"))
+    else:
+        print("No MHWPs found.")
 
+@instrument
 def modify_assignments(assignments_path=ASSIGNMENTS_DATA_PATH,
                        patient_data_path=PATIENTS_DATA_PATH,
                        mhwp_data_path=MHWP_DATA_PATH,
@@ -229,9 +301,9 @@ def modify_assignments(assignments_path=ASSIGNMENTS_DATA_PATH,
             print(f"No eligible MHWPs found for symptom '{symptom}'.")
             return
 
-        print("\nEligible MHWPs:")
-        for mhwp in eligible_mhwps:
-            print(f"- {mhwp}")
+        print("\nEligible MHWPs (most free slots first):")
+        for mhwp, free in rank_mhwps_by_capacity(eligible_mhwps):
+            print(f"- {mhwp} ({free} free slots)")
 
         # Let the user select a new MHWP
         new_mhwp = input("\nEnter the new MHWP username for this patient: ").strip()
@@ -239,16 +311,8 @@ def modify_assignments(assignments_path=ASSIGNMENTS_DATA_PATH,
             print(f"'{new_mhwp}' is not a valid choice. Please choose from the eligible MHWPs.")
             return
 
-        # Update assignments
-        for mhwp, patients in current_assignments.items():
-            if patient_to_modify in patients:
-                patients.remove(patient_to_modify)
-                break
-
-        current_assignments.setdefault(new_mhwp, []).append(patient_to_modify)
-        save_assignments(current_assignments, assignments_path)
-        update_mhwp_csv_with_assignments(assignments_path, mhwp_data_path)
-        update_patients_csv_with_assignments(assignments_path, patient_data_path)
+        # Record the single changed assignment
+        record_assignment_changes({patient_to_modify: new_mhwp}, assignments_path)
         print(f"\nPatient '{patient_to_modify}' has been reassigned to MHWP '{new_mhwp}'.")
 
     elif choice == '2':  # Reassign for unassigned patients and MHWPs
@@ -273,31 +337,26 @@ def modify_assignments(assignments_path=ASSIGNMENTS_DATA_PATH,
             print("\n--- Assigning unassigned patients to available MHWPs ---")
             patients_with_symptoms = get_patients_with_symptoms(patient_data_path)
             mhwps_with_major = get_mhwps_with_major(mhwp_data_path)
-            for patient in list(unassigned_patients):
+            pending = {}
+            for patient in sorted(unassigned_patients):
                 symptom = patients_with_symptoms.get(patient)
                 if not symptom:
                     print(f"No symptom found for patient '{patient}'. Skipping.")
                     continue
-                # Find eligible MHWPs for the patient
-                eligible_mhwps = [
-                    mhwp for mhwp in unassigned_mhwps_with_schedule
-                    if symptom in MATCHING_RULES.get(mhwps_with_major.get(mhwp, ""), set())
-                ]
-                if eligible_mhwps:
-                    # Assign patient to an unassigned MHWP
-                    selected_mhwp = random.choice(eligible_mhwps)
-                    current_assignments.setdefault(selected_mhwp, []).append(patient)
-                    unassigned_patients.remove(patient)
-                    print(f"Assigned: Patient '{patient}' -> MHWP '{selected_mhwp}'")
-                else:
-                    print(f"Patient '{patient}' cannot be assigned due to no eligible MHWP with a schedule.")
+                pending[patient] = symptom
+            eligibility_index = build_eligibility_index(mhwps_with_major, unassigned_mhwps_with_schedule)
+            new_assignments, no_match, loads = assign_patients_by_load(pending, eligibility_index)
+            for patient, selected_mhwp in new_assignments.items():
+                unassigned_patients.remove(patient)
+                print(f"Assigned: Patient '{patient}' -> MHWP '{selected_mhwp}'")
+            for patient in no_match:
+                print(f"Patient '{patient}' cannot be assigned due to no eligible MHWP with a schedule.")
+            # Save only the new assignments
+            record_assignment_changes(new_assignments, assignments_path)
+            display_load_spread(loads)
         else:
             print("\nNo unassigned patients to process.")
 
-        # Save the results and update related files
-        save_assignments(current_assignments, assignments_path)
-        update_mhwp_csv_with_assignments(assignments_path=assignments_path, mhwp_data_path=mhwp_data_path)
-        update_patients_csv_with_assignments(assignments_path=assignments_path, patient_data_path=patient_data_path)
         print("\n--- Assignments Updated ---")
     else:
         print("\nInvalid choice. Returning to menu.")
@@ -0,0 +1,117 @@
+import heapq
+from datetime import datetime
+from tabulate import tabulate
+from config import *
+from utils.schedule_store import free_slots
+from utils.instrumentation import instrument
+from .admin_assignment import build_eligibility_index, match_symptom, get_mhwps_with_major
+
+# Clinic-wide "next available slot" search. Each eligible MHWP's free slots are walked
+# lazily in time order (utils/schedule_store.free_slots) and a min-heap holds the next
+# free slot of every MHWP. Taking the earliest slot replaces that MHWP's heap entry
+# with their following free slot, so finding the first N slots looks at about N days
+# per MHWP instead of computing everyone's whole schedule.
+
+
+def eligible_mhwps(symptom=None, mhwp_data_path=MHWP_DATA_PATH):
+    """
+    MHWPs whose major covers a symptom (see MATCHING_RULES), or every MHWP if no symptom is given.
+    Patients' comma separated conditions are matched as in assignment.
+    """
+    mhwps_with_major = get_mhwps_with_major(mhwp_data_path)
+    if not symptom:
+        return sorted(mhwps_with_major)
+    eligibility_index = build_eligibility_index(mhwps_with_major)
+    key = match_symptom(symptom, eligibility_index)
+    return eligibility_index[key] if key else []
+
+
+@instrument(max_reads_per_table=1)
+def find_next_free_slots(symptom=None, after=None, count=10, mhwps=None,
+                         schedule_path=SCHEDULE_DATA_PATH, mhwp_data_path=MHWP_DATA_PATH):
+    """
+    Find the first available slots after a time across the MHWPs eligible for a symptom.
+    :param symptom: Patient symptom, or None for every MHWP
+    :param after: Earliest slot start (datetime or date string), default now
+    :param count: Number of slots to return
+    :param mhwps: Search these MHWPs instead of the eligible ones
+    :return: List of (start datetime, MHWP username, slot column), earliest first
+    """
+    if mhwps is None:
+        mhwps = eligible_mhwps(symptom, mhwp_data_path)
+    # Heap entries: (slot start, MHWP, slot column, position, generator). The position is unique,
+    # so ties never fall through to comparing generators.
+    heap = []
+    for position, mhwp in enumerate(dict.fromkeys(mhwps)):
+        slots = free_slots(mhwp, after, schedule_path)
+        first = next(slots, None)
+        if first:
+            heap.append((first[0], mhwp, first[1], position, slots))
+    heapq.heapify(heap)
+
+    found = []
+    while heap and len(found) < count:
+        start, mhwp, slot, position, slots = heap[0]
+        found.append((start, mhwp, slot))
+        following = next(slots, None)
+        if following:
+            heapq.heapreplace(heap, (following[0], mhwp, following[1], position, slots))
+        else:
+            heapq.heappop(heap)
+    return found
+
+
+def parse_search_time(text):
+    """
+    Parse a search start of the form "YYYY/MM/DD" or "YYYY/MM/DD HH:MM" (dashes also accepted).
+    A blank string means now. Raises ValueError for anything else.
+    """
+    text = text.strip().replace("-", "/")
+    if not text:
+        return None
+    for pattern in ("%Y/%m/%d %H:%M", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text, pattern)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date or time: {text}. Use YYYY/MM/DD or YYYY/MM/DD HH:MM.")
+
+
+def display_next_free_slots(results):
+    """
+    Display search results as a numbered table.
+    """
+    if not results:
+        print("\nNo available slots found.")
+        return
+    table_data = [{
+        "No.": number,
+        "Date": start.strftime("%Y/%m/%d"),
+        "Day": start.strftime("%A"),
+        "Time Slot": slot.split(" ")[0],
+        "MHWP Username": mhwp
+    } for number, (start, mhwp, slot) in enumerate(results, start=1)]
+    print("\nNext Available Slots:")
+    print(tabulate(table_data, headers="keys", tablefmt="grid"))
+
+
+def search_next_free_slots():
+    """
+    Prompt for a symptom, start time and number of results, then display the earliest available slots.
+    """
+    symptom = input("Enter the patient symptom (blank for any MHWP): ").strip()
+    try:
+        after = parse_search_time(input("Search from (YYYY/MM/DD [HH:MM], blank for now): "))
+    except ValueError as e:
+        print(e)
+        return
+    count = input("Number of slots to show (default 10): ").strip()
+    if count and not count.isdigit():
+        print("Invalid number. Please enter a whole number.")
+        return
+
+    mhwps = eligible_mhwps(symptom or None)
+    if symptom and not mhwps:
+        print(f"No eligible MHWPs found for symptom '{symptom}'.")
+        return
+    display_next_free_slots(find_next_free_slots(after=after, count=int(count or 10), mhwps=mhwps))
@@ -11,6 +11,7 @@ from services.comment import view_comments
 from services.patient_records import view_patient_records
 from utils.notification import send_email_notification, get_email_by_username
 from services.dashboard import display_dashboard
+from services.record_search import handle_record_search
 from .mhwp_management import *
 
 
@@ -22,9 +23,10 @@ def handle_mhwp_menu(user):
         print("3. Manage appointments")
         print("4. View patient records")
         print("5. View your dashboard")
-        print("6. Logout")
+        print("6. Search patient notes and journals")
+        print("7. Logout")
 
-        main_choice = input("Select an option (1-6): ").strip()
+        main_choice = input("Select an option (1-7): ").strip()
         if main_choice == '1':
             if handle_update_personal_info(user):  # If account is deleted
                 return
@@ -45,8 +47,11 @@ def handle_mhwp_menu(user):
         elif main_choice == '5':  # Logout
             display_dashboard(user.username)
 
-        elif main_choice == '6':  # Logout
+        elif main_choice == '6':
+            handle_record_search(user)
+
+        elif main_choice == '7':  # Logout
             break
 
         else:
-            print("Invalid choice. Please select an option between 1 and 6.")
+            print("Invalid choice. Please select an option between 1 and 7.")
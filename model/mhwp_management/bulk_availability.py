@@ -0,0 +1,180 @@
+import pandas as pd
+from datetime import datetime
+from tabulate import tabulate
+from config import *
+from utils.data_store import read_table
+from utils.schedule_store import read_schedule, write_schedule
+from utils.instrumentation import instrument
+from .mhwp_capacity import refresh_capacity
+
+# Bulk availability changes: leave for one or many MHWPs over a date range, or a
+# clinic-wide holiday calendar. The schedule is computed for the dates involved,
+# however far ahead (see utils/schedule_store.py), and the days and slots to
+# change are selected with boolean masks over it. A change therefore costs one
+# read and one append to the schedule exceptions, however many MHWPs and days it
+# covers. Booked (▲) and confirmed (●) slots are never changed. They are returned
+# as conflicts, with the appointment's patient, so those appointments can be
+# moved or cancelled.
+
+UNAVAILABLE = "□"
+AVAILABLE = "■"
+BOOKED_GLYPHS = {"▲": "booked", "●": "confirmed"}
+CONFLICT_COLUMNS = ["mhwp_username", "Date", "slot", "status", "patient_username"]
+CONFLICT_HEADERS = {"mhwp_username": "MHWP", "Date": "Date", "slot": "Slot", "status": "Status", "patient_username": "Patient"}
+
+
+def slot_columns(schedule_df):
+    return [column for column in schedule_df.columns if "(" in column]
+
+
+def resolve_slots(schedule_df, slots=None):
+    """
+    Schedule columns for a slot selection: None for all slots, or a list of slot
+    indexes (0, 1, ...) and/or times ("09:00-10:00" or "09:00").
+    """
+    columns = slot_columns(schedule_df)
+    if not slots:
+        return columns
+    selected = []
+    for slot in slots:
+        slot = str(slot).strip()
+        if slot.isdigit() and int(slot) < len(columns):
+            matches = [columns[int(slot)]]
+        else:
+            matches = [column for column in columns if column.startswith(slot)]
+        if not matches:
+            raise ValueError(f"Unknown time slot: {slot}")
+        selected.extend(column for column in matches if column not in selected)
+    return selected
+
+
+def day_mask(schedule_df, mhwps=None, start_date=None, end_date=None, dates=None, weekdays=None):
+    """
+    Boolean mask of the schedule rows (MHWP days) to change.
+    :param mhwps: MHWP usernames, or None for every MHWP
+    :param start_date: First date ("YYYY/MM/DD"), or None
+    :param end_date: Last date ("YYYY/MM/DD"), or None
+    :param dates: Explicit list of dates ("YYYY/MM/DD"), e.g. a holiday calendar
+    :param weekdays: Optional list of day names ("Monday", ...) to limit the range to
+    """
+    mask = pd.Series(True, index=schedule_df.index)
+    if mhwps is not None:
+        mask &= schedule_df["mhwp_username"].isin(list(mhwps))
+    day = schedule_df["Date"].astype(str)  # YYYY/MM/DD strings compare in date order
+    if start_date:
+        mask &= day >= start_date
+    if end_date:
+        mask &= day <= end_date
+    if dates is not None:
+        mask &= day.isin(list(dates))
+    if weekdays:
+        mask &= schedule_df["Day"].astype(str).str.lower().isin([weekday.lower() for weekday in weekdays])
+    return mask
+
+
+def set_slots(schedule_df, rows, slots=None, value=UNAVAILABLE):
+    """
+    Set the selected slots of the selected rows to value in place, leaving booked and confirmed slots alone.
+    :param rows: Boolean row mask (see day_mask)
+    :param slots: Slot selection (see resolve_slots)
+    :return: (number of slots changed, DataFrame of the booked/confirmed slots in the selection)
+    """
+    columns = resolve_slots(schedule_df, slots)
+    block = schedule_df.loc[rows, columns]
+    booked = block.isin(list(BOOKED_GLYPHS))
+    changed = ~booked & (block != value)
+    schedule_df.loc[rows, columns] = block.mask(changed, value)
+
+    slots_booked = block.stack()
+    slots_booked = slots_booked[slots_booked.isin(list(BOOKED_GLYPHS))]
+    days = slots_booked.index.get_level_values(0)
+    conflicts = pd.DataFrame({
+        "mhwp_username": schedule_df.loc[days, "mhwp_username"].astype(str).to_numpy(),
+        "Date": schedule_df.loc[days, "Date"].astype(str).to_numpy(),
+        "slot": slots_booked.index.get_level_values(1).astype(str),
+        "status": slots_booked.map(BOOKED_GLYPHS).to_numpy()
+    })
+    return int(changed.to_numpy().sum()), conflicts
+
+
+def _add_patients(conflicts, appointments_path):
+    """Add the patient of each conflicting slot from the active appointments."""
+    if conflicts.empty:
+        return conflicts.assign(patient_username=pd.Series(dtype="str"))
+    try:
+        appointments = read_table(appointments_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return conflicts.assign(patient_username="")
+    appointments = appointments[appointments["status"].isin(["pending", "confirmed"])]
+    patients = pd.DataFrame({
+        "mhwp_username": appointments["mhwp_username"].astype(str),
+        "Date": appointments["date"].astype(str),
+        "time": appointments["timeslot"].astype(str),
+        "patient_username": appointments["patient_username"].astype(str)
+    }).drop_duplicates(["mhwp_username", "Date", "time"])
+    conflicts = conflicts.assign(time=conflicts["slot"].str.split(" ").str[0])
+    merged = conflicts.merge(patients, on=["mhwp_username", "Date", "time"], how="left")
+    return merged[CONFLICT_COLUMNS].fillna({"patient_username": ""})
+
+
+@instrument(max_reads_per_table=1, max_writes_per_table=1)
+def apply_bulk_availability(mhwps=None, start_date=None, end_date=None, dates=None, slots=None, weekdays=None,
+                            value=UNAVAILABLE, schedule_path=SCHEDULE_DATA_PATH,
+                            appointments_path=APPOINTMENTS_DATA_PATH):
+    """
+    Mark slots unavailable (leave, holidays) or available for many MHWPs and days with one write.
+    :param mhwps: MHWP usernames, or None for the whole clinic
+    :param value: UNAVAILABLE ("□") or AVAILABLE ("■")
+    See day_mask and resolve_slots for the selection arguments.
+    :return: (number of slots changed, DataFrame of conflicts in CONFLICT_COLUMNS layout)
+    """
+    if value not in (UNAVAILABLE, AVAILABLE):
+        raise ValueError(f"Slots can only be set to {UNAVAILABLE} or {AVAILABLE}")
+    dates = list(dates) if dates is not None else None
+    first = start_date or (min(dates) if dates else None)
+    last = end_date or (max(dates) if dates else None)
+    schedule_df = read_schedule(schedule_path, mhwps, first, last)
+    rows = day_mask(schedule_df, mhwps, start_date, end_date, dates, weekdays)
+    changed, conflicts = set_slots(schedule_df, rows, slots, value)
+    if changed:
+        write_schedule(schedule_df[rows], schedule_path)
+        changed_mhwps = sorted(schedule_df.loc[rows, "mhwp_username"].astype(str).unique())
+        refresh_capacity(read_schedule(schedule_path, changed_mhwps), changed_mhwps)
+    return changed, _add_patients(conflicts, appointments_path)
+
+
+def load_holiday_calendar(calendar_path):
+    """
+    Read a holiday calendar: one date (YYYY/MM/DD or YYYY-MM-DD) per line, optionally followed by
+    a comma and a name. Blank lines and lines starting with # are skipped.
+    :return: List of "YYYY/MM/DD" dates
+    """
+    dates = []
+    with open(calendar_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            day = line.split(",")[0].strip().replace("-", "/")
+            try:
+                datetime.strptime(day, "%Y/%m/%d")
+            except ValueError:
+                if not dates and day.lower() == "date":
+                    continue  # Header row
+                raise ValueError(f"Invalid date in holiday calendar: {day}")
+            dates.append(day)
+    return dates
+
+
+def apply_holidays(calendar_path, mhwps=None, schedule_path=SCHEDULE_DATA_PATH):
+    """Close every slot on the calendar's dates, for the whole clinic or the given MHWPs."""
+    return apply_bulk_availability(mhwps, dates=load_holiday_calendar(calendar_path), schedule_path=schedule_path)
+
+
+def print_conflicts(conflicts):
+    """Print the booked and confirmed slots a bulk change left in place."""
+    if conflicts.empty:
+        return
+    print(f"\n{len(conflicts)} booked or confirmed slots were left unchanged; move or cancel these appointments:")
+    headers = [CONFLICT_HEADERS[column] for column in conflicts.columns]
+    print(tabulate(conflicts.values.tolist(), headers=headers, tablefmt="grid"))
@@ -1,5 +1,3 @@
-import os
-import csv
 import calendar
 import pandas as pd
 from tabulate import tabulate
@@ -7,6 +5,10 @@ from os.path import exists
 from datetime import datetime, timedelta
 from utils.notification import send_email_notification, get_email_by_username
 from config import *
+from utils.data_store import read_table, write_table, read_records
+from utils.table_lock import table_lock
+from utils.schedule_store import read_schedule, write_schedule, day_availability, slot_column, update_slots
+from .mhwp_capacity import refresh_capacity, adjust_capacity
 
 
 def generate_schedule_for_month(username, weekdays):
@@ -67,36 +69,15 @@ def generate_day_from_date(date_str):
 def setup_mhwp_schedule(user,file_path=SCHEDULE_DATA_PATH): # choice 1, setup availability schedule(old style)
     """Set up availability schedule for the Mental Health Worker with slots."""
     print("\nSetup Your Availability")
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                try:
-                    headers = next(reader)
-                except StopIteration:
-                    print("\nError: The schedule file is empty or has no headers.")
-                    return
-                expected_columns = [
-                    "mhwp_username", "Date", "Day",
-                    "09:00-10:00 (0)", "10:00-11:00 (1)", "11:00-12:00 (2)",
-                    "12:00-13:00 (3)", "13:00-14:00 (4)", "14:00-15:00 (5)", "15:00-16:00 (6)"
-                ]
-                if headers != expected_columns:
-                    print("\nError: The schedule file has incorrect headers.")
-                    return
-                for row in reader:
-                    if not row:
-                        continue
-                    if row[0] == user.username:
-                        print("\nYou have already set up your availability.")
-                        print("Returning to the Mental Health Worker Options menu...\n")
-                        return
-        except FileNotFoundError:
-            print(f"\nError: File '{file_path}' not found.")
-            return
-        except Exception as e:
-            print(f"\nError reading the file: {e}")
+    try:
+        existing_schedule = read_schedule(file_path, [user.username])
+        if not existing_schedule.empty:
+            print("\nYou have already set up your availability.")
+            print("Returning to the Mental Health Worker Options menu...\n")
             return
+    except Exception as e:
+        print(f"\nError reading the schedule: {e}")
+        return
     print("\nDay Index Reference:")
     print("Monday (0), Tuesday (1), Wednesday (2), Thursday (3), Friday (4), Saturday (5), Sunday (6)")
     while True:
@@ -140,31 +121,11 @@ def setup_mhwp_schedule(user,file_path=SCHEDULE_DATA_PATH): # choice 1, setup av
     print("\nYour updated schedule (applying changes to all selected weekdays):")
     print(tabulate(rows, headers=headers, tablefmt="grid"))
 
-    updated_data = []
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                try:
-                    current_headers = next(reader)
-                except StopIteration:
-                    print("\nError: The schedule file is empty. Writing new data...")
-                    current_headers = headers
-                if current_headers != headers:
-                    print("\nError: The file has incorrect headers.")
-                    return
-                updated_data = [
-                    row for row in reader if row and row[0] != user.username
-                ]
-        except Exception as e:
-            print(f"\nError reading the file: {e}")
-            return
-    updated_data.extend(rows)
+    # Without a weekly template these days are stored as schedule exceptions
+    new_rows = pd.DataFrame(rows, columns=headers)
     try:
-        with open(file_path, "w", newline='', encoding="utf-8") as file:
-            writer = csv.writer(file)
-            writer.writerow(headers)
-            writer.writerows(updated_data)
+        write_schedule(new_rows, file_path)
+        refresh_capacity(read_schedule(file_path, [user.username]), [user.username])
         print(f"\nYour schedule has been saved successfully.")
     except Exception as e:
         print(f"\nError writing to the file: {e}")
@@ -174,17 +135,20 @@ def update_appointment_status(selected_appointment, action, appointments_file=AP
     Updates the status of the selected appointment in appointments.csv.
     """
     try:
-        appointments_df = pd.read_csv(appointments_file)
-        appointment_filter = (
-            (appointments_df['patient_username'] == selected_appointment['patient_username']) &
-            (appointments_df['mhwp_username'] == selected_appointment['mhwp_username']) &
-            (appointments_df['date'] == selected_appointment['date']) &
-            (appointments_df['timeslot'] == selected_appointment['timeslot'])
-        )
+        # Read and rewrite under the table lock, so the background sweeps can't interleave
+        with table_lock(appointments_file):
+            appointments_df = read_table(appointments_file)
+            appointment_filter = (
+                (appointments_df['patient_username'] == selected_appointment['patient_username']) &
+                (appointments_df['mhwp_username'] == selected_appointment['mhwp_username']) &
+                (appointments_df['date'] == selected_appointment['date']) &
+                (appointments_df['timeslot'] == selected_appointment['timeslot'])
+            )
+            if appointment_filter.any():
+                new_status = "confirmed" if action == "confirm" else "cancelled"
+                appointments_df.loc[appointment_filter, 'status'] = new_status
+                write_table(appointments_df, appointments_file, index=False)
         if appointment_filter.any():
-            new_status = "confirmed" if action == "confirm" else "cancelled"
-            appointments_df.loc[appointment_filter, 'status'] = new_status
-            appointments_df.to_csv(appointments_file, index=False)
             print(f"Appointment successfully {action}ed!")
         else:
             print("Appointment not found.")
@@ -195,28 +159,21 @@ def update_appointment_status(selected_appointment, action, appointments_file=AP
 
 def update_schedule(selected_appointment, action, schedule_file=SCHEDULE_DATA_PATH):
     """
-    Updates the schedule for the selected appointment in mhwp_schedule.csv.
+    Updates the schedule slot of the selected appointment (see utils/schedule_store.py).
     """
     try:
-        schedule_df = pd.read_csv(schedule_file)
-        time_slot_column = [col for col in schedule_df.columns if selected_appointment['timeslot'] in col]
+        mhwp_username, date = selected_appointment['mhwp_username'], selected_appointment['date']
+        time_slot_column = slot_column(selected_appointment['timeslot'], schedule_file)
         if not time_slot_column:
             print(f"Time slot '{selected_appointment['timeslot']}' is invalid.")
             return
-        time_slot_column = time_slot_column[0]
-        schedule_filter = (
-            (schedule_df['mhwp_username'] == selected_appointment['mhwp_username']) &
-            (schedule_df['Date'] == selected_appointment['date'])
-        )
+        previous = (day_availability(mhwp_username, date, schedule_file) or {}).get(time_slot_column)
         # Update schedule based on action
-        if action == "confirm":
-            schedule_df.loc[schedule_filter, time_slot_column] = "●"  # Mark as confirmed
-        elif action == "cancel":
-            schedule_df.loc[schedule_filter, time_slot_column] = "■"  # Mark as available
-        schedule_df.to_csv(schedule_file, index=False)
+        new_glyph = "●" if action == "confirm" else "■"  # Confirmed, or available again
+        update_slots([(mhwp_username, date, time_slot_column, new_glyph)], schedule_file)
+        if previous is not None:
+            adjust_capacity(mhwp_username, previous, new_glyph)
         print(f"Schedule updated: time slot '{selected_appointment['timeslot']}' updated for {action}.")
-    except FileNotFoundError:
-        print("Error: mhwp_schedule.csv not found.")
     except Exception as e:
         print(f"Error updating schedule: {e}")
 
@@ -309,31 +266,29 @@ def list_appointments_for_mhw(mhw_username, file_path=APPOINTMENTS_DATA_PATH):
         return appointments
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            today = datetime.today().date()
-            for row in reader:
-                appointment_date=datetime.strptime(row['date'], "%Y/%m/%d").date()
-                if (
-                    row['mhwp_username'] == mhw_username and
-                    appointment_date >= today and
-                    row['status'] in ["pending", "confirmed"]
-                ):
-                    appointments.append(row)
-            appointments.sort(key=lambda x: (x['date'], x['timeslot']))
+        today = datetime.today().date()
+        for row in read_records(file_path):
+            appointment_date=datetime.strptime(row['date'], "%Y/%m/%d").date()
+            if (
+                row['mhwp_username'] == mhw_username and
+                appointment_date >= today and
+                row['status'] in ["pending", "confirmed"]
+            ):
+                appointments.append(row)
+        appointments.sort(key=lambda x: (x['date'], x['timeslot']))
 
-            # Check if any appointments were found
-            if not appointments:
-                print(f"\nNo appointments found for {mhw_username}")
-                return appointments
-            # Only print table if records exist
-            print("\nAppointments for MHW:", mhw_username)
-            print("------------------------------------------------------------------")
-            print("No. | Patient      | Date       | Start - End    | Status")
-            print("------------------------------------------------------------------")
-            for idx, row in enumerate(appointments, start=1):
-                print(
-                    f"{idx:2d} | {row['patient_username']:<10} | {row['date']} | {row['timeslot']} | {row['status']}")
+        # Check if any appointments were found
+        if not appointments:
+            print(f"\nNo appointments found for {mhw_username}")
+            return appointments
+        # Only print table if records exist
+        print("\nAppointments for MHW:", mhw_username)
+        print("------------------------------------------------------------------")
+        print("No. | Patient      | Date       | Start - End    | Status")
+        print("------------------------------------------------------------------")
+        for idx, row in enumerate(appointments, start=1):
+            print(
+                f"{idx:2d} | {row['patient_username']:<10} | {row['date']} | {row['timeslot']} | {row['status']}")
     except Exception as e:
         print(f"Error reading appointments: {str(e)}")
     return appointments
@@ -1,4 +1,3 @@
-import os
 import csv
 import calendar
 import pandas as pd
@@ -8,8 +7,22 @@ import pandas as pd
 from datetime import datetime, timedelta
 from utils.notification import send_email_notification, get_email_by_username
 from config import *
+from .schedule_session import ScheduleSession
+from .bulk_availability import day_mask, set_slots, print_conflicts
+from utils.schedule_store import schedule_exists
+from utils.instrumentation import instrument
 
+@instrument
 def handle_modify_availibility(user, file_path=SCHEDULE_DATA_PATH): # choice 2, handle modify availability
+    if not schedule_exists(file_path):
+        print("Error: No schedule found. Please set up your schedule template first.")
+        return
+    # Edits are collected in the session and saved together when this menu closes
+    with ScheduleSession(user.username, file_path) as session:
+        _modify_availability_menu(user, session)
+
+
+def _modify_availability_menu(user, session):
     while True:
         print("\nModify Your Availability Options:")
         print("1. Take a Leave (Adjust availability for specific dates)")
@@ -20,13 +33,8 @@ def handle_modify_availibility(user, file_path=SCHEDULE_DATA_PATH): # choice 2,
         modify_choice = input("Select an option (1-3): ").strip()
         if modify_choice == '1':  # Take a Leave
             try:
-                # Check if the schedule file exists
-                if not os.path.exists(file_path):
-                    print(f"Error: Schedule file '{file_path}' not found. Please set up your schedule first.")
-                    continue
-
-                # Load the schedule file
-                schedule_df = pd.read_csv(file_path, encoding="utf-8")
+                # Working copy of the schedule, with the edits not saved yet
+                schedule_df = session.frame()
 
                 # Filter schedules for the current user (case-insensitive matching)
                 user_schedule = schedule_df[schedule_df['mhwp_username'].str.lower() == user.username.lower()]
@@ -70,33 +78,24 @@ def handle_modify_availibility(user, file_path=SCHEDULE_DATA_PATH): # choice 2,
                     else:
                         break
 
-                # Modify availability for the selected dates
-                for date in leave_dates:
-                    if date in user_schedule['Date'].values:
-                        schedule_df.loc[
-                            (schedule_df['mhwp_username'].str.lower() == user.username.lower()) &
-                            (schedule_df['Date'] == date),
-                            schedule_df.columns[3:]  # Adjust all time slots
-                        ] = "□"  # Mark all time slots as unavailable
-
-                # Save the updated schedule
-                schedule_df.to_csv(file_path, index=False)
+                # Mark every free slot of the selected dates unavailable; booked slots are kept and listed
+                rows = day_mask(schedule_df, user_schedule['mhwp_username'].unique(), dates=leave_dates)
+                _, conflicts = set_slots(schedule_df, rows)
+                print_conflicts(conflicts)
+
+                # Queue the updated slots; they are saved when you leave this menu
+                session.stage(schedule_df, [user.username])
                 print(
                     "\nYour availability has been updated. All available slots for the selected dates are now unavailable.")
 
-            except FileNotFoundError:
-                print(f"Error: File '{file_path}' not found.")
             except Exception as e:
                 print(f"Error processing leave request: {str(e)}")
 
 
         elif modify_choice == '2':  # Change Time Slots
             try:
-                if not os.path.exists(file_path):
-                    print(f"Error: Schedule file '{file_path}' not found. Please set up your schedule first.")
-                    continue
-                # load file
-                schedule_df = pd.read_csv(file_path, encoding="utf-8")
+                # working copy of the schedule, with the edits not saved yet
+                schedule_df = session.frame()
                 #obtain current user's schedule
                 user_schedule = schedule_df[schedule_df['mhwp_username'].str.lower() == user.username.lower()]
                 # check if current user sets schedule
@@ -188,9 +187,9 @@ def handle_modify_availibility(user, file_path=SCHEDULE_DATA_PATH): # choice 2,
                     # swap
                     matching_row[current_slot], matching_row[target_slot] = "□", "■"
                 # update time slots
-                schedule_df.update(pd.DataFrame(updated_user_schedule))
-                schedule_df.to_csv(file_path, index=False)
-                print("\nYour updated time slots have been saved successfully!")
+                schedule_df.update(pd.DataFrame(updated_user_schedule, index=user_schedule.index))
+                session.stage(schedule_df, [user.username])
+                print("\nYour updated time slots will be saved when you leave this menu.")
                 print("\nUpdated Schedule (After Modifications):")
                 updated_user_schedule_display = schedule_df[
                     schedule_df['mhwp_username'].str.lower() == user.username.lower()]
@@ -200,11 +199,8 @@ def handle_modify_availibility(user, file_path=SCHEDULE_DATA_PATH): # choice 2,
 
         elif modify_choice == '3':  # Add Available Timeslot
             try:
-                if not os.path.exists(file_path):
-                    print(f"Error: Schedule file '{file_path}' not found. Please set up your schedule first.")
-                    continue
-                # Load the schedule file
-                schedule_df = pd.read_csv(file_path, encoding="utf-8")
+                # Working copy of the schedule, with the edits not saved yet
+                schedule_df = session.frame()
 
                 # Obtain current user's schedule
                 user_schedule = schedule_df[schedule_df['mhwp_username'].str.lower() == user.username.lower()]
@@ -266,9 +262,9 @@ def handle_modify_availibility(user, file_path=SCHEDULE_DATA_PATH): # choice 2,
                             print(f"Invalid index. Please enter a valid index between 0 and {len(time_slots) - 1}.")
                     except ValueError:
                         print("Invalid input. Please enter a valid index as an integer.")
-                # Save the updated schedule
-                schedule_df.to_csv(file_path, index=False)
-                print("\nYour updated schedule has been saved successfully!")
+                # Queue the updated slot; it is saved when you leave this menu
+                session.stage(schedule_df, [user.username])
+                print("\nYour updated schedule will be saved when you leave this menu.")
                 print("\nUpdated Schedule (After Modifications):")
                 updated_user_schedule_display = schedule_df[
                     schedule_df['mhwp_username'].str.lower() == user.username.lower()]
@@ -0,0 +1,123 @@
+import os
+import pandas as pd
+from datetime import datetime
+from config import *
+from utils.data_store import read_table, write_table
+from utils.schedule_store import read_schedule, schedule_exists
+from utils.table_lock import table_lock
+
+# Schedule glyphs and the capacity column each one is counted in
+SLOT_GLYPHS = {
+    "■": "free_slots",
+    "▲": "booked_slots",
+    "●": "confirmed_slots"
+}
+CAPACITY_COLUMNS = ["mhwp_username", "free_slots", "booked_slots", "confirmed_slots", "updated"]
+
+
+def summarize_capacity(schedule_df, mhwps=None, today=None):
+    """
+    Count free, booked and confirmed slots per MHWP from an in-memory schedule, from today onwards.
+    :param schedule_df: Schedule frame (see utils/schedule_store.read_schedule)
+    :param mhwps: Optional list of MHWP usernames to summarize (default: all)
+    :return: DataFrame with one row per MHWP in CAPACITY_COLUMNS layout
+    """
+    if schedule_df.empty:
+        return pd.DataFrame(columns=CAPACITY_COLUMNS)
+
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    schedule_df = schedule_df if mhwps is None else schedule_df[schedule_df['mhwp_username'].isin(mhwps)]
+    dates = pd.to_datetime(schedule_df['Date'], format='%Y/%m/%d', errors='coerce')
+    upcoming = schedule_df[dates >= today]
+    slot_columns = [col for col in schedule_df.columns if '(' in col]
+
+    counts = pd.DataFrame({'mhwp_username': upcoming['mhwp_username']})
+    for glyph, column in SLOT_GLYPHS.items():
+        counts[column] = (upcoming[slot_columns] == glyph).sum(axis=1)
+    summary = counts.groupby('mhwp_username', as_index=False, observed=True).sum()
+
+    # MHWPs whose schedule is entirely in the past still get a row of zeros
+    names = schedule_df['mhwp_username'].unique() if mhwps is None else mhwps
+    missing = [name for name in names if name not in set(summary['mhwp_username'])]
+    if missing:
+        zeros = pd.DataFrame({'mhwp_username': missing})
+        for column in SLOT_GLYPHS.values():
+            zeros[column] = 0
+        summary = pd.concat([summary, zeros], ignore_index=True)
+
+    summary['updated'] = today.strftime('%Y/%m/%d')
+    return summary[CAPACITY_COLUMNS]
+
+
+def _read_capacity_file(capacity_path):
+    try:
+        return read_table(capacity_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=CAPACITY_COLUMNS)
+
+
+def refresh_capacity(schedule_df, mhwps=None, capacity_path=MHWP_CAPACITY_PATH):
+    """
+    Recompute capacity from a schedule the caller already has in memory and save it.
+    Only the rows of the given MHWPs are replaced; with mhwps=None the whole summary is rebuilt.
+    """
+    try:
+        summary = summarize_capacity(schedule_df, mhwps)
+        # Under the table's lock, so a booking's adjust_capacity can't be lost in between
+        with table_lock(capacity_path):
+            if mhwps is not None:
+                existing = _read_capacity_file(capacity_path)
+                existing = existing[~existing['mhwp_username'].isin(mhwps)]
+                summary = pd.concat([existing, summary], ignore_index=True) if not existing.empty else summary
+            write_table(summary.sort_values('mhwp_username'), capacity_path)
+    except Exception as e:
+        print(f"Error updating MHWP capacity: {e}")
+
+
+def adjust_capacity(mhwp_username, old_glyph, new_glyph, capacity_path=MHWP_CAPACITY_PATH):
+    """
+    Apply a single slot change (e.g. ■ -> ▲ when a slot is booked) to the capacity summary.
+    """
+    if old_glyph == new_glyph:
+        return
+    try:
+        with table_lock(capacity_path):
+            capacity = _read_capacity_file(capacity_path)
+            row = capacity['mhwp_username'] == mhwp_username
+            if not row.any():
+                return  # Rebuilt with the next schedule refresh
+            if old_glyph in SLOT_GLYPHS:
+                column = SLOT_GLYPHS[old_glyph]
+                capacity.loc[row, column] = (capacity.loc[row, column] - 1).clip(lower=0)
+            if new_glyph in SLOT_GLYPHS:
+                capacity.loc[row, SLOT_GLYPHS[new_glyph]] += 1
+            write_table(capacity, capacity_path)
+    except Exception as e:
+        print(f"Error updating MHWP capacity: {e}")
+
+
+def load_capacity(capacity_path=MHWP_CAPACITY_PATH, schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Load the capacity summary as a dict of MHWP username -> slot counts.
+    The summary is rebuilt from the schedule only if it has never been written.
+    """
+    if not os.path.exists(capacity_path):
+        if not schedule_exists(schedule_path):
+            return {}
+        refresh_capacity(read_schedule(schedule_path), capacity_path=capacity_path)
+    capacity = _read_capacity_file(capacity_path)
+    return {
+        row['mhwp_username']: {column: int(row[column]) for column in SLOT_GLYPHS.values()}
+        for row in capacity.to_dict('records')
+    }
+
+
+def rank_mhwps_by_capacity(mhwps, capacity=None, min_free=0):
+    """
+    Sort MHWPs by remaining free slots (most first), dropping those below min_free.
+    :return: List of (MHWP username, free slots) tuples
+    """
+    capacity = load_capacity() if capacity is None else capacity
+    ranked = [(mhwp, capacity.get(mhwp, {}).get('free_slots', 0)) for mhwp in mhwps]
+    ranked = [(mhwp, free) for mhwp, free in ranked if free >= min_free]
+    return sorted(ranked, key=lambda item: (-item[1], item[0]))
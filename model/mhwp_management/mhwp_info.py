@@ -1,5 +1,5 @@
-import pandas as pd
 from config import *
+from utils.data_store import read_table
 
 def handle_update_personal_info(user):
     while True:
@@ -20,7 +20,7 @@ def handle_update_personal_info(user):
                     print("Username cannot be empty.")
                     return
 
-                user_df = pd.read_csv(USER_DATA_PATH)
+                user_df = read_table(USER_DATA_PATH)
                 if new_username in user_df['username'].values:
                     print("Username already exists. Please choose a different one.")
                     return
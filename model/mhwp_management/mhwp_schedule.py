@@ -5,115 +5,25 @@ import pandas as pd
 from tabulate import tabulate
 from os.path import exists
 import pandas as pd
-from datetime import datetime, timedelta
 from . import *
 from config import *
+from utils.data_store import read_table, write_table
+from utils.schedule_store import read_schedule, compact_schedule
 from .mhwp_appointment import *
 from .mhwp_view_schedule import *   
 from .mhwp_availability import *
+from .mhwp_capacity import refresh_capacity
+from utils.instrumentation import instrument
 
-def update_mhwp_schedules(schedule_file=SCHEDULE_DATA_PATH, template_file=MHWP_SCHEDULE_TEMPLATE_PATH, silent=False):
+@instrument(max_reads_per_table=1, max_writes_per_table=1)
+def update_mhwp_schedules(schedule_file=SCHEDULE_DATA_PATH, silent=False):
     """
-    The main function is to update the schedule of mhwp.
+    Daily schedule upkeep. Schedules are computed from the weekly templates and their exceptions
+    (see utils/schedule_store.py), so there are no days to generate: past dates are dropped from
+    the exceptions log and the capacity summary is rebuilt for the days ahead.
     """
-    today = datetime.now()
-    #today and the next three weeks
-    week_starts = [
-        today,  
-        today + timedelta(weeks=1),  
-        today + timedelta(weeks=2), 
-        today + timedelta(weeks=3)   
-    ]
-    
-    # Read templates first
-    templates_df = pd.read_csv(template_file)
-    mhwp_users = templates_df['mhwp_username'].unique()
-    # Read existing schedules and clean past entries
-    existing_schedules = pd.DataFrame()
-    if os.path.exists(schedule_file):
-        existing_schedules = pd.read_csv(schedule_file)
-        existing_schedules['Date'] = pd.to_datetime(existing_schedules['Date'])
-        yesterday = today - timedelta(days=1)
-        existing_schedules = existing_schedules[existing_schedules['Date'] > yesterday]    
-    new_schedules = []
-    
-    for mhwp in mhwp_users:
-        # Check if username=mhwp_username
-        if not existing_schedules.empty:
-            mhwp_schedule = existing_schedules[existing_schedules['mhwp_username'] == mhwp].copy()
-        else:
-            mhwp_schedule = pd.DataFrame()
-
-        # Generate full four weeks if the mhwp does not have schedule
-        if mhwp_schedule.empty:
-            
-            start_date = today
-            end_date = week_starts[3] + timedelta(days=7)
-        else:
-            # Convert dates for comparison using loc
-            mhwp_schedule.loc[:, 'Date'] = pd.to_datetime(mhwp_schedule['Date'], format='%Y/%m/%d')
-            
-            # remain some information from the  first two weeks
-            keep_schedules = mhwp_schedule[mhwp_schedule['Date'] < week_starts[2]]
-            if not keep_schedules.empty:
-                new_schedules.extend(keep_schedules.to_dict('records'))            
-            # Check the third week and fourth week for appointments
-            for week_num in [2, 3]:
-                week_schedule = mhwp_schedule[
-                    (mhwp_schedule['Date'] >= week_starts[week_num]) & 
-                    (mhwp_schedule['Date'] < (week_starts[week_num] + timedelta(days=7)))
-                ]
-                
-                if not week_schedule.empty:
-                    has_appointments = week_schedule.iloc[:, 3:].isin(["●"]).any().any()
-                    if has_appointments:
-                        if not silent:
-                            print(f"\nWarning: Detected confirmed appointments for {mhwp} in Week {week_num + 1}")
-                            print(f"Please cancel appointments for {week_starts[week_num].strftime('%Y/%m/%d')} - {(week_starts[week_num] + timedelta(days=6)).strftime('%Y/%m/%d')}")
-                        return False
-            
-            # update some information (week 2 and 3)
-            start_date = week_starts[2] + timedelta(days=1)
-            end_date = week_starts[3] + timedelta(days=7)
-        
-        # form new schedules(mhwp) 
-        mhwp_templates = templates_df[templates_df['mhwp_username'] == mhwp].to_dict('records')
-        current_date = start_date
-        while current_date < end_date:
-            #Template is matched with  current weekday
-            day_template = next((t for t in mhwp_templates if int(t['weekday']) == current_date.weekday()), None)
-            if day_template:
-                schedule_entry = {
-                    'mhwp_username': mhwp,
-                    'Date': current_date.strftime("%Y/%m/%d"),
-                    'Day': current_date.strftime("%A")
-
-                }
-                for col in templates_df.columns:
-                    if '(' in col:
-                        schedule_entry[col] = day_template[col]
-                new_schedules.append(schedule_entry)
-            current_date += timedelta(days=1)
-    
-    # Get columns from schedule file if it exists, else from template
-    if os.path.exists(schedule_file):
-        schedule_columns = pd.read_csv(schedule_file, nrows=0).columns.tolist()
-    else:
-        schedule_columns = ['mhwp_username', 'Date', 'Day'] + [col for col in templates_df.columns if '(' in col]
-    
-    # Convert to DataFrame with correct columns
-    final_schedules = pd.DataFrame(new_schedules, columns=schedule_columns) if new_schedules else pd.DataFrame(columns=schedule_columns)
-    if not final_schedules.empty:  # Only process if there are schedules
-        final_schedules['Date'] = pd.to_datetime(final_schedules['Date'])
-        final_schedules = final_schedules.sort_values(['mhwp_username', 'Date'])
-        final_schedules = final_schedules.drop_duplicates(
-            subset=['mhwp_username', 'Date'],
-            keep='last'
-        )
-        final_schedules['Date'] = final_schedules['Date'].dt.strftime('%Y/%m/%d')
-
-    # Save sorted schedules (even if empty)
-    final_schedules.to_csv(schedule_file, index=False)
+    compact_schedule(schedule_file)
+    refresh_capacity(read_schedule(schedule_file))
     if not silent:
         print("\nSchedule updated successfully!")
     return True
@@ -122,7 +32,7 @@ def update_mhwp_schedules(schedule_file=SCHEDULE_DATA_PATH, template_file=MHWP_S
 def setup_mhwp_schedule_template(user, file_path=MHWP_SCHEDULE_TEMPLATE_PATH):
     existing_templates = []
     if os.path.exists(file_path):
-        templates_df = pd.read_csv(file_path)
+        templates_df = read_table(file_path)
         existing_templates = templates_df[templates_df['mhwp_username'] != user.username].to_dict('records')
 
     weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
@@ -210,9 +120,10 @@ def setup_mhwp_schedule_template(user, file_path=MHWP_SCHEDULE_TEMPLATE_PATH):
     
     # Save all templates
     template_df = pd.DataFrame(templates)
-    template_df.to_csv(file_path, index=False)
+    write_table(template_df, file_path, index=False)
 
 
+@instrument
 def handle_set_schedule(user):
     print("\nSchedule Management Options:")
     print("1. Set up your schedule template")
@@ -1,5 +1,4 @@
 import os
-import csv
 import calendar
 import pandas as pd
 from tabulate import tabulate
@@ -7,6 +6,8 @@ from os.path import exists
 import pandas as pd
 from datetime import datetime, timedelta
 from config import *
+from utils.data_store import read_table
+from utils.schedule_store import read_schedule, schedule_exists
 
 def display_upcoming_appointments(username, file_path=APPOINTMENTS_DATA_PATH):
     """
@@ -17,9 +18,7 @@ def display_upcoming_appointments(username, file_path=APPOINTMENTS_DATA_PATH):
         print(f"Error: Appointment file '{file_path}' not found.")
         return
     try:
-        appointments_df = pd.read_csv(file_path)
-        # Ensure date format matches the file
-        appointments_df['date'] = pd.to_datetime(appointments_df['date'], format="%Y/%m/%d")
+        appointments_df = read_table(file_path, parse_dates=True)
         # obtain the date(today)
         today = pd.to_datetime("today").normalize()
         # Show appointment information for the next 7 days
@@ -51,17 +50,15 @@ def display_current_schedule(username, file_path=SCHEDULE_DATA_PATH):
     The confirmed and pending appointments(MHWP) for the next week is printed
     Show the current schedule for the next month with pagination (mhwp).
     """
-    if not os.path.exists(file_path):
-        print(f"Error: Schedule file '{file_path}' not found.")
+    if not schedule_exists(file_path):
+        print("Error: No schedule found.")
         return
 
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            headers = next(reader) 
-            user_data = [row for row in reader if row[0] == username]
-            time_slots = [f"{hour}-{hour+1}{'am' if hour < 12 else 'pm'} ({i})" for i, hour in enumerate(range(set_start_hour, set_end_hour))]
-            headers = ["Date"] + ["Day"] +  time_slots
+        schedule_df = read_schedule(file_path, [username])
+        user_data = schedule_df.drop(columns=['mhwp_username']).values.tolist()
+        time_slots = [f"{hour}-{hour+1}{'am' if hour < 12 else 'pm'} ({i})" for i, hour in enumerate(range(set_start_hour, set_end_hour))]
+        headers = ["Date"] + ["Day"] +  time_slots
             
         if not user_data:
             print("\nNo available schedule found. Please set up your availability.")
@@ -0,0 +1,250 @@
+import os
+import csv
+import glob
+import itertools
+import threading
+import numpy as np
+from config import *
+from utils.schedule_store import read_schedule, day_availability, update_slots
+from utils.instrumentation import record_read, record_write
+from utils.table_lock import table_lock
+from .mhwp_capacity import refresh_capacity
+
+# Write-behind unit of work for schedule edits. A ScheduleSession reads the
+# schedule (see utils/schedule_store.py) once and hands out working copies. stage()
+# compares a copy with what the session last saw and queues the changed slots.
+# flush() then checks every queued change against the current schedule and records
+# them with one append to the exceptions log.
+#
+# A flush happens when the menu closes the session, after FLUSH_EVERY staged
+# edits, or FLUSH_SECONDS after the first unflushed edit. Each queued slot keeps
+# the value it had when it was read. A slot that changed on disk since then, for
+# example one that a patient booked meanwhile, is not overwritten; it is reported
+# as a conflict. Queued edits are also appended to a journal in
+# data/pending_edits/, one per session, named with the id of the process that
+# owns it. If the program stops before a flush, recover_schedule_edits() applies
+# the journal on the next start; journals of processes that are still running
+# belong to open sessions and are left alone.
+
+FLUSH_EVERY = 10
+FLUSH_SECONDS = 60
+JOURNAL_COLUMNS = ["mhwp_username", "Date", "slot", "old", "new"]
+
+_session_numbers = itertools.count(1)
+
+
+def _journal_dir(schedule_path):
+    return os.path.join(os.path.dirname(schedule_path), "pending_edits")
+
+
+def _journal_path(schedule_path, owner):
+    """A new session's journal, e.g. data/pending_edits/mhwp_schedule-mhwp1.4242.1.csv (process id 4242)."""
+    name = os.path.splitext(os.path.basename(schedule_path))[0]
+    return os.path.join(_journal_dir(schedule_path), f"{name}-{owner}.{os.getpid()}.{next(_session_numbers)}.csv")
+
+
+def _journal_pid(journal_path):
+    """Id of the process whose session writes a journal, or None for journals named without one."""
+    parts = os.path.splitext(os.path.basename(journal_path))[0].rsplit(".", 2)
+    return int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else None
+
+
+def _process_alive(pid):
+    """True if a process with this id is running on this machine."""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; open it instead
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Running under another user
+    return True
+
+
+def _slot_columns(schedule_df):
+    return [column for column in schedule_df.columns if "(" in column]
+
+
+def apply_slot_edits(edits, schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Apply queued slot edits to the schedule with one read and at most one write.
+    :param edits: Dict of (mhwp_username, Date, slot) -> (value when read, new value)
+    :return: List of conflicting (mhwp_username, Date, slot) keys that were not applied
+    """
+    if not edits:
+        return []
+    applied, conflicts = [], []
+    for (mhwp, date, slot), (old, new) in edits.items():
+        current = day_availability(mhwp, date, schedule_path) or {}
+        if current.get(slot) != old:
+            conflicts.append((mhwp, date, slot))  # Changed by someone else since it was read
+            continue
+        applied.append((mhwp, date, slot, new))
+    if applied:
+        update_slots(applied, schedule_path)
+        mhwps = sorted({mhwp for mhwp, _, _, _ in applied})
+        refresh_capacity(read_schedule(schedule_path, mhwps), mhwps)
+    return conflicts
+
+
+def _read_journal(journal_path):
+    """Fold a journal into edits: the first old value and the last new value of each slot."""
+    edits = {}
+    with open(journal_path, "r", encoding="utf-8", newline='') as file:
+        rows = list(csv.DictReader(file))
+    record_read(journal_path, len(rows))
+    for row in rows:
+        key = (row["mhwp_username"], row["Date"], row["slot"])
+        old = edits[key][0] if key in edits else row["old"]
+        edits[key] = (old, row["new"])
+    return {key: (old, new) for key, (old, new) in edits.items() if old != new}
+
+
+def recover_schedule_edits(schedule_path=SCHEDULE_DATA_PATH, silent=False):
+    """
+    Apply the journals of sessions that ended without flushing, then remove them.
+    Journals whose process is still running belong to open sessions and are skipped. Each journal is
+    recovered under its lock, so two programs starting together do not both apply it.
+    :return: Number of slot edits recovered
+    """
+    recovered = 0
+    for journal_path in sorted(glob.glob(os.path.join(_journal_dir(schedule_path), "*.csv"))):
+        pid = _journal_pid(journal_path)
+        if pid is not None and _process_alive(pid):
+            continue
+        with table_lock(journal_path):
+            if not os.path.exists(journal_path):
+                continue  # Recovered by another process meanwhile
+            edits = _read_journal(journal_path)
+            conflicts = apply_slot_edits(edits, schedule_path)
+            recovered += len(edits) - len(conflicts)
+            os.remove(journal_path)
+    if recovered and not silent:
+        print(f"Recovered {recovered} unsaved schedule edits.")
+    return recovered
+
+
+class ScheduleSession:
+    """
+    Collects one user's schedule edits in memory and writes them to the schedule file together.
+    Use as a context manager, or call close() when the menu exits.
+    """
+
+    def __init__(self, owner, schedule_path=SCHEDULE_DATA_PATH, flush_every=FLUSH_EVERY, flush_seconds=FLUSH_SECONDS):
+        self.owner = owner
+        self.schedule_path = schedule_path
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._journal_path = _journal_path(schedule_path, owner)
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._staged = 0
+        self._timer = None
+        self._stale = False
+        # Edits left by sessions of programs that stopped before flushing
+        recover_schedule_edits(schedule_path)
+        self._base = read_schedule(schedule_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def frame(self):
+        """
+        A working copy of the schedule with this session's edits applied. Change it, then pass it to stage().
+        After a flush, the next copy is read again from the file.
+        """
+        with self._lock:
+            if self._stale and not self._pending:
+                self._base = read_schedule(self.schedule_path)
+                self._stale = False
+            return self._base.copy()
+
+    def stage(self, schedule_df, mhwps):
+        """
+        Queue the slots of the given MHWPs that differ between a working copy and the session's schedule.
+        :return: Number of slots changed
+        """
+        with self._lock:
+            rows = self._base.index[self._base["mhwp_username"].isin(mhwps)]
+            slots = _slot_columns(self._base)
+            before = self._base.loc[rows, slots].to_numpy()
+            after = schedule_df.loc[rows, slots].to_numpy()
+            changed = list(zip(*np.nonzero(before != after)))
+            if not changed:
+                return 0
+            journal = []
+            for row, col in changed:
+                mhwp = str(self._base.at[rows[row], "mhwp_username"])
+                date = str(self._base.at[rows[row], "Date"])
+                key, new = (mhwp, date, slots[col]), after[row, col]
+                old = self._pending[key][0] if key in self._pending else before[row, col]
+                if new == old:
+                    self._pending.pop(key, None)  # Changed back to the stored value
+                else:
+                    self._pending[key] = (old, new)
+                journal.append([mhwp, date, slots[col], before[row, col], new])
+                self._base.at[rows[row], slots[col]] = new
+            self._write_journal(journal)
+            self._staged += 1
+            if self._staged >= self.flush_every:
+                self.flush()
+            elif self._timer is None and self.flush_seconds:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return len(changed)
+
+    def _write_journal(self, rows):
+        os.makedirs(os.path.dirname(self._journal_path), exist_ok=True)
+        new_file = not os.path.exists(self._journal_path)
+        with open(self._journal_path, "a", encoding="utf-8", newline='') as file:
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(JOURNAL_COLUMNS)
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        record_write(self._journal_path, len(rows))
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Write the queued edits to the schedule file.
+        :return: List of (mhwp_username, Date, slot) edits that conflicted with changes made since they were read
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._staged = 0
+            if not self._pending:
+                return []
+            conflicts = apply_slot_edits(self._pending, self.schedule_path)
+            self._pending = {}
+            self._stale = True
+            if os.path.exists(self._journal_path):
+                os.remove(self._journal_path)
+            if conflicts:
+                print("\nThese slots changed while you were editing them and were left as they are:")
+                for mhwp, date, slot in conflicts:
+                    print(f"  {date} {slot}")
+            return conflicts
+
+    def close(self):
+        """Flush the queued edits; call when the menu exits."""
+        return self.flush()
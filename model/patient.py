@@ -49,18 +49,22 @@ def handle_patient_menu(user):
                     while True:
                         print("\nBook/Cancel Appointment:")
                         print("1. Book an appointment")
-                        print("2. Cancel an appointment")
-                        print("3. Return to main menu")
+                        print("2. Book the earliest available slot")
+                        print("3. Cancel an appointment")
+                        print("4. Return to main menu")
 
-                        appointment_choice = input("Select an option (1/2/3): ").strip()
+                        appointment_choice = input("Select an option (1/2/3/4): ").strip()
 
                         if appointment_choice == "1":  # Book an appointment
-                            book_appointment_with_schedule(user, "data/mhwp_schedule.csv", "data/assignments.csv", "data/appointments.csv")
+                            book_appointment_with_schedule(user, SCHEDULE_DATA_PATH, ASSIGNMENTS_DATA_PATH, APPOINTMENTS_DATA_PATH)
 
-                        elif appointment_choice == "2":  # Cancel an appointment
-                            cancel_appointment_with_display(user, "data/mhwp_schedule.csv", "data/appointments.csv")
+                        elif appointment_choice == "2":  # Book from the earliest free slots
+                            book_earliest_available_slot(user, SCHEDULE_DATA_PATH, ASSIGNMENTS_DATA_PATH, APPOINTMENTS_DATA_PATH)
+
+                        elif appointment_choice == "3":  # Cancel an appointment
+                            cancel_appointment_with_display(user, SCHEDULE_DATA_PATH, APPOINTMENTS_DATA_PATH)
                 
-                        elif appointment_choice == "3":  # Return to main menu
+                        elif appointment_choice == "4":  # Return to main menu
                             print("Returning to main menu...")
                             break
                         
@@ -68,8 +72,8 @@ def handle_patient_menu(user):
                     while True:
                         display_upcoming_appointments_with_mhwp(
                             user.username, 
-                            "data/appointments.csv", 
-                            "data/assignments.csv"
+                            APPOINTMENTS_DATA_PATH, 
+                            ASSIGNMENTS_DATA_PATH
                         )
                 
                         print("\nPress '1' to return to the main menu.")
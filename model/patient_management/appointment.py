@@ -1,9 +1,7 @@
-import os
 import pandas as pd
 from tabulate import tabulate
 from services.comment import comment
 from utils.notification import send_email_notification, get_email_by_username
-import os
 from services.mood_tracking import MoodEntry
 from services.meditation import handle_search_meditation
 from services.comment import comment
@@ -14,34 +12,40 @@ from utils.notification import send_email_notification, get_email_by_username
 import pandas as pd
 from tabulate import tabulate  
 from os.path import exists
-import csv
 import pandas as pd
 from config import *
+from utils.data_store import read_table, write_table, append_table, read_records, read_matching_rows
+from utils.schedule_store import read_schedule, schedule_exists, day_availability, slot_column, update_slots
+from utils.assignment_store import get_assigned_mhwp
+from utils.appointment_archive import next_appointment_id
+from model.mhwp_management.mhwp_capacity import adjust_capacity
+from model.admin_management.slot_search import find_next_free_slots, display_next_free_slots
 from .patient_account import handle_account_management
 from .health_wellbeing import handle_health_wellbeing
+from utils.instrumentation import instrument
+from utils.table_lock import table_lock
 
+@instrument(max_reads_per_table=1)
 def display_mhwp_schedule_for_patient(user, schedule_file, assignments_file):
     """
     Display the current schedule for the assigned MHW for the next month.
     Allows the patient to select a date by its real-time ID.
+    :return: The selected day's schedule row, or None
     """
     try:
         print("\nNote: You can notify the Admin to change your MHWP before booking an appointment.")
         # Retrieve the assigned MHW for the patient
-        assignments = pd.read_csv(assignments_file, header=None, names=["patient_username", "mhwp_username"])
-        mhwp_record = assignments[assignments['patient_username'] == user.username]
-        if mhwp_record.empty:
+        mhwp_username = get_assigned_mhwp(user.username, assignments_file)
+        if not mhwp_username:
             print(f"No assigned MHW found for patient '{user.username}'.")
             return None
-        mhwp_username = mhwp_record.iloc[0]['mhwp_username']
 
-        # Load the schedule file
-        if not os.path.exists(schedule_file):
-            print(f"Error: Schedule file '{schedule_file}' not found.")
+        # Compute the MHW's schedule for the next month
+        if not schedule_exists(schedule_file):
+            print("Error: No schedules have been set up yet.")
             return None
 
-        schedule = pd.read_csv(schedule_file)
-        mhwp_schedule = schedule[schedule['mhwp_username'] == mhwp_username]
+        mhwp_schedule = read_schedule(schedule_file, [mhwp_username])
 
         if mhwp_schedule.empty:
             print(f"No schedule found for MHW '{mhwp_username}'.")
@@ -109,9 +113,9 @@ def display_mhwp_schedule_for_patient(user, schedule_file, assignments_file):
                 try:
                     date_id = int(date_id)
                     if 1 <= date_id <= len(mhwp_schedule):
-                        selected_date = mhwp_schedule.iloc[date_id - 1]['Date']
-                        print(f"You have selected the date: {selected_date}")
-                        return selected_date
+                        selected_row = mhwp_schedule.iloc[date_id - 1]
+                        print(f"You have selected the date: {selected_row['Date']}")
+                        return selected_row
                     else:
                         print("Invalid ID. Please try again.")
                 except ValueError:
@@ -162,6 +166,22 @@ def display_available_time_slots(schedule_row):
         print(f"Error displaying available time slots: {e}")
         return None
     
+def notify_mhwp_of_booking(user, mhwp_username, date, timeslot):
+    """
+    Email the MHW about a new booking.
+    """
+    mhwp_email = get_email_by_username(mhwp_username)
+    if mhwp_email:
+        subject = "New Appointment Booked"
+        message = (
+            f"Dear {mhwp_username},\n\n"
+            f"An appointment has been booked by {user.username} on {date} during {timeslot}.\n\n"
+            "Regards,\nBreeze Mental Health Support System"
+        )
+        send_email_notification(mhwp_email, subject, message)
+    else:
+        print("Error: Could not retrieve MHW's email address.")
+
 def select_time_slot_and_book(user, date, mhwp_username, available_slots, schedule_file, assignments_file, appointment_file):
     """
     Allow the user to select a time slot and book the appointment.
@@ -176,19 +196,7 @@ def select_time_slot_and_book(user, date, mhwp_username, available_slots, schedu
                 timeslot = selected_slot  # Retrieve the actual time slot
                 if book_appointment(user, date, timeslot, schedule_file, assignments_file, appointment_file):
                     print("Appointment booked successfully!")
-
-                    # Notify the MHW
-                    mhwp_email = get_email_by_username(mhwp_username)
-                    if mhwp_email:
-                        subject = "New Appointment Booked"
-                        message = (
-                            f"Dear {mhwp_username},\n\n"
-                            f"An appointment has been booked by {user.username} on {date} during {timeslot}.\n\n"
-                            "Regards,\nBreeze Mental Health Support System"
-                        )
-                        send_email_notification(mhwp_email, subject, message)
-                    else:
-                        print("Error: Could not retrieve MHW's email address.")
+                    notify_mhwp_of_booking(user, mhwp_username, date, timeslot)
                 else:
                     print("Failed to book the appointment.")
             else:
@@ -200,35 +208,28 @@ def select_time_slot_and_book(user, date, mhwp_username, available_slots, schedu
 
 
 
+# The schedule is read once to display it and once more by book_appointment, which
+# re-checks the slot against the current exceptions before writing (the second read
+# only happens if they changed in the meantime)
+@instrument(max_reads_per_table=2, max_writes_per_table=1)
 def book_appointment_with_schedule(user, schedule_file, assignments_file, appointment_file):
     """
     Main function to book an appointment through schedule navigation.
     """
     try:
-        selected_date = display_mhwp_schedule_for_patient(user, schedule_file, assignments_file)
-        if selected_date is None:
+        selected_row = display_mhwp_schedule_for_patient(user, schedule_file, assignments_file)
+        if selected_row is None:
             return  # User chose to return to the main menu
+        selected_date = selected_row['Date']
 
         # Retrieve the assigned MHW for the patient
-        assignments = pd.read_csv(assignments_file, header=None, names=["patient_username", "mhwp_username"])
-        mhwp_record = assignments[assignments['patient_username'] == user.username]
-        if mhwp_record.empty:
+        mhwp_username = get_assigned_mhwp(user.username, assignments_file)
+        if not mhwp_username:
             print(f"No assigned MHW found for patient '{user.username}'.")
             return
-        mhwp_username = mhwp_record.iloc[0]['mhwp_username']
-
-        # Load the MHW schedule for the selected date
-        schedule = pd.read_csv(schedule_file)
-        mhwp_schedule = schedule[
-            (schedule['mhwp_username'] == mhwp_username) & (schedule['Date'] == selected_date)
-        ]
-
-        if mhwp_schedule.empty:
-            print(f"No schedule found for MHW '{mhwp_username}' on {selected_date}.")
-            return
 
         # Display available time slots for the selected date
-        available_slots = display_available_time_slots(mhwp_schedule.iloc[0])
+        available_slots = display_available_time_slots(selected_row)
         if available_slots is None:
             return
 
@@ -241,99 +242,136 @@ def book_appointment_with_schedule(user, schedule_file, assignments_file, appoin
     except Exception as e:
         print(f"Unexpected error: {e}")
 
-def book_appointment(user, date, timeslot, schedule_file, assignments_file, appointment_file):
+@instrument(max_reads_per_table=2, max_writes_per_table=1)
+def book_earliest_available_slot(user, schedule_file, assignments_file, appointment_file, count=10):
     """
-    Allow a patient to book an appointment with their assigned MHW.
-    Updates mhwp_schedule.csv to mark the slot as booked (▲).
+    Show the earliest available slots of the patient's assigned MHW and book one of them,
+    instead of paging through the schedule. Also tells the patient when another MHWP
+    eligible for their symptoms is available sooner.
     """
     try:
-        # Retrieve assigned MHW from assignments.csv
-        try:
-            assignments = pd.read_csv(assignments_file, header=None, names=["patient_username", "mhwp_username"])
-            mhwp_record = assignments[assignments['patient_username'] == user.username]
-            if mhwp_record.empty:
-                print(f"No assigned MHW found for patient '{user.username}'.")
-                return False
-            mhwp_username = mhwp_record.iloc[0]['mhwp_username']
-        except FileNotFoundError:
-            print("Error: assignments.csv file not found.")
-            return False
+        mhwp_username = get_assigned_mhwp(user.username, assignments_file)
+        if not mhwp_username:
+            print(f"No assigned MHW found for patient '{user.username}'.")
+            return
 
-        # Check MHW's schedule in mhwp_schedule.csv
-        try:
-            schedule = pd.read_csv(schedule_file)
-            mhwp_schedule = schedule[(schedule['mhwp_username'] == mhwp_username) & (schedule['Date'] == date)]
-            
-            if mhwp_schedule.empty:
-                print(f"No schedule found for MHW '{mhwp_username}' on {date}.")
-                return False
+        if not schedule_exists(schedule_file):
+            print("Error: No schedules have been set up yet.")
+            return
 
-            # Find the correct time slot column in the schedule
-            time_slot_column = [col for col in schedule.columns if timeslot in col]
-            if not time_slot_column:
-                print(f"Time slot '{timeslot}' is invalid.")
-                return False
-            time_slot_column = time_slot_column[0]
+        slots = find_next_free_slots(count=count, mhwps=[mhwp_username], schedule_path=schedule_file)
+        if slots:
+            print(f"\nEarliest available slots of your MHW '{mhwp_username}':")
+            display_next_free_slots(slots)
+        else:
+            print(f"No available slots found for MHW '{mhwp_username}'.")
+
+        # Compare with the earliest slot across every MHWP eligible for the patient's symptoms
+        patient = read_matching_rows(PATIENTS_DATA_PATH, "username", user.username)
+        symptom = patient["symptoms"].iloc[0] if not patient.empty else None
+        if pd.notna(symptom) and symptom:
+            earliest = find_next_free_slots(str(symptom), count=1, schedule_path=schedule_file)
+            if earliest and earliest[0][1] != mhwp_username and (not slots or earliest[0][0] < slots[0][0]):
+                start, other_mhwp, _ = earliest[0]
+                print(f"\nNote: MHWP '{other_mhwp}' is available sooner, on {start.strftime('%Y/%m/%d')} at "
+                      f"{start.strftime('%H:%M')}. You can notify the Admin to change your MHWP.")
+        if not slots:
+            return
 
-            # Check if the time slot is available (■)
-            if not mhwp_schedule.iloc[0][time_slot_column] == "■":
-                print(f"The selected time slot '{timeslot}' is not available. Please choose another.")
-                return False
-        except FileNotFoundError:
-            print("Error: mhwp_schedule.csv file not found.")
-            return False
+        choice = input("\nEnter the number of the slot to book (blank to return): ").strip()
+        if not choice:
+            return
+        if not choice.isdigit() or not 1 <= int(choice) <= len(slots):
+            print("Invalid slot number. Please try again.")
+            return
+        start, _, slot = slots[int(choice) - 1]
+        date, timeslot = start.strftime("%Y/%m/%d"), slot.split(" ")[0]
+        if book_appointment(user, date, timeslot, schedule_file, assignments_file, appointment_file):
+            print("Appointment booked successfully!")
+            notify_mhwp_of_booking(user, mhwp_username, date, timeslot)
+        else:
+            print("Failed to book the appointment.")
 
-        # Check for conflicting appointments in appointments.csv
-        try:
-            appointments = pd.read_csv(appointment_file)
-        except FileNotFoundError:
-            appointments = pd.DataFrame(columns=["id", "patient_username", "mhwp_username", "date", "timeslot", "status"])
+    except Exception as e:
+        print(f"Unexpected error: {e}")
 
-        # Check for overlapping appointments
-        overlapping_appointment = appointments[
-            (appointments['mhwp_username'] == mhwp_username) &
-            (appointments['date'] == date) &
-            (appointments['timeslot'] == timeslot) &
-            (appointments['status'].isin(["pending", "confirmed"]))
+@instrument(max_reads_per_table=1, max_writes_per_table=1)
+def book_appointment(user, date, timeslot, schedule_file, assignments_file, appointment_file):
+    """
+    Allow a patient to book an appointment with their assigned MHW.
+    Records the slot as booked (▲) in the schedule exceptions.
+    """
+    try:
+        # Retrieve assigned MHW from the assignment store
+        mhwp_username = get_assigned_mhwp(user.username, assignments_file)
+        if not mhwp_username:
+            print(f"No assigned MHW found for patient '{user.username}'.")
+            return False
 
-        ]
-        if not overlapping_appointment.empty:
-            print(f"The selected time slot '{timeslot}' overlaps with an existing appointment. Please choose another.")
+        # Check the MHW's slots for that day
+        day_slots = day_availability(mhwp_username, date, schedule_file)
+        if day_slots is None:
+            print(f"No schedule found for MHW '{mhwp_username}' on {date}.")
             return False
 
-        # Generate a sequential ID for the appointment
-        if not appointments.empty:
-            last_id = appointments['id'].max()  # Get the highest current ID
-            appointment_id = last_id + 1
-        else:
-            appointment_id = 1
-
-        # Create a new appointment record
-        new_appointment = {
-            "id": appointment_id,
-            "patient_username": user.username,
-            "mhwp_username": mhwp_username,
-            "date": date,
-            "timeslot": timeslot,
-            "status": "pending"
-        }
-        appointment_df = pd.DataFrame([new_appointment])
+        # Find the correct time slot column in the schedule
+        time_slot_column = slot_column(timeslot, schedule_file)
+        if not time_slot_column:
+            print(f"Time slot '{timeslot}' is invalid.")
+            return False
 
-        # Append to the appointments file
-        try:
-            appointment_df.to_csv(appointment_file, mode='a', header=not os.path.exists(appointment_file), index=False)
-            print(f"Appointment successfully recorded for {user.username}.")
-        except Exception as e:
-            print(f"Error writing to appointments.csv: {e}")
+        # Check if the time slot is available (■)
+        if not day_slots[time_slot_column] == "■":
+            print(f"The selected time slot '{timeslot}' is not available. Please choose another.")
             return False
 
-        # Update mhwp_schedule.csv to mark the slot as booked (▲)
+        # Check, number and record the booking under appointments.csv's lock, so a concurrent booking
+        # or background sweep can't take the same slot or id in between
+        with table_lock(appointment_file):
+            # Check for conflicting appointments in appointments.csv
+            try:
+                appointments = read_table(appointment_file)
+            except FileNotFoundError:
+                appointments = pd.DataFrame(columns=["id", "patient_username", "mhwp_username", "date", "timeslot", "status"])
+
+            # Check for overlapping appointments
+            overlapping_appointment = appointments[
+                (appointments['mhwp_username'] == mhwp_username) &
+                (appointments['date'] == date) &
+                (appointments['timeslot'] == timeslot) &
+                (appointments['status'].isin(["pending", "confirmed"]))
+
+            ]
+            if not overlapping_appointment.empty:
+                print(f"The selected time slot '{timeslot}' overlaps with an existing appointment. Please choose another.")
+                return False
+
+            # Generate a sequential ID for the appointment, after the archived ones too
+            appointment_id = next_appointment_id(appointments, appointment_file)
+
+            # Create a new appointment record
+            new_appointment = {
+                "id": appointment_id,
+                "patient_username": user.username,
+                "mhwp_username": mhwp_username,
+                "date": date,
+                "timeslot": timeslot,
+                "status": "pending"
+            }
+            appointment_df = pd.DataFrame([new_appointment])
+
+            # Append to the appointments file
+            try:
+                append_table(appointment_df, appointment_file)
+                print(f"Appointment successfully recorded for {user.username}.")
+            except Exception as e:
+                print(f"Error writing to appointments.csv: {e}")
+                return False
+
+        # Record the slot as booked (▲)
         try:
-            schedule.loc[
-                (schedule['mhwp_username'] == mhwp_username) & (schedule['Date'] == date),
-                time_slot_column
-            ] = "▲"
-            schedule.to_csv(schedule_file, index=False)
+            update_slots([(mhwp_username, date, time_slot_column, "▲")], schedule_file)
+            adjust_capacity(mhwp_username, "■", "▲")
             print(f"Schedule updated: time slot '{timeslot}' is now booked.")
         except Exception as e:
             print(f"Error updating schedule: {e}")
@@ -347,29 +385,27 @@ def book_appointment(user, date, timeslot, schedule_file, assignments_file, appo
 
 
 
+@instrument(max_reads_per_table=2, max_writes_per_table=1)
 def cancel_appointment_with_display(user, schedule_file, appointment_file):
     """
     Allow a patient to view and cancel their upcoming appointments.
     """
     try:
         # Load appointments for the patient
-        appointments = pd.read_csv(appointment_file)
+        appointments = read_table(appointment_file, parse_dates=True)
         user_appointments = appointments[appointments['patient_username'] == user.username]
 
         if user_appointments.empty:
             print("No appointments found to cancel.")
             return
-
-        # Convert 'date' to datetime safely
         user_appointments = user_appointments.copy()  # Avoid SettingWithCopyWarning
-        user_appointments['date'] = pd.to_datetime(user_appointments['date'], format='%Y/%m/%d', errors='coerce')
 
         # Get today's date
         today = pd.Timestamp.now().normalize()  # Ensure it's a Timestamp
 
-        # Filter out cancelled appointments and keep only those from today onwards
+        # Filter out cancelled and completed appointments and keep only those from today onwards
         user_appointments = user_appointments[
-            (user_appointments['status'] != 'cancelled') &
+            (~user_appointments['status'].isin(['cancelled', 'completed'])) &
             (user_appointments['date'] >= today)
         ]
 
@@ -421,48 +457,47 @@ def cancel_appointment_with_display(user, schedule_file, appointment_file):
 
 
 
+@instrument(max_reads_per_table=1, max_writes_per_table=1)
 def cancel_appointment(user, appointment_id, schedule_file, appointment_file):
     """
     Allow a patient to cancel their appointment by appointment ID.
-    Updates mhwp_schedule.csv to mark the slot as available (■).
+    Records the slot as available (■) again in the schedule exceptions.
     """
     try:
-        # Load appointments.csv
-        appointments = pd.read_csv(appointment_file)
-        
-        # Ensure the appointment ID exists and matches the user
-        appointment_filter = (appointments['id'] == appointment_id) & \
-                             (appointments['patient_username'] == user.username)
+        # Read and rewrite appointments.csv under its lock, so the background sweeps can't interleave
+        with table_lock(appointment_file):
+            appointments = read_table(appointment_file)
 
-        if not appointment_filter.any():
-            print(f"No matching appointment found for appointment ID: {appointment_id}.")
-            return False
+            # Ensure the appointment ID exists and matches the user
+            appointment_filter = (appointments['id'] == appointment_id) & \
+                                 (appointments['patient_username'] == user.username)
 
-        # Retrieve appointment details
-        appointment_row = appointments.loc[appointment_filter].iloc[0]
-        mhwp_username = appointment_row['mhwp_username']
-        date = appointment_row['date']
-        timeslot = appointment_row['timeslot']
+            if not appointment_filter.any():
+                print(f"No matching appointment found for appointment ID: {appointment_id}.")
+                return False
 
-        # Cancel the appointment
-        appointments.loc[appointment_filter, 'status'] = 'cancelled'
-        appointments.to_csv(appointment_file, index=False)
+            # Retrieve appointment details
+            appointment_row = appointments.loc[appointment_filter].iloc[0]
+            mhwp_username = appointment_row['mhwp_username']
+            date = appointment_row['date']
+            timeslot = appointment_row['timeslot']
 
-        # Update mhwp_schedule.csv to mark the slot as available (■)
+            # Cancel the appointment
+            appointments.loc[appointment_filter, 'status'] = 'cancelled'
+            write_table(appointments, appointment_file, index=False)
+
+        # Mark the slot as available (■) again
         try:
-            schedule = pd.read_csv(schedule_file)
-            time_slot_column = [col for col in schedule.columns if timeslot in col]
+            time_slot_column = slot_column(timeslot, schedule_file)
             if not time_slot_column:
                 print(f"Time slot '{timeslot}' is invalid.")
                 return False
-            time_slot_column = time_slot_column[0]
 
-            schedule_filter = (schedule['mhwp_username'] == mhwp_username) & (schedule['Date'] == date)
-            schedule.loc[schedule_filter, time_slot_column] = "■"
-            schedule.to_csv(schedule_file, index=False)
+            previous = (day_availability(mhwp_username, date, schedule_file) or {}).get(time_slot_column)
+            update_slots([(mhwp_username, date, time_slot_column, "■")], schedule_file)
+            if previous is not None:
+                adjust_capacity(mhwp_username, previous, "■")
             print(f"Schedule updated: time slot '{timeslot}' is now available.")
-        except FileNotFoundError:
-            print("Error: mhwp_schedule.csv not found.")
         except Exception as e:
             print(f"Error updating schedule: {e}")
             return False
@@ -493,52 +528,41 @@ def display_upcoming_appointments_with_mhwp(patient_username, appointments_file,
         return
 
     try:
-        # Load assignments and retrieve MHW for the patient
-        with open(assignments_file, 'r', encoding='utf-8') as assignments_csv:
-            assignments = csv.DictReader(assignments_csv)
-            mhwp_username = None
-            for row in assignments:
-                if row['patient_username'] == patient_username:
-                    mhwp_username = row['mhwp_username']
-                    break
-
-            if not mhwp_username:
-                print(f"No assigned MHW found for patient '{patient_username}'.")
-                return
+        # Retrieve the assigned MHW for the patient
+        mhwp_username = get_assigned_mhwp(patient_username, assignments_file)
+        if not mhwp_username:
+            print(f"No assigned MHW found for patient '{patient_username}'.")
+            return
 
-        # Load appointments
-        with open(appointments_file, 'r', encoding='utf-8') as appointments_csv:
-            reader = csv.DictReader(appointments_csv)
-
-            # Filter upcoming appointments for the patient
-            today = pd.Timestamp.today().normalize()
-            next_week = today + pd.Timedelta(days=7)
-
-            appointments = []
-            for row in reader:
-                if (row['patient_username'] == patient_username and
-                        row['status'] in ['pending', 'confirmed']):
-                    appointment_date = pd.to_datetime(row['date'], format='%Y/%m/%d', errors='coerce')
-                    if today <= appointment_date <= next_week:
-                        appointments.append(row)
-
-            # Check if any appointments were found
-            if not appointments:
-                print("\nNo upcoming appointments found for the next week.")
-                return
+        # Load appointments and filter upcoming appointments for the patient.
+        # YYYY/MM/DD dates compare correctly as strings, so rows are not parsed.
+        today = pd.Timestamp.today().normalize()
+        today_str, next_week_str = today.strftime("%Y/%m/%d"), (today + pd.Timedelta(days=7)).strftime("%Y/%m/%d")
+
+        appointments = []
+        for row in read_records(appointments_file):
+            if (row['patient_username'] == patient_username and
+                    row['status'] in ['pending', 'confirmed'] and
+                    today_str <= row['date'] <= next_week_str):
+                appointments.append(row)
+
+        # Check if any appointments were found
+        if not appointments:
+            print("\nNo upcoming appointments found for the next week.")
+            return
 
-            # Sort appointments by date and timeslot
-            appointments.sort(key=lambda x: (x['date'], x['timeslot']))
-
-            # Display appointments
-            print(f"\nUpcoming Appointments for Patient '{patient_username}':")
-            print("-------------------------------------------------------------")
-            print("No. | Date       | Time Slot     | MHW         | Status")
-            print("-------------------------------------------------------------")
-            for idx, row in enumerate(appointments, start=1):
-                print(
-                    f"{idx:2d} | {row['date']} | {row['timeslot']:<13} | {row['mhwp_username']:<10} | {row['status']}")
-            print("-------------------------------------------------------------")
+        # Sort appointments by date and timeslot
+        appointments.sort(key=lambda x: (x['date'], x['timeslot']))
+
+        # Display appointments
+        print(f"\nUpcoming Appointments for Patient '{patient_username}':")
+        print("-------------------------------------------------------------")
+        print("No. | Date       | Time Slot     | MHW         | Status")
+        print("-------------------------------------------------------------")
+        for idx, row in enumerate(appointments, start=1):
+            print(
+                f"{idx:2d} | {row['date']} | {row['timeslot']:<13} | {row['mhwp_username']:<10} | {row['status']}")
+        print("-------------------------------------------------------------")
 
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
\ No newline at end of file
@@ -62,10 +62,10 @@ def display_mood_history(username):
     Display recent mood history for a patient
     """
     print("\nYour recent mood history:")
-    history = MoodEntry.get_user_mood_history(username)
+    history = MoodEntry.get_user_mood_history(username, limit=5)
     if not history.empty:
         print(tabulate(
-            history[['timestamp', 'color_code', 'comments']].head(),
+            history[['timestamp', 'color_code', 'comments']],
             headers=['Timestamp', 'Mood', 'Comments'],
             tablefmt='grid',
             showindex=False
@@ -1,5 +1,5 @@
-import pandas as pd
 from config import *
+from utils.data_store import read_table
 
 def handle_account_management(user):
     while True:
@@ -19,7 +19,7 @@ def handle_account_management(user):
                 if not new_username:
                     print("Username cannot be empty.")
                     continue
-                user_df = pd.read_csv(USER_DATA_PATH)
+                user_df = read_table(USER_DATA_PATH)
                 if new_username in user_df[user_df['username'] != user.username]['username'].values:
                     print("Username already exists. Please choose a different one.")
                     continue
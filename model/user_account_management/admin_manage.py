@@ -1,5 +1,6 @@
-import pandas as pd
 from config import USER_DATA_PATH, PATIENTS_DATA_PATH, MHWP_DATA_PATH
+from utils.data_store import read_table, write_table
+from utils.user_directory import rename_user
 from .user_update import UserUpdate
 
 class AdminManage:
@@ -10,7 +11,7 @@ class AdminManage:
         # Method for admin to update a user's information
         try:
         # Check whether the username is within the csv or not
-            user_df = pd.read_csv(USER_DATA_PATH)
+            user_df = read_table(USER_DATA_PATH)
             if target_username not in user_df['username'].values:
                 print("Target user does not exist.")
                 return False
@@ -19,14 +20,13 @@ class AdminManage:
             current_username = target_username
             changes_made = False
 
-        # The function would simultaneously change the info within user_data.csv and every csv which matches the username.
+        # Other csv files refer to the user by user_id, so a rename only changes the user's row in user_data.csv.
         # A username would only be allowed to register for a singel role, such as a can't be registered as a MHWP and patient.
             if new_username and new_username != target_username:
                 if new_username in user_df['username'].values:
                     print("New username is already in use.")
                     return False
-        #call the function within the userupdate.file, searching for all csv
-                if not self.update_username_in_files(target_username, new_username, user_role):
+                if not rename_user(target_username, new_username):
                     return False
                 current_username = new_username
                 changes_made = True
@@ -56,7 +56,7 @@ class AdminManage:
         # admin also can delete users, and the information would be deleted from user_data.csv and MHWP.csv or patient.csv.
         # It depends on the character, as our discussion we would like to keep some record
         try:
-            user_df = pd.read_csv(USER_DATA_PATH)
+            user_df = read_table(USER_DATA_PATH)
             if username not in user_df['username'].values:
                 print("User does not exist.")
                 return False
@@ -64,19 +64,20 @@ class AdminManage:
             target_role = user_df[user_df['username'] == username]['role'].values[0]
             print(f"Deleting {target_role} user: {username}")
 
-            user_df = user_df[user_df['username'] != username]
-            user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
-            print("Deleted from user_data.csv successfully")
-
             if target_role == "patient":
-                patient_df = pd.read_csv(PATIENTS_DATA_PATH)
+                patient_df = read_table(PATIENTS_DATA_PATH)
                 patient_df = patient_df[patient_df['username'] != username]
-                patient_df.to_csv(PATIENTS_DATA_PATH, index=False, na_rep='')
+                write_table(patient_df, PATIENTS_DATA_PATH, index=False, na_rep='')
                     
             elif target_role == "mhwp":
-                mhwp_df = pd.read_csv(MHWP_DATA_PATH)
+                mhwp_df = read_table(MHWP_DATA_PATH)
                 mhwp_df = mhwp_df[mhwp_df['username'] != username]
-                mhwp_df.to_csv(MHWP_DATA_PATH, index=False, na_rep='')
+                write_table(mhwp_df, MHWP_DATA_PATH, index=False, na_rep='')
+
+            # Remove the user from user_data.csv last so the role file can still resolve the user's id
+            user_df = user_df[user_df['username'] != username]
+            write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
+            print("Deleted from user_data.csv successfully")
                     
             print(f"User '{username}' and all related records deleted successfully.")
             
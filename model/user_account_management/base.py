@@ -1,6 +1,6 @@
 import hashlib
-import pandas as pd
 from config import USER_DATA_PATH
+from utils.data_store import read_table
 class UserBase:
     def __init__(self, username, password, role, email=None, emergency_email=None, symptoms=None, major=None):
         self.username = username
@@ -21,7 +21,7 @@ class UserBase:
     def check_if_exists(self):
         """Check if user exists in CSV."""
         try:
-            df = pd.read_csv(USER_DATA_PATH)
+            df = read_table(USER_DATA_PATH)
             return self.username in df['username'].values
         except FileNotFoundError:
             return False
\ No newline at end of file
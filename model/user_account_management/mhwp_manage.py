@@ -1,6 +1,7 @@
 import pandas as pd
 from datetime import datetime
 from config import MHWP_DATA_PATH
+from utils.data_store import read_table, write_table
 
 class MhwpManage:
     """
@@ -15,7 +16,7 @@ class MhwpManage:
     def check_mhwp_record_exists(self, mhwp_data_path=MHWP_DATA_PATH):
         """Check if the MHWP record already exists."""
         try:
-            df = pd.read_csv(mhwp_data_path)
+            df = read_table(mhwp_data_path)
             return self.username in df['username'].values
         except FileNotFoundError:
             return False
@@ -32,16 +33,15 @@ class MhwpManage:
                 return False
             
             try:
-                df = pd.read_csv(mhwp_data_path)
+                df = read_table(mhwp_data_path)
             except FileNotFoundError:
                 df = pd.DataFrame(columns=[
-                    "username", "assigned_patients", "account_status",
+                    "username", "account_status",
                     "registration_date", "email", "emergency_email", "major"
                 ])
 
             new_mhwp = pd.DataFrame({
                 "username": [self.username],
-                "assigned_patients": [""],
                 "account_status": ["active"],
                 "registration_date": [datetime.now().strftime("%Y-%m-%d")],
                 "email": [self.email if self.email else ""],
@@ -50,7 +50,7 @@ class MhwpManage:
             })
 
             df = pd.concat([df, new_mhwp], ignore_index=True)
-            df.to_csv(mhwp_data_path, index=False, na_rep='')
+            write_table(df, mhwp_data_path, index=False, na_rep='')
             print("MHWP record initialized successfully.")
             return True
 
@@ -65,13 +65,13 @@ class MhwpManage:
             return False
             
         try:
-            df = pd.read_csv(mhwp_data_path)
+            df = read_table(mhwp_data_path)
             if mhwp_username not in df['username'].values:
                 print("MHWP record not found.")
                 return False
                 
             df.loc[df['username'] == mhwp_username, 'major'] = major
-            df.to_csv(mhwp_data_path, index=False)
+            write_table(df, mhwp_data_path, index=False)
             print(f"Major updated for MHWP {mhwp_username}")
             return True
             
@@ -90,13 +90,13 @@ class MhwpManage:
             return False
             
         try:
-            df = pd.read_csv(mhwp_data_path)
+            df = read_table(mhwp_data_path)
             if mhwp_username not in df['username'].values:
                 print("MHWP record not found.")
                 return False
                 
             df.loc[df['username'] == mhwp_username, 'account_status'] = status
-            df.to_csv(mhwp_data_path, index=False)
+            write_table(df, mhwp_data_path, index=False)
             print(f"MHWP account {mhwp_username} status updated to {status}")
             return True
             
@@ -1,6 +1,8 @@
 import pandas as pd
 from datetime import datetime
-from config import PATIENTS_DATA_PATH
+from config import PATIENTS_DATA_PATH, ASSIGNMENTS_DATA_PATH
+from utils.data_store import read_table, write_table
+from utils.assignment_store import assign_patient
 
 class PatientManage:
     """
@@ -29,7 +31,7 @@ class PatientManage:
             Uses the patient's username to check existence in the CSV file.
         """
         try:
-            df = pd.read_csv(patient_data_path)
+            df = read_table(patient_data_path)
             return self.username in df['username'].values
         except FileNotFoundError:
             return False
@@ -54,7 +56,6 @@ class PatientManage:
 
         Fields initialized:
         - username
-        - assigned_mhwp (empty initially)
         - account_status (active by default)
         - registration_date (current date)
         - email
@@ -74,18 +75,17 @@ class PatientManage:
             
             # Load or create patient data file
             try:
-                df = pd.read_csv(patient_data_path)
+                df = read_table(patient_data_path)
             except FileNotFoundError:
                 # Initialize new DataFrame with required columns
                 df = pd.DataFrame(columns=[
-                    "username", "assigned_mhwp", "account_status",
+                    "username", "account_status",
                     "registration_date", "email", "emergency_email", "symptoms"
                 ])
 
             # Create new patient record
             new_patient = pd.DataFrame({
                 "username": [self.username],
-                "assigned_mhwp": [""],  # Empty initially
                 "account_status": ["active"],  # Default status
                 "registration_date": [datetime.now().strftime("%Y-%m-%d")],
                 "email": [self.email if self.email else ""],
@@ -95,7 +95,7 @@ class PatientManage:
 
             # Add new record and save
             df = pd.concat([df, new_patient], ignore_index=True)
-            df.to_csv(patient_data_path, index=False, na_rep='')
+            write_table(df, patient_data_path, index=False, na_rep='')
             print("Patient record initialized successfully.")
             return True
 
@@ -132,14 +132,14 @@ class PatientManage:
             
         try:
             # Load and update patient data
-            df = pd.read_csv(patient_data_path)
+            df = read_table(patient_data_path)
             if patient_username not in df['username'].values:
                 print("Patient record not found.")
                 return False
                 
             # Update status and save
             df.loc[df['username'] == patient_username, 'account_status'] = status
-            df.to_csv(patient_data_path, index=False)
+            write_table(df, patient_data_path, index=False)
             status_text = "frozen" if status == "yes" else "activated"
             print(f"Patient account {patient_username} has been {status_text}")
             return True
@@ -148,7 +148,8 @@ class PatientManage:
             print(f"Error updating patient status: {str(e)}")
             return False
 
-    def update_patient_mhwp(self, patient_username, mhwp_username, patient_data_path=PATIENTS_DATA_PATH):
+    def update_patient_mhwp(self, patient_username, mhwp_username, patient_data_path=PATIENTS_DATA_PATH,
+                            assignments_path=ASSIGNMENTS_DATA_PATH):
         """
         Assign or update MHWP for a patient.
         Admin-only function.
@@ -164,6 +165,7 @@ class PatientManage:
         Notes:
             - Only admins can perform this operation
             - Updates existing MHWP assignment if one exists
+            - The assignment is appended to the assignment store; patients.csv is not rewritten
         """
         # Verify admin privileges
         if self.role != "admin":
@@ -171,15 +173,14 @@ class PatientManage:
             return False
             
         try:
-            # Load and update patient data
-            df = pd.read_csv(patient_data_path)
+            # Check the patient exists
+            df = read_table(patient_data_path)
             if patient_username not in df['username'].values:
                 print("Patient record not found.")
                 return False
                 
-            # Update MHWP assignment and save
-            df.loc[df['username'] == patient_username, 'assigned_mhwp'] = mhwp_username
-            df.to_csv(patient_data_path, index=False)
+            # Record the MHWP assignment
+            assign_patient(patient_username, mhwp_username, assignments_path)
             print(f"MHWP {mhwp_username} assigned to patient {patient_username}")
             return True
             
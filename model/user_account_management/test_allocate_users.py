@@ -5,6 +5,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from config import *
+from utils.data_store import write_table
 
 MAJORS = [
     "Emotional Management",
@@ -28,51 +29,46 @@ def allocate_users(user_data_path=USER_DATA_PATH,
     # Read user data
     users_df = pd.read_csv(user_data_path)
     
-    # Initialize MHWP dataframe
-    mhwp_df = pd.DataFrame(columns=[
-        "username", "assigned_patients", "account_status",
-        "registration_date", "email", "emergency_email", "major"
-    ])
-    
-    # Initialize Patient dataframe
-    patient_df = pd.DataFrame(columns=[
-        "username", "assigned_mhwp", "account_status",
-        "registration_date", "email", "emergency_email", "symptoms"
-    ])
-    
-    # Process each user
-    for _, user in users_df.iterrows():
+    # Collect the role records first and build each table once
+    today = datetime.now().strftime("%Y-%m-%d")
+    mhwp_records, patient_records = [], []
+    for user in users_df.to_dict('records'):
         if user['role'] == 'mhwp':
-            new_mhwp = {
+            mhwp_records.append({
                 "username": user['username'],
-                "assigned_patients": "",
                 "account_status": "active",
-                "registration_date": datetime.now().strftime("%Y-%m-%d"),
+                "registration_date": today,
                 "email": user['email'],
                 "emergency_email": user['emergency_email'],
                 "major": random.choice(MAJORS)
-            }
-            mhwp_df = pd.concat([mhwp_df, pd.DataFrame([new_mhwp])], ignore_index=True)
+            })
             
         elif user['role'] == 'patient':
             # Random number of conditions (1-3)
             num_conditions = random.randint(1, 3)
             selected_conditions = random.sample(CONDITIONS, num_conditions)
             
-            new_patient = {
+            patient_records.append({
                 "username": user['username'],
-                "assigned_mhwp": "",
                 "account_status": "active",
-                "registration_date": datetime.now().strftime("%Y-%m-%d"),
+                "registration_date": today,
                 "email": user['email'],
                 "emergency_email": user['emergency_email'],
                 "symptoms": ",".join(selected_conditions)
-            }
-            patient_df = pd.concat([patient_df, pd.DataFrame([new_patient])], ignore_index=True)
+            })
+
+    mhwp_df = pd.DataFrame(mhwp_records, columns=[
+        "username", "account_status",
+        "registration_date", "email", "emergency_email", "major"
+    ])
+    patient_df = pd.DataFrame(patient_records, columns=[
+        "username", "account_status",
+        "registration_date", "email", "emergency_email", "symptoms"
+    ])
     
     # Save to files
-    mhwp_df.to_csv(mhwp_data_path, index=False)
-    patient_df.to_csv(patient_data_path, index=False)
+    write_table(mhwp_df, mhwp_data_path)
+    write_table(patient_df, patient_data_path)
     
     print(f"Allocated {len(mhwp_df)} MHWPs and {len(patient_df)} patients")
 
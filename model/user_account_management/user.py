@@ -1,7 +1,6 @@
-import pandas as pd
 import hashlib
 from datetime import datetime
-from config import USER_DATA_PATH, PATIENTS_DATA_PATH, MHWP_DATA_PATH
+from config import USER_DATA_PATH
 from .base import UserBase
 from .user_data_manage import UserDataManage
 from .user_update import UserUpdate
@@ -37,33 +36,9 @@ class User(UserBase, UserDataManage, UserUpdate, PatientManage, MhwpManage, Admi
 
     def load_from_csv(self):
         """Load user data and role-specific information."""
+        # UserDataManage.load_from_csv already loads the patient or MHWP record
         try:
-            if not UserDataManage.load_from_csv(self):
-                return False
-
-            if self.role == "patient":
-                try:
-                    patient_df = pd.read_csv(PATIENTS_DATA_PATH)
-                    patient_info = patient_df[patient_df['username'] == self.username]
-                    if not patient_info.empty:
-                        self.assigned_mhwp = patient_info.iloc[0]['assigned_mhwp']
-                        self.account_status = patient_info.iloc[0]['account_status']
-                        self.registration_date = patient_info.iloc[0]['registration_date']
-                except FileNotFoundError:
-                    pass
-            elif self.role == "mhwp":
-                try:
-                    mhwp_df = pd.read_csv(MHWP_DATA_PATH)
-                    mhwp_info = mhwp_df[mhwp_df['username'] == self.username]
-                    if not mhwp_info.empty:
-                        self.assigned_patients = mhwp_info.iloc[0]['assigned_patients']
-                        self.account_status = mhwp_info.iloc[0]['account_status']
-                        self.registration_date = mhwp_info.iloc[0]['registration_date']
-                        self.major = mhwp_info.iloc[0]['major']
-                except FileNotFoundError:
-                    pass
-
-            return True
+            return UserDataManage.load_from_csv(self)
         except Exception as e:
             print(f"Error loading user data: {str(e)}")
             return False
\ No newline at end of file
@@ -1,6 +1,8 @@
 import pandas as pd
 from datetime import datetime
 from config import USER_DATA_PATH, PATIENTS_DATA_PATH, MHWP_DATA_PATH
+from utils.data_store import read_table, write_table
+from utils.assignment_store import get_assigned_mhwp, get_patients_for_mhwp
 
 class UserDataManage: 
     #initializing the data 
@@ -8,7 +10,7 @@ class UserDataManage:
         try:
             # Load user data
             try:
-                user_df = pd.read_csv(USER_DATA_PATH)
+                user_df = read_table(USER_DATA_PATH)
                 user_df['email'] = user_df['email'].astype(str)
                 user_df['emergency_email'] = user_df['emergency_email'].astype(str)
 
@@ -16,7 +18,7 @@ class UserDataManage:
                     print("Username has been used. Please choose a different one.")
                     return False
             except FileNotFoundError:
-                user_df = pd.DataFrame(columns=["username", "password", "role", "email", "emergency_email"])
+                user_df = pd.DataFrame(columns=["user_id", "username", "password", "role", "email", "emergency_email"])
 
             # Add new user to user_data.csv
             new_user = pd.DataFrame({
@@ -27,7 +29,7 @@ class UserDataManage:
                 "emergency_email": [self.emergency_email if self.emergency_email else ""]
             })
             user_df = pd.concat([user_df, new_user], ignore_index=True)
-            user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
+            write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
 
             # Initialize patient record only if role is 'patient' and record does not exist
             if self.role == "patient" and not self.check_patient_record_exists():
@@ -44,7 +46,7 @@ class UserDataManage:
         """Load user data from CSV and update object state."""
         try:
             # Load user data
-            df = pd.read_csv(USER_DATA_PATH)
+            df = read_table(USER_DATA_PATH)
             user_info = df[df['username'] == self.username]
             
             if not user_info.empty:
@@ -60,10 +62,10 @@ class UserDataManage:
                 # If user is a patient, load patient record
                 if self.role == "patient":
                     try:
-                        patient_df = pd.read_csv(PATIENTS_DATA_PATH)
+                        patient_df = read_table(PATIENTS_DATA_PATH)
                         patient_info = patient_df[patient_df['username'] == self.username]
                         if not patient_info.empty:
-                            self.assigned_mhwp = patient_info.iloc[0]['assigned_mhwp']
+                            self.assigned_mhwp = get_assigned_mhwp(self.username)
                             self.account_status = patient_info.iloc[0]['account_status']
                             self.registration_date = patient_info.iloc[0]['registration_date']
                     except FileNotFoundError:
@@ -73,10 +75,10 @@ class UserDataManage:
                 # If user is a MHWP, load MHWP record
                 elif self.role == "mhwp":
                     try:
-                        mhwp_df = pd.read_csv("data/mhwp.csv")
+                        mhwp_df = read_table(MHWP_DATA_PATH)
                         mhwp_info = mhwp_df[mhwp_df['username'] == self.username]
                         if not mhwp_info.empty:
-                            self.assigned_patients = mhwp_info.iloc[0]['assigned_patients']
+                            self.assigned_patients = ','.join(get_patients_for_mhwp(self.username))
                             self.account_status = mhwp_info.iloc[0]['account_status']
                             self.registration_date = mhwp_info.iloc[0]['registration_date']
                             self.major = mhwp_info.iloc[0]['major']
@@ -94,15 +96,11 @@ class UserDataManage:
         """Delete user from user_data.csv and patients.csv if applicable."""
         #it would simultaneously delete the user account within mhwp or patient. csv
         try:
-            user_df = pd.read_csv(USER_DATA_PATH)
-            user_df = user_df[user_df['username'] != self.username]
-            user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
-            
             if self.role == "patient":
                 try:
-                    patient_df = pd.read_csv(PATIENTS_DATA_PATH)
+                    patient_df = read_table(PATIENTS_DATA_PATH)
                     patient_df = patient_df[patient_df['username'] != self.username]
-                    patient_df.to_csv(PATIENTS_DATA_PATH, index=False, na_rep='')
+                    write_table(patient_df, PATIENTS_DATA_PATH, index=False, na_rep='')
                     print("Patient record deleted successfully.")
                 except FileNotFoundError:
                     print("Patient data file not found. Skipping patient record deletion.")
@@ -110,15 +108,19 @@ class UserDataManage:
                     print(f"Error deleting patient record: {str(e)}")
             elif self.role == "mhwp":
                 try:
-                    mhwp_df = pd.read_csv(MHWP_DATA_PATH)
+                    mhwp_df = read_table(MHWP_DATA_PATH)
                     mhwp_df = mhwp_df[mhwp_df['username'] != self.username]
-                    mhwp_df.to_csv(MHWP_DATA_PATH, index=False, na_rep='')
+                    write_table(mhwp_df, MHWP_DATA_PATH, index=False, na_rep='')
                     print("MHWP record deleted successfully.")
                 except FileNotFoundError:
                     print("MHWP data file not found. Skipping MHWP record deletion.")
                 except Exception as e:
                     print(f"Error deleting MHWP record: {str(e)}")
 
+            # Remove the user from user_data.csv last so the role file can still resolve the user's id
+            user_df = read_table(USER_DATA_PATH)
+            user_df = user_df[user_df['username'] != self.username]
+            write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
             print("User deleted successfully.")
         except FileNotFoundError:
             print("User data file not found.")
@@ -134,7 +136,7 @@ def toggle_user_account_status(username, user_data_path=USER_DATA_PATH,
     Returns tuple (success, message)
     """
     # Check if user exists and get their role
-    df = pd.read_csv(user_data_path)
+    df = read_table(user_data_path)
     user_data = df[df['username'] == username]
     
     if user_data.empty:
@@ -146,7 +148,7 @@ def toggle_user_account_status(username, user_data_path=USER_DATA_PATH,
         return False, "Cannot modify admin account status"
     
     if role == 'mhwp':
-        df = pd.read_csv(mhwp_data_path)
+        df = read_table(mhwp_data_path)
         current_status = df[df['username'] == username]['account_status'].values[0]
         print(f"\nCurrent status for MHWP '{username}': {current_status}")
         confirmation = input(f"Change status to {'inactive' if current_status == 'active' else 'active'}? (y/n): ").lower()
@@ -156,11 +158,11 @@ def toggle_user_account_status(username, user_data_path=USER_DATA_PATH,
             
         new_status = 'inactive' if current_status == 'active' else 'active'
         df.loc[df['username'] == username, 'account_status'] = new_status
-        df.to_csv(mhwp_data_path, index=False)
+        write_table(df, mhwp_data_path, index=False)
         return True, f"MHWP account '{username}' status changed to {new_status}"
         
     if role == 'patient':
-        df = pd.read_csv(patients_data_path)
+        df = read_table(patients_data_path)
         current_status = df[df['username'] == username]['account_status'].values[0]
         print(f"\nCurrent status for patient '{username}': {current_status}")
         confirmation = input(f"Change status to {'inactive' if current_status == 'active' else 'active'}? (y/n): ").lower()
@@ -170,5 +172,32 @@ def toggle_user_account_status(username, user_data_path=USER_DATA_PATH,
             
         new_status = 'inactive' if current_status == 'active' else 'active'
         df.loc[df['username'] == username, 'account_status'] = new_status
-        df.to_csv(patients_data_path, index=False)
+        write_table(df, patients_data_path, index=False)
         return True, f"Patient account '{username}' status changed to {new_status}"
+
+def set_account_status(usernames, status, user_data_path=USER_DATA_PATH,
+                       mhwp_data_path=MHWP_DATA_PATH,
+                       patients_data_path=PATIENTS_DATA_PATH):
+    """
+    Set the account status of many users at once, without confirmation prompts.
+    Each role file is read and written at most once however many users change.
+    Returns tuple (updated usernames, skipped usernames)
+    """
+    usernames = set(usernames)
+    df = read_table(user_data_path)
+    roles = df[df['username'].isin(usernames)].set_index('username')['role']
+
+    updated = []
+    for role, path in (('mhwp', mhwp_data_path), ('patient', patients_data_path)):
+        targets = roles.index[roles == role]
+        if targets.empty:
+            continue
+        df = read_table(path)
+        mask = df['username'].isin(targets) & (df['account_status'] != status)
+        if mask.any():
+            df.loc[mask, 'account_status'] = status
+            write_table(df, path, index=False)
+            updated.extend(df.loc[mask, 'username'])
+
+    # Admins, unknown users and users already in the requested status are skipped
+    return sorted(updated), sorted(usernames - set(updated))
@@ -1,78 +1,46 @@
 import os
 from tabulate import tabulate
-import pandas as pd
 from .base import UserBase
-from config import USER_DATA_PATH
+from config import USER_DATA_PATH, DATA_DIR
 from config import PATIENTS_DATA_PATH
 from config import MHWP_DATA_PATH
+from utils.data_store import read_table, write_table
+from utils.partitioned_store import PARTITIONED_TABLES, read_partitioned, write_partitioned
 
 class UserUpdate:
-    def update_username_in_files(self, old_username, new_username, role):
-        try:
-            updates = {
-                'user_data.csv': ['username'],
-                'patients.csv': ['assigned_mhwp'] if role == 'mhwp' else['username'] if role == 'patient'else None, 
-                'mhwp.csv': ['username'] if role == 'mhwp' else ['assigned_patients'] if role == 'patient' else None,
-                'mood_data.csv': ['username'] if role == 'patient' else None,  
-                'appointments.csv': ['patient_username', 'mhwp_username'],
-                'assignments.csv': ['patient_username', 'mhwp_username'],
-                'comments.csv': ['patient_username', 'mhwp_username'],
-                'mental_assessments.csv': ['patient_username', 'mhwp_username'],
-                'patient_journaling.csv': ['patient_username'] if role == 'patient' else None,
-                'patient_notes.csv': ['patient_username', 'mhwp_username'],
-                'mhwp_schedule.csv': ['mhwp_username'] if role == 'mhwp' else None,
-                'mhwp_schedule_template.csv': ['mhwp_username'] if role == 'mhwp' else None
-            }
-    #By setting up a dictionary that if the key is the vlaue withn different csv, the value would be changed at the same time
-    #if allows us to check more situation with different roles such as patient
-    #The dicitonary includes all the csv to change the key we want simultaneously
-            for file, columns in updates.items():
-                if columns:
-                    try:
-                        file_path = f"data/{file}"
-                        df = pd.read_csv(file_path)
-                        
-                        for column in columns:
-                            if column in df.columns:
-                                df[column] = df[column].astype(str)
-                                df.loc[df[column] == str(old_username), column] = str(new_username)
-                                
-                        df.to_csv(file_path, index=False)
-                    except FileNotFoundError:
-                        continue
-                        
-            return True
-        except Exception as e:
-            print(f"Error updating files: {str(e)}")
-            return False
     # This deletion method is smiliar to the update function, but as we like to keep some record. 
     # The function is not used
     def delete_user_from_files(self, username, role):
         try:
+            # user_data.csv goes last so the other tables can still resolve the user's id
             deletes = {
-                'user_data.csv': 'username',
                 'patients.csv': 'username' if role == 'patient' else None,
                 'mhwp.csv': 'username' if role == 'mhwp' else None,
-                'patients.csv': 'assigned_mhwp' if role == 'patient' else None,
-                'mhwp.csv': 'assigned_patients' if role == 'mhwp' else None,
                 'mood_data.csv': 'username' if role == 'patient' else None,
+                # Only the active appointments: the archive segments are never rewritten
                 'appointments.csv': 'patient_username' if role == 'patient' else 'mhwp_username',
                 'assignments.csv': 'patient_username' if role == 'patient' else 'mhwp_username',
                 'comments.csv': 'patient_username' if role == 'patient' else 'mhwp_username',
                 'mental_assessments.csv': 'patient_username' if role == 'patient' else 'mhwp_username',
                 'patient_journaling.csv': 'patient_username' if role == 'patient' else None,
                 'patient_notes.csv': 'patient_username' if role == 'patient' else 'mhwp_username',
-                'mhwp_schedule.csv': 'mhwp_username' if role == 'mhwp' else None,
-                'mhwp_schedule_template.csv': ['mhwp_username'] if role == 'mhwp' else None
+                'mhwp_schedule_exceptions.csv': 'mhwp_username' if role == 'mhwp' else None,
+                'mhwp_schedule_template.csv': 'mhwp_username' if role == 'mhwp' else None,
+                'user_data.csv': 'username'
             }
 
             for file, column in deletes.items():
                 if column:
                     try:
-                        df = pd.read_csv(f"data/{file}")
+                        # Time-series tables are stored in monthly partitions
+                        partitioned = file in PARTITIONED_TABLES
+                        df = (read_partitioned if partitioned else read_table)(os.path.join(DATA_DIR, file))
                         if column in df.columns:
                             df = df[df[column] != username]
-                            df.to_csv(f"data/{file}", index=False)
+                            if partitioned:
+                                write_partitioned(df, os.path.join(DATA_DIR, file))
+                            else:
+                                write_table(df, os.path.join(DATA_DIR, file), index=False)
                     except FileNotFoundError:
                         continue
             return True
@@ -80,7 +48,10 @@ class UserUpdate:
             print(f"Error deleting from files: {str(e)}")
             return False
     def update_info(self, new_username=None, new_password=None, new_email=None, new_emergency_email=None):
-        """Update user information and synchronize with all related files."""
+        """
+        Update user information and synchronize with all related files.
+        Other tables refer to users by user_id, so a rename only changes the user's row in user_data.csv.
+        """
         try:
             # Load user data and verify user exists
             if not self.load_from_csv():
@@ -88,7 +59,7 @@ class UserUpdate:
                 return False
 
             # Load user_data.csv
-            user_df = pd.read_csv(USER_DATA_PATH)
+            user_df = read_table(USER_DATA_PATH)
             old_username = self.username
             changes_made = False
             messages = []
@@ -103,19 +74,14 @@ class UserUpdate:
                     messages.append("Username has been used. Please choose a different one.")
                     return False
                 
-                # Update username in user_data.csv
+                # Update username in user_data.csv; other files refer to the user by user_id
                 user_df.loc[user_df['username'] == old_username, 'username'] = new_username
                 
-                # Update username in other files
-                if not self.update_username_in_files(old_username, new_username, self.role):
-                    messages.append("Error updating username in related files.")
-                    return False
-                
                 self.username = new_username
                 changes_made = True
                 messages.append(f"Username successfully updated to: {new_username}")
                 # Save changes immediately after username update
-                user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
+                write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
 
             # Update password if provided
             if new_password:
@@ -126,32 +92,32 @@ class UserUpdate:
                     user_df.loc[user_df['username'] == self.username, 'password'] = hashed_new_password
                     self.password = hashed_new_password
                     changes_made = True
-                    user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
+                    write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
                     messages.append("Password updated successfully.")
 
             # Update email if provided
             if new_email:
                 # Update in user_data.csv
                 user_df.loc[user_df['username'] == self.username, 'email'] = new_email
-                user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
+                write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
                 
                 # Update in role-specific files
                 if self.role == "patient":
                     try:
-                        patient_df = pd.read_csv(PATIENTS_DATA_PATH)
+                        patient_df = read_table(PATIENTS_DATA_PATH)
                         patient_df['email'] = patient_df['email'].astype(str)
                         if self.username in patient_df['username'].values:
                             patient_df.loc[patient_df['username'] == self.username, 'email'] = new_email
-                            patient_df.to_csv(PATIENTS_DATA_PATH, index=False, na_rep='')
+                            write_table(patient_df, PATIENTS_DATA_PATH, index=False, na_rep='')
                     except FileNotFoundError:
                         print("Patient data file not found.")
                 elif self.role == "mhwp":
                     try:
-                        mhwp_df = pd.read_csv(MHWP_DATA_PATH)
+                        mhwp_df = read_table(MHWP_DATA_PATH)
                         mhwp_df['email'] = mhwp_df['email'].astype(str)
                         if self.username in mhwp_df['username'].values:
                             mhwp_df.loc[mhwp_df['username'] == self.username, 'email'] = new_email
-                            mhwp_df.to_csv(MHWP_DATA_PATH, index=False, na_rep='')
+                            write_table(mhwp_df, MHWP_DATA_PATH, index=False, na_rep='')
                     except FileNotFoundError:
                         print("MHWP data file not found.")
                 
@@ -163,25 +129,25 @@ class UserUpdate:
             if new_emergency_email:
                 # Update in user_data.csv
                 user_df.loc[user_df['username'] == self.username, 'emergency_email'] = new_emergency_email
-                user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
+                write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
                 
                 # Update in role-specific files
                 if self.role == "patient":
                     try:
-                        patient_df = pd.read_csv(PATIENTS_DATA_PATH)
+                        patient_df = read_table(PATIENTS_DATA_PATH)
                         patient_df['emergency_email'] = patient_df['emergency_email'].astype(str)
                         if self.username in patient_df['username'].values:
                             patient_df.loc[patient_df['username'] == self.username, 'emergency_email'] = new_emergency_email
-                            patient_df.to_csv(PATIENTS_DATA_PATH, index=False, na_rep='')
+                            write_table(patient_df, PATIENTS_DATA_PATH, index=False, na_rep='')
                     except FileNotFoundError:
                         print("Patient data file not found.")
                 elif self.role == "mhwp":
                     try:
-                        mhwp_df = pd.read_csv(MHWP_DATA_PATH)
+                        mhwp_df = read_table(MHWP_DATA_PATH)
                         mhwp_df['emergency_email'] = mhwp_df['emergency_email'].astype(str)
                         if self.username in mhwp_df['username'].values:
                             mhwp_df.loc[mhwp_df['username'] == self.username, 'emergency_email'] = new_emergency_email
-                            mhwp_df.to_csv(MHWP_DATA_PATH, index=False, na_rep='')
+                            write_table(mhwp_df, MHWP_DATA_PATH, index=False, na_rep='')
                     except FileNotFoundError:
                         print("MHWP data file not found.")
                 
@@ -213,15 +179,15 @@ class UserUpdate:
             for file, columns in updates.items():
                 if columns:
                     try:
-                        file_path = f"data/{file}"
-                        df = pd.read_csv(file_path)
+                        file_path = os.path.join(DATA_DIR, file)
+                        df = read_table(file_path)
                         
                         for column in columns:
                             if column in df.columns:
                                 df[column] = df[column].astype(str)
                                 df.loc[df['username'] == str(username), column] = str(new_email)
                                 
-                        df.to_csv(file_path, index=False)
+                        write_table(df, file_path, index=False)
                     except FileNotFoundError:
                         continue
                         
@@ -241,15 +207,15 @@ class UserUpdate:
             for file, columns in updates.items():
                 if columns:
                     try:
-                        file_path = f"data/{file}"
-                        df = pd.read_csv(file_path)
+                        file_path = os.path.join(DATA_DIR, file)
+                        df = read_table(file_path)
                         
                         for column in columns:
                             if column in df.columns:
                                 df[column] = df[column].astype(str)
                                 df.loc[df['username'] == str(username), column] = str(new_emergency_email)
                                 
-                        df.to_csv(file_path, index=False)
+                        write_table(df, file_path, index=False)
                     except FileNotFoundError:
                         continue
                         
@@ -266,7 +232,7 @@ class UserUpdate:
 
         try:
             # Load user_data.csv
-            user_df = pd.read_csv(USER_DATA_PATH)
+            user_df = read_table(USER_DATA_PATH)
 
             # Hash the new password
             hashed_new_password = self.hash_password(new_password)
@@ -277,14 +243,14 @@ class UserUpdate:
             # Update password in user_data.csv
             user_df.loc[user_df['username'] == self.username, 'password'] = hashed_new_password
             self.password = hashed_new_password
-            user_df.to_csv(USER_DATA_PATH, index=False, na_rep='')
+            write_table(user_df, USER_DATA_PATH, index=False, na_rep='')
 
             # If the user is a patient, update related fields in patients.csv
             if self.role == "patient":
                 try:
-                    patient_df = pd.read_csv(PATIENTS_DATA_PATH)
+                    patient_df = read_table(PATIENTS_DATA_PATH)
                     if self.username in patient_df['username'].values:
-                        patient_df.to_csv(PATIENTS_DATA_PATH, index=False, na_rep='')
+                        write_table(patient_df, PATIENTS_DATA_PATH, index=False, na_rep='')
                 except FileNotFoundError:
                     print("Patient data file not found. Skipping patient record update.")
                 except Exception as e:
@@ -292,9 +258,9 @@ class UserUpdate:
             # If the user is a MHWP, update related fields in mhwp.csv
             elif self.role == "mhwp":
                 try:
-                    mhwp_df = pd.read_csv(MHWP_DATA_PATH)
+                    mhwp_df = read_table(MHWP_DATA_PATH)
                     if self.username in mhwp_df['username'].values:
-                        mhwp_df.to_csv(MHWP_DATA_PATH, index=False, na_rep='')
+                        write_table(mhwp_df, MHWP_DATA_PATH, index=False, na_rep='')
                 except FileNotFoundError:
                     print("MHWP data file not found. Skipping MHWP record update.")
                 except Exception as e:
@@ -0,0 +1,117 @@
+import os
+import pandas as pd
+from datetime import datetime
+from config import APPOINTMENTS_DATA_PATH, COMMENTS_PATH, PATIENT_NOTES_PATH, COMPLETED_APPOINTMENTS_INDEX_PATH
+from utils.data_store import read_table, write_table, append_table
+from utils.appointment_archive import read_appointments, with_archive
+from utils.instrumentation import instrument
+from utils.table_lock import table_lock
+
+# Confirmed appointments become "completed" once their time slot has ended. The sweep
+# below does this for the whole appointments file in one pass, and keeps an index of
+# completed appointments with whether the patient has commented on each one and
+# whether a record has been written for it. The comment and record menus read that
+# small index instead of the appointments file.
+
+INDEX_COLUMNS = ["id", "patient_username", "mhwp_username", "date", "timeslot", "commented", "recorded"]
+# Menu action -> index flag that is set once the action is done for an appointment
+ACTION_FLAGS = {"comment": "commented", "record": "recorded"}
+
+
+def slot_times(appointments, boundary="start"):
+    """
+    Vectorised start or end time of each appointment, from its "YYYY/MM/DD" date and "HH:MM-HH:MM" timeslot.
+    """
+    times = appointments["timeslot"].str.split("-").str[0 if boundary == "start" else -1]
+    return pd.to_datetime(appointments["date"] + " " + times, format="%Y/%m/%d %H:%M", errors="coerce")
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _referenced_ids(file_path, column):
+    try:
+        return read_table(file_path, usecols=[column])[column]
+    except (FileNotFoundError, pd.errors.EmptyDataError, ValueError):
+        return pd.Series(dtype="int64")
+
+
+def rebuild_completed_index(appointments=None, appointments_path=APPOINTMENTS_DATA_PATH,
+                            index_path=COMPLETED_APPOINTMENTS_INDEX_PATH):
+    """
+    Rebuild the completed-appointment index from the appointments (active and archived), comments and notes files.
+    """
+    if appointments is None:
+        appointments = read_appointments(appointments_path)
+    completed = appointments[appointments["status"] == "completed"]
+    index_df = completed[INDEX_COLUMNS[:5]].assign(
+        commented=completed["id"].isin(_referenced_ids(COMMENTS_PATH, "appointment_id")),
+        recorded=completed["id"].isin(_referenced_ids(PATIENT_NOTES_PATH, "id"))
+    )
+    write_table(index_df, index_path)
+    return index_df
+
+
+# The second read only happens if a booking or cancellation changed the file meanwhile
+@instrument(max_reads_per_table=2, max_writes_per_table=1)
+def complete_past_appointments(appointments_path=APPOINTMENTS_DATA_PATH, index_path=COMPLETED_APPOINTMENTS_INDEX_PATH,
+                               now=None):
+    """
+    Mark every confirmed appointment whose time slot has ended as completed, normally with one read and at most
+    one write of the appointments file, and add the newly completed appointments to the index.
+    :return: Number of appointments completed
+    """
+    try:
+        signature = _file_signature(appointments_path)
+        appointments = read_table(appointments_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return 0
+
+    now = now or datetime.now()
+    due = (appointments["status"] == "confirmed") & (slot_times(appointments, "end") <= now)
+    if due.any():
+        # The sweep also runs in the background. Bookings and cancellations hold the same
+        # lock, and the file is read again if one of them changed it since the first read.
+        with table_lock(appointments_path):
+            if _file_signature(appointments_path) != signature:
+                appointments = read_table(appointments_path)
+                due = (appointments["status"] == "confirmed") & (slot_times(appointments, "end") <= now)
+            if due.any():
+                appointments.loc[due, "status"] = "completed"
+                write_table(appointments, appointments_path)
+
+    if not os.path.exists(index_path):
+        rebuild_completed_index(with_archive(appointments, appointments_path), index_path=index_path)
+    elif due.any():
+        append_table(appointments.loc[due, INDEX_COLUMNS[:5]].assign(commented=False, recorded=False), index_path)
+    return int(due.sum())
+
+
+def load_completed_index(index_path=COMPLETED_APPOINTMENTS_INDEX_PATH):
+    """Load the completed-appointment index, building it on first use."""
+    if not os.path.exists(index_path):
+        complete_past_appointments(index_path=index_path)
+    index_df = read_table(index_path)
+    for flag in ACTION_FLAGS.values():
+        index_df[flag] = index_df[flag].astype(bool)
+    return index_df
+
+
+def get_open_appointments(patient_username, action, index_path=COMPLETED_APPOINTMENTS_INDEX_PATH):
+    """
+    Return the patient's completed appointments that the action ("comment" or "record") has not been done for yet.
+    """
+    index_df = load_completed_index(index_path)
+    open_rows = (index_df["patient_username"] == patient_username) & ~index_df[ACTION_FLAGS[action]]
+    return index_df.loc[open_rows, INDEX_COLUMNS[:5]].reset_index(drop=True)
+
+
+def mark_appointment_done(appointment_id, action, index_path=COMPLETED_APPOINTMENTS_INDEX_PATH):
+    """Record in the index that the action ("comment" or "record") has been done for an appointment."""
+    # Locked, so rows the completion sweep appends meanwhile are not overwritten
+    with table_lock(index_path):
+        index_df = load_completed_index(index_path)
+        index_df.loc[index_df["id"] == appointment_id, ACTION_FLAGS[action]] = True
+        write_table(index_df, index_path)
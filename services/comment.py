@@ -1,10 +1,14 @@
 import pandas as pd
 from datetime import datetime
-from config import COMMENTS_PATH, APPOINTMENTS_DATA_PATH
+from config import COMMENTS_PATH
+from utils.data_store import read_table, append_table, read_matching_rows
+from utils.instrumentation import instrument
+from services.appointment_completion import get_open_appointments, mark_appointment_done, slot_times
 
 
 
 
+@instrument
 def comment(patient_username):
     available_appointments, option_map = get_available_appointments(patient_username)
 
@@ -62,31 +66,18 @@ def add_comment(patient_username, mhwp_username, rating, comment, appointment_id
         }
 
         try:
-            comments_df = pd.read_csv(COMMENTS_PATH)
+            # Only the appointment ids are needed to check for an earlier comment
+            commented_ids = read_table(COMMENTS_PATH, usecols=["appointment_id"])["appointment_id"]
         except (FileNotFoundError, pd.errors.EmptyDataError):
-            comments_df = pd.DataFrame({
-                "patient_username": pd.Series(dtype='str'),
-                "mhwp_username": pd.Series(dtype='str'),
-                "rating": pd.Series(dtype='float'),
-                "comment": pd.Series(dtype='str'),
-                "timestamp": pd.Series(dtype='str'),
-                "appointment_id": pd.Series(dtype='int'),
-                "appointment_datetime": pd.Series(dtype='str')
-            })
-
-        if not comments_df.empty and "appointment_id" in comments_df.columns:
-            if appointment_id in comments_df["appointment_id"].values:
-                print("You have already commented on this appointment.")
-                return
-
-        new_comment_df = pd.DataFrame([comment_data])
-
-        if comments_df.empty:
-            comments_df = new_comment_df
-        else:
-            comments_df = pd.concat([comments_df, new_comment_df], ignore_index=True)
+            commented_ids = pd.Series(dtype='int')
+
+        if appointment_id in commented_ids.values:
+            print("You have already commented on this appointment.")
+            return
 
-        comments_df.to_csv(COMMENTS_PATH, index=False)
+        # Comments are only ever appended, which keeps the byte-offset index of the file current
+        append_table(pd.DataFrame([comment_data]), COMMENTS_PATH)
+        mark_appointment_done(appointment_id, "comment")
         print("Comment added successfully!")
 
     except Exception as e:
@@ -98,21 +89,9 @@ def add_comment(patient_username, mhwp_username, rating, comment, appointment_id
 def get_available_appointments(patient_username):
    
     try:
-        appointments = pd.read_csv(APPOINTMENTS_DATA_PATH)
-
-        patient_appointments = appointments[appointments["patient_username"] == patient_username].copy()
-
-        if patient_appointments.empty:
-            print("No appointments found for this patient.")
-            return pd.DataFrame(), {}
-
-        now = datetime.now()
-        patient_appointments["datetime"] = pd.to_datetime(
-            patient_appointments["date"] + " " + patient_appointments["timeslot"].str.split("-").str[0]
-        )
-        available_appointments = patient_appointments[
-            (patient_appointments["status"] == "confirmed") & (patient_appointments["datetime"] < now)
-        ].reset_index(drop=True)
+        # Completed appointments the patient has not commented on yet
+        available_appointments = get_open_appointments(patient_username, "comment")
+        available_appointments["datetime"] = slot_times(available_appointments)
 
         if available_appointments.empty:
             print("No appointments available for commenting.")
@@ -143,11 +122,8 @@ def view_comments(mhwp_username):
     View all comments for a specific MHWP.
     """
     try:
-        # Load the comments file
-        comments_df = pd.read_csv(COMMENTS_PATH)
-        
-        # Filter comments belonging to the MHWP
-        mhwp_comments = comments_df[comments_df["mhwp_username"] == mhwp_username]
+        # Load the comments belonging to the MHWP, streaming the file
+        mhwp_comments = read_matching_rows(COMMENTS_PATH, "mhwp_username", mhwp_username)
 
         if mhwp_comments.empty:
             print(f"No comments found for MHWP '{mhwp_username}'.")
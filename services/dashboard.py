@@ -5,8 +5,12 @@ import numpy as np
 import pickle
 from services.trainModal import compute_tfidf
 from config import MOOD_DATA_PATH, PATIENTS_DATA_PATH
-from services.patient_records import patient_record_menu
+from utils.data_store import read_table
+from utils.partitioned_store import read_partitioned, read_user_rows, read_recent
+from utils.assignment_store import get_patients_for_mhwp
+from services.patient_records import patient_record_menu, ask_date_range
 from tabulate import tabulate
+from utils.instrumentation import instrument
 
 # read csv files
 def read_csv(file_path):
@@ -16,7 +20,7 @@ def read_csv(file_path):
     if not os.path.exists(file_path):  # Check if the file exists
         raise FileNotFoundError(f"Error: File '{file_path}' not found.")  # Raise an error if the file does not exist
     try:
-        return pd.read_csv(file_path)  # Attempt to read the CSV file
+        return read_table(file_path)  # Attempt to read the CSV file
     except pd.errors.EmptyDataError:  # If the file is empty, raise an error
         raise ValueError(f"Error: File '{file_path}' is empty.")
     except pd.errors.ParserError:  # If the file has invalid data format, raise an error
@@ -37,13 +41,16 @@ def load_patient_data():
 
 
 # load data from mood
-def load_mood_data():
+def load_mood_data(start=None, end=None, username=None):
     """
-    Loads mood data from the CSV file using the read_csv function.
+    Loads mood data, optionally only between two dates; only the monthly partitions in range are read.
+    With a username, only that patient's entries are kept, streaming each partition in chunks.
     If an error occurs, prints the error and returns an empty DataFrame.
     """
     try:
-        return read_csv(MOOD_DATA_PATH)  # Load mood data from the CSV file
+        if username is not None:
+            return read_user_rows(MOOD_DATA_PATH, "username", username, start, end)  # One patient's rows only
+        return read_partitioned(MOOD_DATA_PATH, start, end)  # Load mood data from the partition files
     except Exception as e:
         print(e)  # Print any error encountered during loading
         return pd.DataFrame()  # Return an empty DataFrame in case of an error (to ensure the program continues safely)
@@ -58,20 +65,27 @@ def get_patients_by_mhwp(mhwp_username):
     if patients.empty:  # Check if the patient data is empty (i.e., there are no patient records)
         print("No patient data available.")  # If no data is available, notify the user
         return pd.DataFrame()  # Return an empty DataFrame to avoid errors
-    return patients[patients["assigned_mhwp"] == mhwp_username]  # Filter and return patients assigned to the specified MHWP
+    assigned = get_patients_for_mhwp(mhwp_username)  # Assignments are derived from the assignment store
+    return patients[patients["username"].isin(assigned)]  # Filter and return patients assigned to the specified MHWP
 
 
 # more information about patients
-def get_patient_mood_data(username):
+def get_patient_mood_data(username, limit=None):
     """
     Retrieves the mood data of a specific patient based on their username.
-    Returns a DataFrame containing the patient's mood records.
+    Returns a DataFrame containing the patient's mood records; with a limit, only the newest ones, newest first.
     """
-    moods = load_mood_data()  # Load the mood data
+    if limit:
+        try:
+            return read_recent(MOOD_DATA_PATH, "username", username, limit)  # Reads the newest partitions only
+        except Exception as e:
+            print(e)
+            return pd.DataFrame()
+    moods = load_mood_data(username=username)  # Load the patient's mood data
     if moods.empty:  # Check if the mood data is empty
         print("No mood data available.")  # If no data is available, notify the user
         return pd.DataFrame()  # Return an empty DataFrame to avoid errors
-    return moods[moods["username"] == username]  # Filter and return the mood data for the specified patient
+    return moods  # Return the mood data of the specified patient
 
 # Mapping of color codes to mood scores
 color_code_to_score = {
@@ -92,6 +106,7 @@ color_mapping = {
 }
 
 
+@instrument(max_reads_per_table=1, max_writes_per_table=0)
 def generate_summary(mhwp_username):
     """
     Generates a summary of the mood data for all patients assigned to the given MHWP username.
@@ -122,7 +137,7 @@ def generate_summary(mhwp_username):
                 mood_data = mood_data.sort_values(by="timestamp", ascending=False)  # Sort mood entries by timestamp (latest first)
 
                 last_mood = mood_data.iloc[0]["color_code"]  # Get the color code of the last recorded mood
-                mood_data["mood_score"] = mood_data["color_code"].map(color_code_to_score)  # Map color code to corresponding score
+                mood_data["mood_score"] = mood_data["color_code"].map(color_code_to_score).astype(float)  # Map color code to corresponding score
                 average_mood = mood_data["mood_score"].mean()  # Calculate the average mood score for this patient
 
             # Append the summary data for the current patient to the list
@@ -171,19 +186,15 @@ def display_patient_summary(summary_data):
     print("-" * 60)  # Print another separator line
 
 
-def plot_mood(patient_username):
+def plot_mood(patient_username, start=None, end=None):
     """
     Plot the mood trend and mood status distribution for a specific patient based on their mood data.
     :param patient_username: The username of the patient whose mood data is to be plotted.
+    :param start: Optional first date ("YYYY-MM-DD") to plot
+    :param end: Optional last date ("YYYY-MM-DD") to plot
     """
     try:
-        moods = load_mood_data()  # Load mood data for all patients
-
-        if moods.empty:  # If mood data is empty
-            print("No mood data found.")
-            return
-
-        mood_data = moods[moods["username"] == patient_username]  # Filter mood data for the specific patient
+        mood_data = load_mood_data(start, end, username=patient_username)  # Load the patient's mood data in the date range
 
         # If no mood data exists for the patient, print a message and exit
         if mood_data.empty:
@@ -194,7 +205,7 @@ def plot_mood(patient_username):
         mood_data = mood_data.sort_values(by="timestamp", ascending=True)
 
         # Map the color codes to corresponding mood scores
-        mood_data["mood_score"] = mood_data["color_code"].map(color_code_to_score)
+        mood_data["mood_score"] = mood_data["color_code"].map(color_code_to_score).astype(float)
 
         try:
             # Plot the mood trend over time as a line chart
@@ -224,6 +235,7 @@ def plot_mood(patient_username):
         try:
             # Generate a pie chart showing the distribution of mood states (color codes)
             mood_counts = mood_data["color_code"].value_counts()  # Count the occurrences of each color code
+            mood_counts = mood_counts[mood_counts > 0]  # color_code is categorical; leave out colors never recorded
             # Map each mood state to a corresponding color for the pie chart
             colors = [color_mapping.get(x) for x in mood_counts.index]
             plt.figure(figsize=(7, 7))  # Set the figure size for the pie chart
@@ -269,6 +281,7 @@ def predict_emotion(new_document, word_index, idf, centers):
     return cluster_id
 
 
+@instrument
 def display_dashboard(mhwp_username):
     """
     Display the patient dashboard, including summary data, and allow the user to interact with patient details.
@@ -290,7 +303,7 @@ def display_dashboard(mhwp_username):
             choice = input("Select an option (1-2): ").strip()  # User choice input
             if choice == "1":
                 patient_name = input("Please type in the username of the patient:").strip()  # Get patient username
-                plot_mood(patient_name)  # Plot the mood for the specific patient
+                plot_mood(patient_name, *ask_date_range())  # Plot the mood for the specific patient
 
                 # Option to predict the patient's mood
                 print("Would you like to predict the patient's mood? (Y/N)")
@@ -298,8 +311,8 @@ def display_dashboard(mhwp_username):
                 if predict_choice.lower() == "y":
                     try:
                         # Extract the most recent comment to predict the mood
-                        last_mood_comment = get_patient_mood_data(patient_name)
-                        last_mood_comment = last_mood_comment.iloc[-1]["comments"]  # Get the last mood comment
+                        last_mood_comment = get_patient_mood_data(patient_name, limit=1)
+                        last_mood_comment = last_mood_comment.iloc[0]["comments"]  # Get the last mood comment
                         predicted_cluster = predict_emotion(last_mood_comment, word_index, idf, centers)  # Predict the cluster
                         mood_labels = ["Green", "Blue", "Yellow", "Orange", "Red"]  # Mood color labels
                         print(f"Predicted mood for {patient_name}: {mood_labels[predicted_cluster]}")
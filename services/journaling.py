@@ -1,8 +1,12 @@
 import pandas as pd
 from datetime import datetime
 from config import JOURNAL_ENTRIES_PATH
+from utils.partitioned_store import append_partitioned
+from services.record_search import update_record_index
+from utils.instrumentation import instrument
 
 
+@instrument
 def enter_journaling(username):
     """
     Allow patients to input journaling and save to CSV file
@@ -21,13 +25,8 @@ def enter_journaling(username):
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-    # Save to journaling.csv
-    try:
-        journal_df = pd.read_csv(JOURNAL_ENTRIES_PATH)
-        journal_df = pd.concat([journal_df, pd.DataFrame([new_entry])], ignore_index=True)
-    except FileNotFoundError:
-        journal_df = pd.DataFrame([new_entry])
-
-    journal_df.to_csv(JOURNAL_ENTRIES_PATH, index=False)
+    # Append to this month's journal partition and index the new entry for MHWP search
+    append_partitioned(pd.DataFrame([new_entry]), JOURNAL_ENTRIES_PATH)
+    update_record_index(save=False)
     print("Your journal entry has been saved successfully!")
 
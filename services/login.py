@@ -1,13 +1,15 @@
 # handles all login related function and user interface 
 
-import pandas as pd
 import getpass
 from model.user_account_management.user import User  
 from model.admin import handle_admin_menu
 from model.mhwp import handle_mhwp_menu
 from model.patient import handle_patient_menu
 from config import *
+from utils.data_store import read_table
+from utils.instrumentation import instrument
 
+@instrument(max_reads_per_table=1, max_writes_per_table=0)
 def login_user():
    """Authenticate and login user.
    Args:
@@ -48,13 +50,13 @@ def handle_login():
     if user:
         # Check user status from respective CSV files based on role
         if user.role == "mhwp":
-            df = pd.read_csv(MHWP_DATA_PATH) # read mhwp data from config
+            df = read_table(MHWP_DATA_PATH) # read mhwp data from config
             status = df[df['username'] == user.username]['account_status'].values[0]
             if status == 'inactive':
                 print("Your account is disabled. Please contact admin to reactivate.")
                 return True  
         elif user.role == "patient":
-            df = pd.read_csv(PATIENTS_DATA_PATH) # read patients data from config
+            df = read_table(PATIENTS_DATA_PATH) # read patients data from config
             status = df[df['username'] == user.username]['account_status'].values[0]
             if status == 'inactive':
                 print("Your account is disabled. Please contact admin to reactivate.")
@@ -0,0 +1,68 @@
+import os
+from datetime import date
+from config import *
+from utils.scheduler import register_job
+
+# Periodic maintenance jobs, run in the background by utils/scheduler.py while the
+# application is open, or on demand with `breeze jobs run`.
+
+_last_rollover = {}
+
+
+def rollover_schedules():
+    """Drop past schedule exceptions and refresh capacity once the date has changed since the last rollover."""
+    from model.mhwp_management.mhwp_schedule import update_mhwp_schedules
+
+    today = date.today()
+    if _last_rollover.get(SCHEDULE_DATA_PATH) == today:
+        return
+    if update_mhwp_schedules(silent=True):
+        _last_rollover[SCHEDULE_DATA_PATH] = today
+
+
+def compact_assignment_log():
+    """Fold the append-only assignment log once it holds more history than current rows."""
+    from utils.assignment_store import load_assignments, compact_assignments
+
+    if not os.path.exists(ASSIGNMENTS_DATA_PATH):
+        return
+    with open(ASSIGNMENTS_DATA_PATH, "rb") as file:
+        logged_rows = sum(1 for _ in file) - 1
+    if logged_rows > 2 * len(load_assignments()):
+        compact_assignments()
+
+
+def complete_appointments():
+    """Mark confirmed appointments whose time slot has ended as completed."""
+    from services.appointment_completion import complete_past_appointments
+
+    complete_past_appointments()
+
+
+def archive_old_appointments():
+    """Move cancelled, completed and past appointments out of appointments.csv into the archive."""
+    from utils.appointment_archive import archive_appointments
+
+    archive_appointments()
+
+
+def refresh_record_index():
+    """Index the notes and journal entries added since the last refresh and save the record index."""
+    from services.record_search import update_record_index
+
+    update_record_index()
+
+
+# name -> (function, interval in seconds)
+MAINTENANCE_JOBS = {
+    "schedule_rollover": (rollover_schedules, 60 * 60),
+    "appointment_completion": (complete_appointments, 10 * 60),
+    "appointment_archival": (archive_old_appointments, 60 * 60),
+    "assignment_compaction": (compact_assignment_log, 6 * 60 * 60),
+    "record_index_refresh": (refresh_record_index, 15 * 60)
+}
+
+
+def register_maintenance_jobs():
+    for name, (func, interval) in MAINTENANCE_JOBS.items():
+        register_job(name, func, interval)
@@ -1,14 +1,19 @@
-import pandas as pd
+import os
+import re
+import math
+import heapq
+from config import MEDITATION_RESOURCES_PATH
+from utils.data_store import read_table
+from utils.instrumentation import instrument
 
+# Ranked search settings. Keywords are curated tags, so they weigh the most;
+# titles are broad categories shared by many resources, so they weigh the least.
+FIELD_WEIGHTS = {"Keyword": 2.0, "Subtitle": 1.5, "Title": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
 
+_search_index_cache = {}
 
-def load_resources_from_file(file_path="data/meditation_resources.csv"):
-    """Load a CSV file and return a DataFrame"""
-    try:
-        return pd.read_csv(file_path)
-    except FileNotFoundError:
-        print(f"Error: {file_path} not found.")
-        return None
 
 def search_resources_from_file(df, keyword):
     """Search resources in a DataFrame based on a keyword"""
@@ -57,6 +62,108 @@ def custom_fuzzy_search(keyword, keywords_list, threshold=0.6):
                 break
     return matches
 
+def tokenize(text):
+    """Split text into lowercase alphanumeric terms"""
+    if not isinstance(text, str):
+        return []
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def build_search_index(df, field_weights=FIELD_WEIGHTS, k1=BM25_K1, b=BM25_B):
+    """
+    Precompute field-weighted BM25 (BM25F) statistics for the meditation resources.
+    Every (term, resource) weight only depends on the catalogue, so it is computed once here
+    and a query just sums the postings of its own terms.
+    :param df: DataFrame with Keyword, Title, Subtitle and URL columns
+    :return: A dict with the term postings and the resources for display
+    """
+    fields = [field for field in field_weights if field in df.columns]
+    docs = []
+    field_lengths = {field: [] for field in fields}
+    for _, row in df.iterrows():
+        doc_fields = {field: tokenize(row[field]) for field in fields}
+        for field in fields:
+            field_lengths[field].append(len(doc_fields[field]))
+        docs.append(doc_fields)
+
+    avg_lengths = {
+        field: (sum(lengths) / len(lengths) if lengths and sum(lengths) else 1.0)
+        for field, lengths in field_lengths.items()
+    }
+
+    # Weighted, length-normalised term frequency per document
+    term_freqs = {}
+    for doc_id, doc_fields in enumerate(docs):
+        for field in fields:
+            terms = doc_fields[field]
+            if not terms:
+                continue
+            norm = 1 - b + b * len(terms) / avg_lengths[field]
+            for term in terms:
+                doc_tf = term_freqs.setdefault(term, {})
+                doc_tf[doc_id] = doc_tf.get(doc_id, 0.0) + field_weights[field] / norm
+
+    total_docs = len(docs)
+    postings = {}
+    for term, doc_tf in term_freqs.items():
+        idf = math.log(1 + (total_docs - len(doc_tf) + 0.5) / (len(doc_tf) + 0.5))
+        postings[term] = [(doc_id, idf * tf / (k1 + tf)) for doc_id, tf in doc_tf.items()]
+
+    resources = df[["Title", "Subtitle", "URL"]].to_dict("records")
+    return {"postings": postings, "resources": resources}
+
+
+def get_search_index(file_path=MEDITATION_RESOURCES_PATH):
+    """Return the search index for a resources file, rebuilding it only when the file changes"""
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        print(f"Error: {file_path} not found.")
+        return None
+    cached = _search_index_cache.get(file_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    df = read_table(file_path)
+    index = build_search_index(df)
+    _search_index_cache[file_path] = (mtime, index)
+    return index
+
+
+def expand_query_terms(terms, vocabulary, threshold=0.6):
+    """Map query terms that are not in the index to their closest indexed terms"""
+    expanded = []
+    for term in terms:
+        if term in vocabulary:
+            expanded.append(term)
+            continue
+        expanded.extend(k for k in vocabulary if similarity_ratio(term, k) >= threshold)
+    return expanded
+
+
+def ranked_search(index, query, top_k=5):
+    """
+    Score resources against a query with BM25F and return the best ones.
+    Only resources containing at least one query term are scored.
+    :return: A list of (score, resource) tuples sorted by descending score
+    """
+    postings = index["postings"]
+    terms = expand_query_terms(tokenize(query), postings)
+    scores = {}
+    for term in set(terms):
+        for doc_id, weight in postings.get(term, ()):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+    return [(score, index["resources"][doc_id]) for doc_id, score in best]
+
+
+@instrument(max_reads_per_table=1, max_writes_per_table=0)
+def search_meditation(query, top_k=5, file_path=MEDITATION_RESOURCES_PATH):
+    """Ranked meditation search against the resources file"""
+    index = get_search_index(file_path)
+    if index is None:
+        return []
+    return ranked_search(index, query, top_k)
+
 # Define categories and sub-options
 CATEGORIES = {
     "1": {
@@ -106,11 +213,11 @@ CATEGORIES = {
     }
 }
 
-def load_resources_from_file(file_path="data/meditation_resources.csv"):
+def load_resources_from_file(file_path=MEDITATION_RESOURCES_PATH):
     """Load a CSV file and return a DataFrame"""
     try:
         print(f"Attempting to load file: {file_path}")  # Add debug information
-        return pd.read_csv(file_path)
+        return read_table(file_path)
     except FileNotFoundError:
         print(f"Error: {file_path} not found.")  # File not found
         return None
@@ -119,9 +226,10 @@ def load_resources_from_file(file_path="data/meditation_resources.csv"):
         return None
 
 
+@instrument
 def handle_search_meditation():
     """Handle the logic for searching meditation resources"""
-    file_path = "data/meditation_resources.csv"
+    file_path = MEDITATION_RESOURCES_PATH
     df = load_resources_from_file(file_path)
 
     if df is None:
@@ -138,7 +246,7 @@ def handle_search_meditation():
         if choice == "1":
             handle_needs_based_search(df)
         elif choice == "2":
-            handle_keyword_search(df)
+            handle_keyword_search(file_path)
         elif choice == "3":
             print("Returning to the main menu.")
             break
@@ -178,13 +286,11 @@ def handle_needs_based_search(df):
         print("Invalid category.")
 
 
-def handle_keyword_search(df):
-    """Search resources directly using a keyword with fuzzy matching"""
-    # Standardize data and expand keywords
-    df["Keyword"] = df["Keyword"].str.split(",").apply(lambda x: [k.strip().lower() for k in x])
-    df["Subtitle"] = df["Subtitle"].str.strip().str.lower()
-    df_exploded = df.explode('Keyword').reset_index(drop=True)
-    df_exploded["Keyword"] = df_exploded["Keyword"].str.strip().str.lower()
+def handle_keyword_search(file_path=MEDITATION_RESOURCES_PATH, top_k=5):
+    """Search resources with ranked (BM25) matching over Title, Subtitle and Keyword"""
+    index = get_search_index(file_path)
+    if index is None:
+        return
 
     while True:
         keyword = input("\nEnter a keyword to search for resources (or type 'exit' to return): ").strip().lower()
@@ -192,24 +298,10 @@ def handle_keyword_search(df):
             print("Returning to the previous menu.")
             break
 
-        # Exact match
-        exact_matches = df_exploded[(df_exploded["Keyword"] == keyword) | (df_exploded["Subtitle"] == keyword)]
-        if not exact_matches.empty:
-            print("\nExact match found:")
-            for _, row in exact_matches.iterrows():
-                print(f"- {row['Title']} - {row['Subtitle']}: {row['URL']}")
-            continue
-
-        # Fuzzy match
-        df_exploded["Keyword_Similarity"] = df_exploded["Keyword"].apply(lambda k: similarity_ratio(keyword, k))
-        df_exploded["Subtitle_Similarity"] = df_exploded["Subtitle"].apply(lambda s: similarity_ratio(keyword, s))
-        fuzzy_matches = df_exploded[(df_exploded["Keyword_Similarity"] >= 0.6) | (df_exploded["Subtitle_Similarity"] >= 0.6)]
-        if not fuzzy_matches.empty:
-            print("\nHere are the closest matches:")
-            # Remove duplicates to avoid displaying the same resource multiple times
-            fuzzy_matches = fuzzy_matches.drop_duplicates(subset=['Title', 'Subtitle', 'URL'])
-            for _, row in fuzzy_matches.iterrows():
-                print(f"- {row['Title']} - {row['Subtitle']}: {row['URL']}")
+        results = ranked_search(index, keyword, top_k)
+        if results:
+            print("\nHere are the best matches:")
+            for score, resource in results:
+                print(f"- {resource['Title']} - {resource['Subtitle']}: {resource['URL']} (score {score:.2f})")
         else:
             print(f"No resources found for '{keyword}'. Try another keyword.")
-
@@ -1,6 +1,7 @@
 import pandas as pd
 from datetime import datetime
 from config import MOOD_DATA_PATH
+from utils.partitioned_store import read_user_rows, read_recent, append_partitioned
 
 class MoodEntry:
     def __init__(self, username, color_code, comments, timestamp=None):
@@ -28,25 +29,21 @@ class MoodEntry:
                 'timestamp': self.timestamp
             }
             new_entry = pd.DataFrame([data])  # Note the list wrapper
-            
-            try:
-                df = pd.read_csv(MOOD_DATA_PATH)
-                df = pd.concat([df, new_entry], ignore_index=True)
-            except FileNotFoundError:
-                df = new_entry
-                
-            df.to_csv(MOOD_DATA_PATH, index=False)
+
+            # Only this month's partition is written
+            append_partitioned(new_entry, MOOD_DATA_PATH)
             print("Mood entry saved successfully!")
             return True
             
         except Exception as e:
             print(f"Error saving mood entry: {e}")
             return False    @staticmethod
-    def get_user_mood_history(username):
-        """Retrieve mood history for a specific user"""
+    def get_user_mood_history(username, limit=None):
+        """Retrieve mood history for a specific user, newest first; with a limit, only the newest entries"""
         try:
-            df = pd.read_csv(MOOD_DATA_PATH)
-            user_moods = df[df['username'] == username]
+            if limit:
+                return read_recent(MOOD_DATA_PATH, 'username', username, limit)
+            user_moods = read_user_rows(MOOD_DATA_PATH, 'username', username)
             return user_moods.sort_values('timestamp', ascending=False)
         except FileNotFoundError:
             return pd.DataFrame()
@@ -1,33 +1,29 @@
 import pandas as pd
 from services.comment import view_comments
+from services.timeline import view_patient_timeline
 from datetime import datetime
-from config import APPOINTMENTS_DATA_PATH, ASSIGNMENTS_DATA_PATH, MOOD_DATA_PATH, JOURNAL_ENTRIES_PATH, MENTAL_ASSESSMENTS_PATH, PATIENT_NOTES_PATH
+from config import ASSIGNMENTS_DATA_PATH, MOOD_DATA_PATH, JOURNAL_ENTRIES_PATH, MENTAL_ASSESSMENTS_PATH, PATIENT_NOTES_PATH
+from utils.data_store import read_table, write_table, append_table, read_matching_rows
+from utils.partitioned_store import read_user_rows
+from services.record_search import update_record_index
+from utils.assignment_store import get_patients_for_mhwp
+from utils.instrumentation import instrument
+from services.appointment_completion import get_open_appointments, mark_appointment_done
 
 
 CONDITIONS = ["Anxiety", "Depression", "Autism", "Stress"]
 
+@instrument
 def view_patient_records(mhwp_username):
     """
     Entry point for MHWP to view patient records.
     """
     try:
-        # Get patients under MHWP
-        assignments_df = pd.read_csv(ASSIGNMENTS_DATA_PATH)
-        
-        # Check if required columns are present
-        if "mhwp_username" not in assignments_df.columns or "patient_username" not in assignments_df.columns:
-            print("Error: CSV file is missing required columns.")
-            return
-        
-        assignments_df["mhwp_username"] = assignments_df["mhwp_username"].str.strip()
-        assignments_df["patient_username"] = assignments_df["patient_username"].str.strip()
+        # Get patients under MHWP from the assignment store
         mhwp_username = mhwp_username.strip()
+        patients = sorted(get_patients_for_mhwp(mhwp_username, ASSIGNMENTS_DATA_PATH))
 
-        # Filter patients under MHWP
-        patients = assignments_df[assignments_df["mhwp_username"] == mhwp_username]["patient_username"].unique()
-
-      
-        if patients.size == 0:  
+        if not patients:  
             print("You currently have no registered patients.")
             return
 
@@ -63,13 +59,14 @@ def patient_record_menu(patient_username, mhwp_username):
         print("4. View Patient Comment")
         print("5. Add Record to Patient")
         print("6. View Patient Medical Records")
-        print("7. Return to Main Menu")
+        print("7. View Patient Timeline")
+        print("8. Return to Main Menu")
 
-        choice = input("Select an option (1-7): ").strip()
+        choice = input("Select an option (1-8): ").strip()
         if choice == "1":
-            view_mood_tracker(patient_username)
+            view_mood_tracker(patient_username, *ask_date_range())
         elif choice == "2":
-            view_patient_journaling(patient_username)
+            view_patient_journaling(patient_username, *ask_date_range())
         elif choice == "3":
             view_mental_health_assessments(patient_username)
         elif choice == "4":
@@ -79,20 +76,39 @@ def patient_record_menu(patient_username, mhwp_username):
         elif choice == "6":
             view_notes(mhwp_username)
         elif choice == "7":
+            view_patient_timeline(patient_username)
+        elif choice == "8":
             print("Returning to main menu.")
             break
         else:
             print("Invalid choice, please try again.")
 
 
-def view_mood_tracker(patient_username):
+def ask_date_range():
+    """
+    Ask for an optional date range to limit a view to.
+    :return: (start, end) as "YYYY-MM-DD" strings, None where left blank
+    """
+    bounds = []
+    for label in ("From", "To"):
+        value = input(f"{label} date (YYYY-MM-DD, leave blank for no limit): ").strip()
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                print("Invalid date format, showing all entries.")
+                return None, None
+        bounds.append(value or None)
+    return tuple(bounds)
+
+
+def view_mood_tracker(patient_username, start=None, end=None):
     """
-    View the patient's mood tracker data.
+    View the patient's mood tracker data, optionally limited to a date range.
     """
     print("\n1. Mood Tracker:")
     try:
-        mood_df = pd.read_csv(MOOD_DATA_PATH)
-        patient_moods = mood_df[mood_df["username"] == patient_username]
+        patient_moods = read_user_rows(MOOD_DATA_PATH, "username", patient_username, start, end)
         if not patient_moods.empty:
             print(patient_moods[["color_code", "comments", "timestamp"]].to_string(index=False))
         else:
@@ -101,14 +117,13 @@ def view_mood_tracker(patient_username):
         print("Mood Tracker file not found.")
 
 
-def view_patient_journaling(patient_username):
+def view_patient_journaling(patient_username, start=None, end=None):
     """
-    View the patient's journaling data.
+    View the patient's journaling data, optionally limited to a date range.
     """
     print("\n2. Patient Journaling:")
     try:
-        journal_df = pd.read_csv(JOURNAL_ENTRIES_PATH)
-        patient_journal = journal_df[journal_df["patient_username"] == patient_username]
+        patient_journal = read_user_rows(JOURNAL_ENTRIES_PATH, "patient_username", patient_username, start, end)
         if not patient_journal.empty:
             print(patient_journal[["entry", "timestamp"]].to_string(index=False))
         else:
@@ -123,8 +138,7 @@ def view_mental_health_assessments(patient_username):
     """
     print("\n3. Mental Health Assessments:")
     try:
-        assessments_df = pd.read_csv(MENTAL_ASSESSMENTS_PATH)
-        patient_assessments = assessments_df[assessments_df["patient_username"] == patient_username]
+        patient_assessments = read_matching_rows(MENTAL_ASSESSMENTS_PATH, "patient_username", patient_username)
         if not patient_assessments.empty:
             print(patient_assessments[["date", "score", "status"]].to_string(index=False))
         else:
@@ -136,28 +150,12 @@ def view_mental_health_assessments(patient_username):
 def get_available_appointments(patient_username):
     """
     Get all eligible appointments for the patient.
-    Conditions: status is 'confirmed' and time has passed.
+    Conditions: the appointment is completed and has no record yet.
     """
     print("\n4. Patient Comment:")
     try:
-        # Read appointment data
-        appointments = pd.read_csv(APPOINTMENTS_DATA_PATH)
-
-        # Filter appointments belonging to the patient and create a copy
-        patient_appointments = appointments[appointments["patient_username"] == patient_username].copy()
-
-        if patient_appointments.empty:
-            print("No appointments found for this patient.")
-            return pd.DataFrame(), {}
-
-        # Filter eligible appointments
-        now = datetime.now()
-        patient_appointments["datetime"] = pd.to_datetime(
-            patient_appointments["date"] + " " + patient_appointments["timeslot"].str.split("-").str[0]
-        )
-        available_appointments = patient_appointments[
-            (patient_appointments["status"] == "confirmed") & (patient_appointments["datetime"] < now)
-        ].reset_index(drop=True)
+        # Completed appointments from the completed-appointment index
+        available_appointments = get_open_appointments(patient_username, "record")
 
         if available_appointments.empty:
             print("No appointments available for action.")
@@ -204,7 +202,7 @@ def add_record(patient_username):
 
             # Check if a record already exists
             try:
-                notes_df = pd.read_csv(PATIENT_NOTES_PATH)
+                notes_df = read_table(PATIENT_NOTES_PATH)
                 if not notes_df.empty and appointment_id in notes_df["id"].values:
                     print("A record already exists for this appointment.")
                     return
@@ -234,10 +232,10 @@ def add_record(patient_username):
                 "notes": notes,
                 "id": appointment_id,
             }
-            notes_df = pd.concat([notes_df, pd.DataFrame([record_data])], ignore_index=True)
-
-            # Save the record
-            notes_df.to_csv(PATIENT_NOTES_PATH, index=False)
+            # Append the record and index it for search
+            append_table(pd.DataFrame([record_data]), PATIENT_NOTES_PATH)
+            mark_appointment_done(appointment_id, "record")
+            update_record_index(save=False)
             print("Record added successfully!")
 
         except ValueError:
@@ -251,11 +249,8 @@ def view_notes(mhwp_username):
     View all medical records for a specific MHWP.
     """
     try:
-        # Load medical records file
-        notes_df = pd.read_csv(PATIENT_NOTES_PATH)
-
-        # Filter records belonging to the MHWP
-        mhwp_notes = notes_df[notes_df["mhwp_username"] == mhwp_username]
+        # Load the records belonging to the MHWP, streaming the file
+        mhwp_notes = read_matching_rows(PATIENT_NOTES_PATH, "mhwp_username", mhwp_username)
 
         if mhwp_notes.empty:
             print(f"No records found for MHWP '{mhwp_username}'.")
@@ -279,18 +274,15 @@ def view_my_records(patient_username):
     Allow a patient to view their medical records, including date, condition, and notes, in a paginated format.
     """
     try:
-        # Load patient notes file
-        notes_df = pd.read_csv(PATIENT_NOTES_PATH)
+        # Load the patient's notes, streaming the file
+        patient_records = read_matching_rows(PATIENT_NOTES_PATH, "patient_username", patient_username)
     except FileNotFoundError:
         # If file does not exist, create an empty DataFrame and save it
         notes_df = pd.DataFrame(columns=["patient_username", "mhwp_username", "date", "condition", "notes", "id"])
-        notes_df.to_csv(PATIENT_NOTES_PATH, index=False)
+        write_table(notes_df, PATIENT_NOTES_PATH, index=False)
         print("No medical records found. File has been initialized.")
         return
 
-    # Filter records for the current patient
-    patient_records = notes_df[notes_df["patient_username"] == patient_username]
-
     if patient_records.empty:
         print("No medical records found for you.")
         return
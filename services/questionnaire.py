@@ -1,6 +1,10 @@
+import os
 import pandas as pd
 from datetime import datetime, timedelta
-from config import MENTAL_ASSESSMENTS_PATH
+from config import MENTAL_ASSESSMENTS_PATH, ASSIGNMENTS_DATA_PATH, LAST_ASSESSMENT_INDEX_PATH
+from utils.data_store import read_table, write_table, append_table
+from utils.assignment_store import get_assigned_mhwp
+from utils.instrumentation import instrument
 
 
 # Mental health questionnaire questions and scoring standards
@@ -40,29 +44,76 @@ def generate_feedback(status_list):
             feedback.append(STATUS_FEEDBACK[status])
     return "\n".join(feedback)
 
-def submit_questionnaire(patient_username, assignments_file="data/assignments.csv"):
+# The last-assessment index (data/last_assessment.csv) is append-only: each submission
+# appends one row and the last row of a patient wins. The parsed index is cached until
+# the file changes, and rebuild_last_assessment_index() folds it to one row per patient.
+_last_assessment_cache = {}
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def rebuild_last_assessment_index(assessments_path=MENTAL_ASSESSMENTS_PATH, index_path=LAST_ASSESSMENT_INDEX_PATH):
+    """
+    Rebuild the last-assessment index (patient -> date of their latest questionnaire) from mental_assessments.csv.
+    """
+    try:
+        assessments_df = read_table(assessments_path)
+        last_dates = assessments_df.groupby("patient_username", observed=True)["date"].max().to_dict()
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        last_dates = {}
+    save_last_assessment_index(last_dates, index_path)
+    return last_dates
+
+def load_last_assessment_index(index_path=LAST_ASSESSMENT_INDEX_PATH):
+    """
+    Load the last-assessment index as a dict of patient username -> last questionnaire date (YYYY-MM-DD).
+    The index is built once from the assessments file if it does not exist yet, and cached until it changes.
+    """
+    if not os.path.exists(index_path):
+        return rebuild_last_assessment_index(index_path=index_path)
+    signature = _file_signature(index_path)
+    cached = _last_assessment_cache.get(index_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    index_df = read_table(index_path, dtype={"last_date": str})
+    last_dates = dict(zip(index_df["patient_username"], index_df["last_date"]))  # Later rows win
+    _last_assessment_cache[index_path] = (signature, last_dates)
+    return last_dates
+
+def save_last_assessment_index(last_dates, index_path=LAST_ASSESSMENT_INDEX_PATH):
+    index_df = pd.DataFrame(sorted(last_dates.items()), columns=["patient_username", "last_date"])
+    write_table(index_df, index_path)
+    _last_assessment_cache[index_path] = (_file_signature(index_path), dict(last_dates))
+
+def record_last_assessment(patient_username, date, index_path=LAST_ASSESSMENT_INDEX_PATH):
+    """Move a patient's entry in the last-assessment index by appending one row."""
+    last_dates = load_last_assessment_index(index_path)
+    append_table(pd.DataFrame([{"patient_username": patient_username, "last_date": date}]), index_path)
+    last_dates[patient_username] = date
+    _last_assessment_cache[index_path] = (_file_signature(index_path), last_dates)
+
+def get_last_assessment_date(patient_username, index_path=LAST_ASSESSMENT_INDEX_PATH):
+    """Return the date of the patient's latest questionnaire as a datetime, or None."""
+    last_date_str = load_last_assessment_index(index_path).get(patient_username)
+    return datetime.strptime(last_date_str, "%Y-%m-%d") if last_date_str else None
+
+@instrument
+def submit_questionnaire(patient_username, assignments_file=ASSIGNMENTS_DATA_PATH):
     """
     Allow the patient to complete the questionnaire and store the results.
-    Now reads from the assignment.csv file.
+    Looks up the assigned MHWP in the assignment store.
     """
     try:
-        # Load the assignment data
-        assignments = pd.read_csv(assignments_file)
-
-        # Filter assignments for the current patient
-        patient_assignment = assignments[assignments["patient_username"] == patient_username]
-        if patient_assignment.empty:
+        # Retrieve the assigned MHWP username
+        mhwp_username = get_assigned_mhwp(patient_username, assignments_file)
+        if not mhwp_username:
             print("Error: No MHWP found for this patient.")
             return
-
-        # Retrieve the assigned MHWP username
-        mhwp_username = patient_assignment.iloc[0]["mhwp_username"]
         print(f"Assigned MHWP for patient '{patient_username}': {mhwp_username}")
-    except FileNotFoundError:
-        print("Error: Assignments file not found.")
-        return
     except Exception as e:
         print(f"Error: {e}")
+        return
 
 
     print("\nWelcome to the Mental Health Questionnaire!")
@@ -97,34 +148,22 @@ def submit_questionnaire(patient_username, assignments_file="data/assignments.cs
         "score": sum(results.values()),
         "status": ", ".join(status) if status else "Normal"
     }
-    try:
-        assessments_df = pd.read_csv(MENTAL_ASSESSMENTS_PATH)
-        # Change: Replace append with pd.concat
-        assessments_df = pd.concat([assessments_df, pd.DataFrame([assessment_data])], ignore_index=True)
-    except FileNotFoundError:
-        assessments_df = pd.DataFrame([assessment_data])
-
-    assessments_df.to_csv(MENTAL_ASSESSMENTS_PATH, index=False)
+    # Append the new assessment and the patient's new entry in the last-assessment index
+    append_table(pd.DataFrame([assessment_data]), MENTAL_ASSESSMENTS_PATH)
+    record_last_assessment(patient_username, assessment_data["date"])
     print("\nThank you for completing the questionnaire!")
     print(f"Your feedback:\n{feedback}")
 
 
+@instrument
 def remind_to_complete_questionnaire(patient_username):
     """
     Remind the patient to complete the mental health questionnaire. If more than two weeks have passed, remind and guide them to complete it.
+    The check is a single lookup in the last-assessment index; no data file is rewritten.
     """
-    try:
-        # Read the questionnaire records
-        assessments_df = pd.read_csv(MENTAL_ASSESSMENTS_PATH)
-    except FileNotFoundError:
-        # If the questionnaire file does not exist, create an empty file and directly remind
-        assessments_df = pd.DataFrame(columns=["patient_username", "mhwp_username", "date", "score", "status"])
-        assessments_df.to_csv(MENTAL_ASSESSMENTS_PATH, index=False)
-
-    # Filter records for the current patient
-    patient_records = assessments_df[assessments_df["patient_username"] == patient_username]
+    last_date = get_last_assessment_date(patient_username)
 
-    if patient_records.empty:
+    if last_date is None:
         # If no records exist, directly remind
         print("You have not completed any questionnaires yet.")
         complete_now = input("Would you like to complete the questionnaire now? (yes/no): ").strip().lower()
@@ -132,9 +171,7 @@ def remind_to_complete_questionnaire(patient_username):
             submit_questionnaire(patient_username)
         return
 
-    # Get the date of the last completed questionnaire
-    last_date_str = patient_records.iloc[-1]["date"]
-    last_date = datetime.strptime(last_date_str, "%Y-%m-%d")
+    # Days since the last completed questionnaire
     days_since_last = (datetime.now() - last_date).days
 
     if days_since_last >= 14:
@@ -0,0 +1,264 @@
+import io
+import os
+import csv
+import re
+import bisect
+import pickle
+import hashlib
+import threading
+from tabulate import tabulate
+from config import *
+from services.meditation import tokenize
+from utils.assignment_store import get_patients_for_mhwp
+from utils.user_directory import get_user_id, get_username
+from utils.partitioned_store import table_files
+from utils.instrumentation import instrument, record_read
+
+# Searchable sources: the text columns that are indexed and the column used to order results
+SEARCH_SOURCES = {
+    "Note": {"path": PATIENT_NOTES_PATH, "text": ["condition", "notes"], "time": "date"},
+    "Journal": {"path": JOURNAL_ENTRIES_PATH, "text": ["entry"], "time": "timestamp"}
+}
+# Bytes before the indexed offset that are hashed to detect a file rewritten in place
+_TAIL_CHECK_BYTES = 256
+
+_record_index = None
+# Set when the in-memory index holds rows the saved file does not (see update_record_index)
+_unsaved = False
+# Foreground updates and the record_index_refresh job share the in-memory index
+_index_lock = threading.RLock()
+
+
+def _new_index():
+    """
+    Empty record index.
+    - docs: doc_id -> (source, patient_id, time, text)
+    - partitions: patient_id -> {term: {doc_id: [positions]}}, one partition per patient
+    - vocabulary: sorted list of every indexed term, for prefix queries
+    - files: file key -> {"offset", "tail"} marking how far each file has been indexed; the key is the
+      source name, or "<source>/<partition file>" for a source stored in monthly partitions
+    """
+    return {"docs": [], "partitions": {}, "vocabulary": [], "files": {}}
+
+
+def _tail_hash(file, offset):
+    start = max(offset - _TAIL_CHECK_BYTES, 0)
+    file.seek(start)
+    return hashlib.md5(file.read(offset - start)).hexdigest()
+
+
+def _index_document(index, source, patient_id, time, text):
+    doc_id = len(index["docs"])
+    index["docs"].append((source, patient_id, time, text))
+    partition = index["partitions"].setdefault(patient_id, {})
+    vocabulary = index["vocabulary"]
+    for position, term in enumerate(tokenize(text)):
+        postings = partition.setdefault(term, {})
+        if not postings:
+            i = bisect.bisect_left(vocabulary, term)
+            if i == len(vocabulary) or vocabulary[i] != term:
+                vocabulary.insert(i, term)
+        postings.setdefault(doc_id, []).append(position)
+
+
+def _file_key(source, path):
+    spec_path = SEARCH_SOURCES[source]["path"]
+    return source if path == spec_path else f"{source}/{os.path.basename(path)}"
+
+
+def _index_source(index, source):
+    """
+    Index the rows appended to a source since the last update.
+    :return: True once the source is up to date; None if a file was rewritten or removed and the index must be rebuilt
+    """
+    paths = table_files(SEARCH_SOURCES[source]["path"])
+    keys = {_file_key(source, path) for path in paths}
+    for key, state in index["files"].items():
+        if (key == source or key.startswith(f"{source}/")) and key not in keys and state["offset"]:
+            return None
+    return all(_index_file(index, source, path, _file_key(source, path)) for path in paths) or None
+
+
+def _index_file(index, source, path, key):
+    """
+    Index the rows appended to one file of a source since the last update.
+    :return: True once the file is up to date; None if it was rewritten in place
+    """
+    spec = SEARCH_SOURCES[source]
+    state = index["files"].get(key, {"offset": 0, "tail": None})
+
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < state["offset"] or (state["offset"] and _tail_hash(file, state["offset"]) != state["tail"]):
+            return None  # File was rewritten, not appended to
+        if size == state["offset"]:
+            return True
+        file.seek(0)
+        header = file.readline().decode("utf-8")
+        file.seek(max(state["offset"], len(header.encode("utf-8"))))
+        new_bytes = file.read()
+
+    reader = csv.DictReader(io.StringIO(new_bytes.decode("utf-8"), newline=''), fieldnames=next(csv.reader([header])))
+    rows_read = 0
+    for row in reader:
+        rows_read += 1
+        try:
+            patient_id = int(float(row["patient_id"]))
+        except (TypeError, ValueError):
+            continue
+        text = " ".join(str(row.get(column) or "") for column in spec["text"])
+        _index_document(index, source, patient_id, row.get(spec["time"]) or "", text)
+    record_read(path, rows_read, len(new_bytes))
+
+    with open(path, "rb") as file:
+        index["files"][key] = {"offset": size, "tail": _tail_hash(file, size)}
+    return True
+
+
+def update_record_index(index_path=RECORD_INDEX_PATH, save=True):
+    """
+    Bring the note and journal index up to date and, unless save is False, save it.
+    Only rows appended since the last update are read; a source rewritten in place triggers a full rebuild.
+    Adding a note or journal entry only updates the index in memory: saving pickles the whole index, so it
+    is left to the record_index_refresh job (services/maintenance.py) and to save_record_index() on exit.
+    Rows missing from a saved index are read from the data files the next time it is loaded.
+    """
+    global _record_index, _unsaved
+    with _index_lock:
+        index = load_record_index(index_path, refresh=False)
+        indexed_files = {source: dict(state) for source, state in index["files"].items()}
+        if not all(_index_source(index, source) for source in SEARCH_SOURCES):
+            index = _new_index()
+            for source in SEARCH_SOURCES:
+                _index_source(index, source)
+        _record_index = index
+        _unsaved = _unsaved or index["files"] != indexed_files
+        if save and (_unsaved or not os.path.exists(index_path)):
+            save_record_index(index_path)
+        return index
+
+
+def save_record_index(index_path=RECORD_INDEX_PATH):
+    """Save the in-memory record index if it has rows the saved file lacks. The file is replaced atomically."""
+    global _unsaved
+    with _index_lock:
+        if _record_index is None or (not _unsaved and os.path.exists(index_path)):
+            return
+        temp_path = f"{index_path}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                pickle.dump(_record_index, file)
+            os.replace(temp_path, index_path)
+            _unsaved = False
+        except OSError as e:
+            print(f"Error saving record index: {e}")
+
+
+def load_record_index(index_path=RECORD_INDEX_PATH, refresh=True):
+    """
+    Load the record index, from memory or from disk, optionally catching up with newly appended rows
+    (in memory only; see update_record_index).
+    """
+    global _record_index
+    with _index_lock:
+        if _record_index is None:
+            try:
+                with open(index_path, "rb") as file:
+                    _record_index = pickle.load(file)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                _record_index = _new_index()
+        return update_record_index(index_path, save=False) if refresh else _record_index
+
+
+def parse_query(query):
+    """
+    Split a query into clauses: "quoted phrases", prefix* terms and plain terms.
+    :return: List of (kind, terms) tuples, kind in {"phrase", "prefix", "term"}
+    """
+    clauses = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        if phrase:
+            terms = tokenize(phrase)
+            if terms:
+                clauses.append(("phrase" if len(terms) > 1 else "term", terms))
+        elif word.endswith("*") and tokenize(word):
+            clauses.append(("prefix", tokenize(word)[:1]))
+        else:
+            clauses.extend(("term", [term]) for term in tokenize(word))
+    return clauses
+
+
+def _match_clause(index, partition, kind, terms):
+    """Return the doc ids of one partition that match a clause."""
+    if kind == "term":
+        return set(partition.get(terms[0], {}))
+    if kind == "prefix":
+        vocabulary = index["vocabulary"]
+        matches = set()
+        i = bisect.bisect_left(vocabulary, terms[0])
+        while i < len(vocabulary) and vocabulary[i].startswith(terms[0]):
+            matches.update(partition.get(vocabulary[i], {}))
+            i += 1
+        return matches
+    # Phrase: every term must appear at consecutive positions
+    postings = [partition.get(term, {}) for term in terms]
+    candidates = set(postings[0]).intersection(*postings[1:])
+    matches = set()
+    for doc_id in candidates:
+        following = [set(p[doc_id]) for p in postings[1:]]
+        if any(all(start + offset + 1 in positions for offset, positions in enumerate(following))
+               for start in postings[0][doc_id]):
+            matches.add(doc_id)
+    return matches
+
+
+@instrument
+def search_records(mhwp_username, query, limit=20, index=None):
+    """
+    Search the notes and journal entries of an MHWP's assigned patients.
+    All clauses of the query must match. Results are newest first.
+    :return: List of {"Patient", "Type", "Date", "Text"} dicts
+    """
+    clauses = parse_query(query)
+    if not clauses:
+        return []
+    index = index or load_record_index()
+
+    matches = []
+    for patient in get_patients_for_mhwp(mhwp_username):
+        partition = index["partitions"].get(get_user_id(patient))
+        if not partition:
+            continue
+        doc_ids = None
+        for kind, terms in clauses:
+            clause_ids = _match_clause(index, partition, kind, terms)
+            doc_ids = clause_ids if doc_ids is None else doc_ids & clause_ids
+            if not doc_ids:
+                break
+        matches.extend(doc_ids or ())
+
+    docs = index["docs"]
+    matches.sort(key=lambda doc_id: docs[doc_id][2], reverse=True)
+    return [
+        {"Patient": get_username(docs[doc_id][1]), "Type": docs[doc_id][0], "Date": docs[doc_id][2], "Text": docs[doc_id][3]}
+        for doc_id in matches[:limit]
+    ]
+
+
+def handle_record_search(user):
+    """
+    Let an MHWP search their patients' notes and journal entries.
+    """
+    print("\nSearch notes and journals of your patients.")
+    print('Use plain words, "quoted phrases" or prefix* terms.')
+    query = input("Enter search query: ").strip()
+    if not query:
+        print("No query entered.")
+        return
+
+    results = search_records(user.username, query)
+    if not results:
+        print("No matching records found.")
+        return
+    print(f"\nFound {len(results)} matching records:")
+    print(tabulate(results, headers="keys", tablefmt="grid", maxcolwidths=[None, None, None, 60]))
@@ -2,20 +2,24 @@ import os
 import pandas as pd
 import re
 import getpass
+import hashlib
 from model.user_account_management.user import User
-from config import USER_DATA_PATH
+from config import USER_DATA_PATH, PATIENTS_DATA_PATH, MHWP_DATA_PATH
+from utils.data_store import read_table, append_table
+from utils.user_directory import load_directory
 from datetime import datetime
 
+EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
 # Function to validate email format
 def is_valid_email(email):
     """Validate email format using a regex."""
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(email_regex, email) is not None
+    return re.match(EMAIL_REGEX, email) is not None
 
 # Check if the username is unique for a specific role
 def is_username_unique(username, role):
     if os.path.exists(USER_DATA_PATH):
-        df = pd.read_csv(USER_DATA_PATH)
+        df = read_table(USER_DATA_PATH)
         if not df[(df['username'] == username) & (df['role'] == role)].empty:
             return False
     return True
@@ -144,4 +148,105 @@ def register_user():
         print("User registration successful!")
     else:
         print("Registration failed.")
-    return True
\ No newline at end of file
+    return True
+
+IMPORT_COLUMNS = ["username", "password", "role", "email", "emergency_email", "symptoms", "major"]
+# Role-specific record file and the extra column it stores
+ROLE_RECORDS = {
+    "patient": (PATIENTS_DATA_PATH, "symptoms"),
+    "mhwp": (MHWP_DATA_PATH, "major")
+}
+
+def validate_registrations(users, existing_usernames):
+    """
+    Validate a batch of registrations column by column instead of row by row.
+    :param users: DataFrame with the IMPORT_COLUMNS as strings
+    :param existing_usernames: Set of usernames that are already taken
+    :return: Series of rejection reasons aligned with users ('' for valid rows)
+    """
+    usernames = users["username"]
+    emails_ok = users["email"].str.match(EMAIL_REGEX) & (
+        (users["emergency_email"] == "") | users["emergency_email"].str.match(EMAIL_REGEX)
+    )
+    checks = [
+        ((usernames == "") | (users["password"] == ""), "username and password cannot be empty"),
+        (~users["role"].isin(["patient", "mhwp", "admin"]), "invalid role"),
+        (~emails_ok, "invalid email format"),
+        (usernames.isin(existing_usernames), "username already exists"),
+        (usernames.duplicated(), "username repeated in batch")
+    ]
+    reasons = pd.Series("", index=users.index)
+    # Apply in reverse so the first failing check is the one reported
+    for failed, reason in reversed(checks):
+        reasons[failed] = reason
+    return reasons
+
+def bulk_register_users(users, user_data_path=USER_DATA_PATH):
+    """
+    Register a batch of users. The batch is validated as a whole, then the new rows are
+    appended to user_data.csv and to each role file with a single write per table;
+    existing rows are never rewritten.
+    :param users: DataFrame or list of dicts with the IMPORT_COLUMNS (symptoms/major optional)
+    :return: (registered, rejected) where registered is a dict role -> count and
+             rejected is a list of (row position, username, reason)
+    """
+    users = pd.DataFrame(users).reindex(columns=IMPORT_COLUMNS).fillna("").astype(str).reset_index(drop=True)
+    users["username"] = users["username"].str.strip()
+
+    id_to_username, username_to_id = load_directory(user_data_path)
+    reasons = validate_registrations(users, username_to_id.keys())
+    rejected = [(position, users.at[position, "username"], reason)
+                for position, reason in reasons[reasons != ""].items()]
+    new_users = users[reasons == ""]
+    if new_users.empty:
+        return {}, rejected
+
+    # Ids continue from the directory; passwords get the same SHA-256 hash as UserBase.hash_password
+    next_id = max(id_to_username, default=0) + 1
+    append_table(pd.DataFrame({
+        "user_id": range(next_id, next_id + len(new_users)),
+        "username": new_users["username"].values,
+        "password": [hashlib.sha256(password.encode()).hexdigest() for password in new_users["password"]],
+        "role": new_users["role"].values,
+        "email": new_users["email"].values,
+        "emergency_email": new_users["emergency_email"].values
+    }), user_data_path)
+
+    # The directory is written first so the role files can resolve the new users' ids
+    today = datetime.now().strftime("%Y-%m-%d")
+    for role, (path, column) in ROLE_RECORDS.items():
+        records = new_users[new_users["role"] == role]
+        if records.empty:
+            continue
+        append_table(pd.DataFrame({
+            "username": records["username"].values,
+            "account_status": "active",
+            "registration_date": today,
+            "email": records["email"].values,
+            "emergency_email": records["emergency_email"].values,
+            column: records[column].values
+        }), path)
+
+    return new_users["role"].value_counts().to_dict(), rejected
+
+def import_users(import_path):
+    """
+    Register every user listed in a CSV file (columns as in IMPORT_COLUMNS).
+    Rows that fail validation are reported and skipped.
+    :return: Number of users imported
+    """
+    rows = pd.read_csv(import_path, dtype=str, keep_default_na=False)
+    missing = [col for col in ["username", "password", "role", "email"] if col not in rows.columns]
+    if missing:
+        print(f"Import file is missing columns: {', '.join(missing)}")
+        return 0
+
+    registered, rejected = bulk_register_users(rows)
+    for position, username, reason in rejected:
+        print(f"Line {position + 2}: '{username}' skipped, {reason}.")
+    total = sum(registered.values())
+    if not total:
+        print("No users imported.")
+        return 0
+    print(f"Imported {total} users ({registered.get('patient', 0)} patients, {registered.get('mhwp', 0)} MHWPs).")
+    return total
@@ -3,16 +3,21 @@ import os
 from tabulate import tabulate
 from datetime import datetime, timedelta
 from config import ASSIGNMENTS_DATA_PATH, APPOINTMENTS_DATA_PATH, PATIENTS_DATA_PATH, MHWP_DATA_PATH
+from utils.data_store import read_table
+from utils.appointment_archive import read_appointments
+from utils.assignment_store import get_assignments_by_mhwp
+from utils.instrumentation import instrument
 
 
 
 # Function to read CSV files and handle specific errors
-def read_csv(file_path):
+def read_csv(file_path, parse_dates=False):
     """
     Reads a CSV file and handles specific errors related to file loading.
 
     Arguments:
     file_path (str): Path to the CSV file to be read.
+    parse_dates (bool): Parse the table's date columns (see utils/schemas.py) to datetimes.
 
     Returns:
     pandas.DataFrame: The data from the CSV file as a DataFrame if the file is read successfully.
@@ -28,7 +33,7 @@ def read_csv(file_path):
         raise FileNotFoundError(f"Error: File '{file_path}' not found.")
     try:
         # Try to read the CSV file using pandas and return the DataFrame
-        return pd.read_csv(file_path)
+        return read_table(file_path, parse_dates=parse_dates)
     except pd.errors.EmptyDataError:  # If the file is completely empty
         # Raise a ValueError if the file is empty
         raise ValueError(f"Error: File '{file_path}' is empty.")
@@ -52,10 +57,12 @@ def load_assignments():
 
 
 # Function to load data from appointments
-def load_appointments():
+def load_appointments(start_date=None, end_date=None):
     try:
-        # Attempt to read the appointments data from a CSV file
-        return read_csv(APPOINTMENTS_DATA_PATH)
+        # Read the active appointments and the archived ones; with a date range only the archive segments in it are read
+        if not os.path.exists(APPOINTMENTS_DATA_PATH):
+            raise FileNotFoundError(f"Error: File '{APPOINTMENTS_DATA_PATH}' not found.")
+        return read_appointments(APPOINTMENTS_DATA_PATH, start_date, end_date, parse_dates=True)
     except Exception as e:
         # If an error occurs, print the error message and return an empty DataFrame
         print(e)
@@ -81,14 +88,16 @@ def get_bookings(appointments, start_date, end_date, status):
     appointments (pandas.DataFrame): DataFrame containing appointment data.
     start_date (datetime): The start date of the period to filter.
     end_date (datetime): The end date of the period to filter.
-    status (str): The status to filter the appointments by ('all', 'confirmed', 'cancelled', 'pending', or 'Separate statistics').
+    status (str): The status to filter the appointments by ('all', 'confirmed', 'completed', 'cancelled', 'pending', or 'Separate statistics').
+                  'confirmed' also counts completed appointments, which were confirmed before they took place.
 
     Returns:
     pandas.Series: A series with the count of appointments grouped by MHWP (Mental Health and Wellbeing Practitioner) and status.
     """
 
-    # Convert the 'date' column to datetime format
-    appointments["date"] = pd.to_datetime(appointments["date"], format="%Y/%m/%d")
+    # Convert the 'date' column to datetime format unless the loader already parsed it
+    if not pd.api.types.is_datetime64_any_dtype(appointments["date"]):
+        appointments["date"] = pd.to_datetime(appointments["date"], format="%Y/%m/%d")
 
     # If the status is 'all', filter all appointments within the date range
     if status == "all":
@@ -99,6 +108,7 @@ def get_bookings(appointments, start_date, end_date, status):
             ]
         # Count the occurrences of each status
         status_counts = filtered_appointments['status'].value_counts()
+        status_counts = status_counts[status_counts > 0]  # status is categorical; drop statuses with no appointments
 
     # If the status is 'Separate statistics', group by MHWP and status, and count the number of appointments
     elif status == "Separate statistics":
@@ -108,17 +118,19 @@ def get_bookings(appointments, start_date, end_date, status):
             (appointments["date"] <= end_date)
             ]
         # Group appointments by 'mhwp_username' and 'status', count the occurrences, and reshape the result into a table
-        status_counts = filtered_appointments.groupby(['mhwp_username', 'status']).size().unstack(fill_value=0)
+        status_counts = filtered_appointments.groupby(['mhwp_username', 'status'], observed=True).size().unstack(fill_value=0)
 
     else:
         # For specific statuses (e.g., 'confirmed', 'cancelled', 'pending'), filter by both status and date range
+        statuses = ["confirmed", "completed"] if status == "confirmed" else [status]
         filtered_appointments = appointments[
-            (appointments["status"] == status) &
+            (appointments["status"].isin(statuses)) &
             (appointments["date"] >= start_date) &
             (appointments["date"] <= end_date)
             ]
         # Count the number of appointments for each MHWP with the given status
         status_counts = filtered_appointments["mhwp_username"].value_counts()
+        status_counts = status_counts[status_counts > 0]  # usernames are categorical over all users
 
     return status_counts
 
@@ -166,6 +178,7 @@ def get_valid_date_input(prompt):
             print("Invalid date format. Please use YYYY/MM/DD format.")
 
 
+@instrument
 def display_booking_summary():
     """
     Displays a summary of confirmed appointments for the current week,
@@ -173,12 +186,12 @@ def display_booking_summary():
     """
 
     try:
-        # Load the appointments data from the file
-        appointments = load_appointments()
-
         # Get the start and end date of the current week
         start_date, end_date = thisWeek()
 
+        # Load the appointments of the current week
+        appointments = load_appointments(start_date, end_date)
+
         # Get the booking summary for confirmed appointments within the current week
         results = get_bookings(appointments, start_date, end_date, "confirmed")
 
@@ -201,8 +214,6 @@ def display_booking_summary():
 
             if choice == "1":
                 # If the user wants to modify the summary, prompt them to enter a new date range
-                appointments = load_appointments()
-
                 # Get the new start and end date from the user input
                 start_date = get_valid_date_input("Enter start date (YYYY/MM/DD): ")
                 end_date = get_valid_date_input("Enter end date (YYYY/MM/DD): ")
@@ -213,10 +224,11 @@ def display_booking_summary():
                 if start_date > end_date:
                     print("Invalid date, please try again.")
                     continue
+                appointments = load_appointments(start_date, end_date)
 
                 # Get the status choice from the user
                 status = input(
-                    "Enter status (1-4), 1:cancelled, 2:confirmed, 3:pending, 4:all, 5:separate statistics): ")
+                    "Enter status (1-6), 1:cancelled, 2:confirmed, 3:pending, 4:all, 5:separate statistics, 6:completed): ")
                 if status == "1":
                     results = get_bookings(appointments, start_date, end_date, "cancelled")
                 elif status == "2":
@@ -227,6 +239,8 @@ def display_booking_summary():
                     results = get_bookings(appointments, start_date, end_date, "all")
                 elif status == "5":
                     results = get_bookings(appointments, start_date, end_date, "Separate statistics")
+                elif status == "6":
+                    results = get_bookings(appointments, start_date, end_date, "completed")
                 else:
                     print("Invalid choice, please try again.")
 
@@ -247,6 +261,7 @@ def display_booking_summary():
         print(f"Error displaying booking summary: {e}")
 
 
+@instrument
 def display_summary():
     """
     Displays a menu to allow the user to choose what type of summary they want to see:
@@ -327,9 +342,8 @@ def get_patients_for_mhwp(mhwp_name):
         print(f"No information found for MHWP {mhwp_name}.")
         return
 
-    # Extract the list of assigned patients for the MHWP
-    assigned_patients = mhwp_info['assigned_patients'].values[0]
-    assigned_patients_list = assigned_patients.split(',') if assigned_patients else []
+    # Extract the list of assigned patients for the MHWP from the assignment store
+    assigned_patients_list = get_assignments_by_mhwp(ASSIGNMENTS_DATA_PATH).get(mhwp_name, [])
 
     # If there are no assigned patients, notify the user
     if not assigned_patients_list:
@@ -347,6 +361,7 @@ def get_patients_for_mhwp(mhwp_name):
     print(tabulate(patients_assigned[['username', 'symptoms', 'registration_date']], headers='keys', tablefmt='grid', showindex=False))
 
 
+@instrument(max_reads_per_table=1, max_writes_per_table=0)
 def calculate_mhwp_patient_counts():
     """
     Calculates and returns the number of patients assigned to each MHWP along with their specialization.
@@ -354,8 +369,7 @@ def calculate_mhwp_patient_counts():
     """
     # Load data
     mhwp = load_mhwp()
-    patients = load_patients()
-    assignments = load_assignments()
+    assignments = get_assignments_by_mhwp(ASSIGNMENTS_DATA_PATH)
 
     # Initialize an empty list to store MHWP names and their assigned patient counts
     mhwp_patient_counts = []
@@ -365,13 +379,8 @@ def calculate_mhwp_patient_counts():
         mhwp_name = mhwp_row['username']
         mhwp_major = mhwp_row['major']
 
-        # Get the list of assigned patients for the current MHWP
-        assigned_patients = mhwp_row['assigned_patients']
-        if pd.isna(assigned_patients):
-            patient_count = 0
-        else:
-            assigned_patients_list = assigned_patients.split(',')
-            patient_count = len(assigned_patients_list)
+        # Count the patients currently assigned to the MHWP
+        patient_count = len(assignments.get(mhwp_name, []))
 
         # Add the data to the list
         mhwp_patient_counts.append([mhwp_name, mhwp_major, patient_count])
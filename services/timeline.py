@@ -0,0 +1,187 @@
+import csv
+import gzip
+import heapq
+from itertools import islice
+from datetime import datetime
+from tabulate import tabulate
+from config import *
+from utils.user_directory import get_user_id, get_username
+from utils.partitioned_store import table_files, is_partitioned
+from utils.offset_index import read_indexed_records
+from utils.appointment_archive import archive_files
+from utils.instrumentation import instrument, record_read
+
+
+def _appointment_time(row):
+    start = row["timeslot"].split("-")[0]
+    return datetime.strptime(f"{row['date']} {start}", "%Y/%m/%d %H:%M").strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _day_time(row):
+    return f"{row['date']} 00:00:00"
+
+
+# Timeline sources: file, patient id column, timestamp (sortable "YYYY-MM-DD HH:MM:SS") and a one-line summary.
+# "files" optionally lists extra files holding rows of the same table, e.g. archived appointments.
+TIMELINE_SOURCES = {
+    "Mood": {
+        "path": MOOD_DATA_PATH,
+        "id_column": "user_id",
+        "time": lambda row: row["timestamp"],
+        "details": lambda row: f"{row['color_code']}: {row['comments']}"
+    },
+    "Journal": {
+        "path": JOURNAL_ENTRIES_PATH,
+        "id_column": "patient_id",
+        "time": lambda row: row["timestamp"],
+        "details": lambda row: row["entry"]
+    },
+    "Assessment": {
+        "path": MENTAL_ASSESSMENTS_PATH,
+        "id_column": "patient_id",
+        "time": _day_time,
+        "details": lambda row: f"Score {row['score']} ({row['status']})"
+    },
+    "Note": {
+        "path": PATIENT_NOTES_PATH,
+        "id_column": "patient_id",
+        "time": _day_time,
+        "details": lambda row: f"{row['condition']}: {row['notes']} (by {get_username(row['mhwp_id'])})"
+    },
+    "Appointment": {
+        "path": APPOINTMENTS_DATA_PATH,
+        "files": lambda: archive_files(APPOINTMENTS_DATA_PATH),
+        "id_column": "patient_id",
+        "time": _appointment_time,
+        "details": lambda row: f"{row['timeslot']} with {get_username(row['mhwp_id'])} ({row['status']})"
+    },
+    "Comment": {
+        "path": COMMENTS_PATH,
+        "id_column": "patient_id",
+        "time": lambda row: row["timestamp"],
+        "details": lambda row: f"Rated {get_username(row['mhwp_id'])} {row['rating']}: {row['comment']}"
+    }
+}
+
+
+def _file_groups(spec, newest_first=True):
+    """
+    A source's files in groups that do not overlap in time, in timeline order: each monthly partition
+    on its own, or the table file together with its extra files (appointments and their archive).
+    """
+    if is_partitioned(spec["path"]):
+        return [[path] for path in table_files(spec["path"], newest_first=newest_first)]
+    return [table_files(spec["path"]) + (spec["files"]() if "files" in spec else [])]
+
+
+def _patient_rows(path, id_column, patient_id):
+    """
+    A patient's rows of one file as stored, in file order: looked up in the byte-offset index where the
+    file has one on id_column (see utils/offset_index.py), otherwise streamed from the file.
+    """
+    rows = read_indexed_records(path, id_column, patient_id)
+    if rows is not None:
+        return rows
+    rows, rows_read = [], 0
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        if id_column in header:
+            position = header.index(id_column)
+            for values in reader:
+                rows_read += 1
+                # Only the patient's rows are turned into dicts
+                if len(values) > position and values[position] == patient_id:
+                    rows.append(dict(zip(header, values)))
+    record_read(path, rows_read)
+    return rows
+
+
+def _source_stream(source, patient_id, newest_first=True):
+    """
+    Yield (time, source, row) for one patient from one source, sorted by time.
+    A group of files is only read when the merge reaches it, so early pages open only the newest partitions.
+    Only the patient's rows are kept, and since rows are appended in time order, sorting them is a single pass.
+    """
+    spec = TIMELINE_SOURCES[source]
+    for paths in _file_groups(spec, newest_first):
+        keyed_rows = []
+        for path in paths:
+            for row in _patient_rows(path, spec["id_column"], patient_id):
+                try:
+                    keyed_rows.append((spec["time"](row), row))
+                except (KeyError, ValueError):
+                    continue  # Skip rows with a malformed timestamp
+        keyed_rows.sort(key=lambda item: item[0], reverse=newest_first)
+        for time, row in keyed_rows:
+            yield time, source, row
+
+
+def iter_patient_timeline(patient_username, sources=None, newest_first=True):
+    """
+    Lazily merge a patient's mood entries, journals, assessments, notes, appointments and comments into one time-ordered stream.
+    :param sources: Optional list of source names from TIMELINE_SOURCES (default: all)
+    :return: Iterator of (time, source, row) tuples; row is the raw stored record
+    """
+    patient_id = get_user_id(patient_username)
+    if patient_id is None:
+        return iter(())
+    streams = [_source_stream(source, str(patient_id), newest_first) for source in (sources or TIMELINE_SOURCES)]
+    return heapq.merge(*streams, key=lambda event: event[0], reverse=newest_first)
+
+
+def _format_event(event):
+    time, source, row = event
+    return {"Time": time, "Type": source, "Details": TIMELINE_SOURCES[source]["details"](row)}
+
+
+def get_timeline_page(patient_username, page=1, page_size=10, sources=None, newest_first=True):
+    """
+    Materialize one page of a patient's timeline.
+    :return: (events, has_next) where events is a list of {"Time", "Type", "Details"} dicts
+    """
+    start = (page - 1) * page_size
+    timeline = iter_patient_timeline(patient_username, sources, newest_first)
+    page_events = list(islice(timeline, start, start + page_size + 1))
+    return [_format_event(event) for event in page_events[:page_size]], len(page_events) > page_size
+
+
+@instrument
+def view_patient_timeline(patient_username, page_size=10):
+    """
+    Show a patient's records from every source in one timeline, newest first, page by page.
+    The merged timeline stays open between pages: each page reads on from where the last one stopped,
+    and pages already seen are kept for going back.
+    """
+    timeline = iter_patient_timeline(patient_username)
+    events = []
+    page = 1
+    while True:
+        # One event past the page tells whether there is a next page
+        missing = page * page_size + 1 - len(events)
+        if missing > 0:
+            events.extend(_format_event(event) for event in islice(timeline, missing))
+        page_events = events[(page - 1) * page_size:page * page_size]
+        has_next = len(events) > page * page_size
+        if not page_events:
+            print(f"\nNo timeline entries found for {patient_username}." if page == 1 else "\nNo more entries.")
+            return
+        print(f"\nTimeline for {patient_username} (Page {page}):")
+        print(tabulate(page_events, headers="keys", tablefmt="grid", maxcolwidths=[None, None, 60]))
+
+        print("\nOptions:")
+        if has_next:
+            print("1. Next page")
+        if page > 1:
+            print("2. Previous page")
+        print("3. Return")
+        choice = input("Select an option: ").strip()
+        if choice == "1" and has_next:
+            page += 1
+        elif choice == "2" and page > 1:
+            page -= 1
+        elif choice == "3":
+            return
+        else:
+            print("Invalid choice, please try again.")
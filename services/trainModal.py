@@ -1,5 +1,6 @@
 import numpy as np
 import pickle
+from utils.instrumentation import instrument
 
 # Compute Term Frequency (TF) for each document
 def compute_tf(documents):
@@ -115,6 +116,7 @@ def kmeans(tfidf_features, k=3, max_iters=100):
     return clusters, centers
 
 
+@instrument
 def train_modal():
     """
     Trains a model on a set of example documents using TF-IDF features and K-means clustering.
@@ -0,0 +1,170 @@
+import os
+import csv
+import pandas as pd
+from datetime import date, datetime
+from config import APPOINTMENTS_DATA_PATH
+from utils.data_store import read_table, concat_tables
+from utils.schemas import get_schema, apply_schema
+from utils.instrumentation import instrument, record_read, record_write
+from utils.table_lock import table_lock
+
+# appointments.csv only holds the active appointments: pending ones from today
+# onwards, and confirmed ones until the completion sweep marks them completed.
+# Booking, listing and cancelling read and write just that small file.
+# archive_appointments() moves every other row (cancelled, completed, or pending
+# in the past) into gzip-compressed segments in data/appointments_archive/. A segment
+# is never rewritten, and each run adds at most one new segment. The segments are
+# listed in manifest.csv with their row count, first and last date and highest id.
+# Only history readers (summaries, the timeline, the completed-appointment index)
+# read the archive, through read_appointments().
+
+MANIFEST_COLUMNS = ["segment", "rows", "first", "last", "max_id"]
+DATE_FORMAT = "%Y/%m/%d"
+
+
+def archive_dir(appointments_path=APPOINTMENTS_DATA_PATH):
+    """Directory of the archive segments, e.g. data/appointments_archive for data/appointments.csv."""
+    return f"{os.path.splitext(appointments_path)[0]}_archive"
+
+
+def _manifest_path(appointments_path):
+    return os.path.join(archive_dir(appointments_path), "manifest.csv")
+
+
+def load_archive_manifest(appointments_path=APPOINTMENTS_DATA_PATH):
+    """Return the archive segments, oldest first, as dicts with the MANIFEST_COLUMNS."""
+    manifest_path = _manifest_path(appointments_path)
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path, "r", encoding="utf-8", newline='') as file:
+        entries = [{**row, "rows": int(row["rows"]), "max_id": int(row["max_id"])} for row in csv.DictReader(file)]
+    record_read(manifest_path, len(entries))
+    return entries
+
+
+def _save_manifest(appointments_path, entries):
+    manifest_path = _manifest_path(appointments_path)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        writer.writerows(entries)
+    os.replace(temp_path, manifest_path)
+    record_write(manifest_path, len(entries))
+
+
+def _bound(value):
+    """Turn a date bound (date, datetime or string) into a stored "YYYY/MM/DD" string."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (date, datetime, pd.Timestamp)):
+        return value.strftime(DATE_FORMAT)
+    raise TypeError(f"Unsupported date bound: {value!r}")
+
+
+def archive_files(appointments_path=APPOINTMENTS_DATA_PATH, start=None, end=None):
+    """Archive segments that may hold appointments between start and end (inclusive, either may be None)."""
+    start, end = _bound(start), _bound(end)
+    return [
+        os.path.join(archive_dir(appointments_path), entry["segment"])
+        for entry in load_archive_manifest(appointments_path)
+        if (start is None or entry["last"] >= start) and (end is None or entry["first"] <= end)
+    ]
+
+
+def is_active(appointments, today=None):
+    """Mask of the appointments that stay in appointments.csv: confirmed, or pending from today onwards."""
+    today = _bound(today or date.today())
+    status = appointments["status"].astype(str)
+    return (status == "confirmed") | ((status == "pending") & (appointments["date"].astype(str) >= today))
+
+
+def _read_stored(appointments_path):
+    """Read appointments.csv as stored (all strings), so archived rows are copied unchanged."""
+    appointments = pd.read_csv(appointments_path, dtype=str, keep_default_na=False)
+    record_read(appointments_path, len(appointments))
+    return appointments
+
+
+# The second read only happens if a booking or cancellation changed the file meanwhile
+@instrument(max_reads_per_table=2, max_writes_per_table=1)
+def archive_appointments(appointments_path=APPOINTMENTS_DATA_PATH, today=None):
+    """
+    Move cancelled, completed and past appointments from appointments.csv into a new archive segment.
+    Rows are copied as stored. The file is read again under the table lock (see utils/table_lock.py)
+    if a booking or cancellation changed it since it was first read, so no new row is lost.
+    :return: Number of appointments archived
+    """
+    try:
+        stat = os.stat(appointments_path)
+        appointments = _read_stored(appointments_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return 0
+    if is_active(appointments, today).all():
+        return 0
+
+    with table_lock(appointments_path):
+        signature = os.stat(appointments_path)
+        if (signature.st_mtime_ns, signature.st_size) != (stat.st_mtime_ns, stat.st_size):
+            appointments = _read_stored(appointments_path)
+        active = is_active(appointments, today)
+        archived = appointments[~active]
+        if archived.empty:
+            return 0
+
+        os.makedirs(archive_dir(appointments_path), exist_ok=True)
+        entries = load_archive_manifest(appointments_path)
+        segment = f"segment-{len(entries) + 1:05d}.csv.gz"
+        segment_path = os.path.join(archive_dir(appointments_path), segment)
+        archived.to_csv(segment_path, index=False, compression="gzip")
+        record_write(segment_path, len(archived))
+
+        temp_path = f"{appointments_path}.tmp"
+        appointments[active].to_csv(temp_path, index=False)
+        # The manifest is saved first: a crash before the replace leaves rows in both places,
+        # which read_appointments drops by id, rather than losing them
+        entries.append({
+            "segment": segment, "rows": len(archived),
+            "first": archived["date"].min(), "last": archived["date"].max(),
+            "max_id": int(pd.to_numeric(archived["id"], errors="coerce").max())
+        })
+        _save_manifest(appointments_path, entries)
+        os.replace(temp_path, appointments_path)
+    record_write(appointments_path, len(appointments) - len(archived))
+    return len(archived)
+
+
+def next_appointment_id(appointments, appointments_path=APPOINTMENTS_DATA_PATH):
+    """Next free appointment id, counting the archived appointments too."""
+    ids = [int(appointments["id"].max())] if not appointments.empty else []
+    ids += [entry["max_id"] for entry in load_archive_manifest(appointments_path)]
+    return max(ids, default=0) + 1
+
+
+def with_archive(appointments, appointments_path=APPOINTMENTS_DATA_PATH, start=None, end=None, parse_dates=False):
+    """
+    Add the archived appointments between start and end to the active appointments read from appointments.csv.
+    """
+    schema = get_schema(appointments_path)
+    frames = [read_table(path) for path in archive_files(appointments_path, start, end)]
+    if pd.api.types.is_datetime64_any_dtype(appointments["date"]):
+        appointments = appointments.assign(date=appointments["date"].dt.strftime(DATE_FORMAT))
+    df = appointments
+    if frames:
+        # Active rows win over archived copies left by an interrupted archive run
+        frames = [frame for frame in [appointments, *frames] if not frame.empty] or [appointments]
+        df = concat_tables(frames, schema).drop_duplicates("id", keep="first")
+    start, end = _bound(start), _bound(end)
+    if start is not None:
+        df = df[df["date"] >= start]
+    if end is not None:
+        df = df[df["date"] <= end]
+    return apply_schema(df.reset_index(drop=True), schema, parse_dates)
+
+
+def read_appointments(appointments_path=APPOINTMENTS_DATA_PATH, start=None, end=None, parse_dates=False):
+    """
+    Read the whole appointment history: the active appointments and the archived ones, optionally
+    only between two dates. Only the archive segments overlapping the range are read.
+    """
+    return with_archive(read_table(appointments_path), appointments_path, start, end, parse_dates)
@@ -0,0 +1,156 @@
+import os
+import csv
+from config import ASSIGNMENTS_DATA_PATH
+from utils.user_directory import load_directory
+from utils.instrumentation import record_read, record_write
+from utils.table_lock import table_lock
+
+# assignments.csv is the single source of truth for patient -> MHWP assignments.
+# It is kept as an append-only log of (patient_id, mhwp_id) rows: the last row for
+# a patient wins and an empty mhwp_id means the patient was unassigned. A change
+# therefore appends one row instead of rewriting the file, and compact_assignments()
+# folds the log back to one row per patient. Appends and rewrites hold the table lock (see
+# utils/table_lock.py), and a compaction re-reads the log under it, so rows appended
+# while it runs are not lost. Users are stored by user_id (see utils/user_directory.py);
+# this module takes and returns usernames.
+ASSIGNMENT_COLUMNS = ["patient_id", "mhwp_id"]
+
+_assignment_cache = {}
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_assignments(assignments_path=ASSIGNMENTS_DATA_PATH):
+    """
+    Load the current assignments as a dict of patient username -> MHWP username.
+    The parsed log is cached until the file changes.
+    """
+    if not os.path.exists(assignments_path):
+        return {}
+
+    signature = _file_signature(assignments_path)
+    cached = _assignment_cache.get(assignments_path)
+    if cached and cached[0] == signature:
+        assignment_ids = cached[1]
+    else:
+        assignment_ids = {}
+        rows_read = 0
+        with open(assignments_path, "r", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                rows_read += 1
+                patient_id = (row.get("patient_id") or "").strip()
+                mhwp_id = (row.get("mhwp_id") or "").strip()
+                if not patient_id:
+                    continue
+                if mhwp_id:
+                    assignment_ids[int(patient_id)] = int(mhwp_id)
+                else:
+                    assignment_ids.pop(int(patient_id), None)
+        _assignment_cache[assignments_path] = (signature, assignment_ids)
+        record_read(assignments_path, rows_read, signature[1])
+
+    # Resolve ids to the current usernames, skipping users that no longer exist
+    id_to_username = load_directory()[0]
+    return {
+        id_to_username[patient_id]: id_to_username[mhwp_id]
+        for patient_id, mhwp_id in assignment_ids.items()
+        if patient_id in id_to_username and mhwp_id in id_to_username
+    }
+
+
+def get_assigned_mhwp(patient_username, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """Return the MHWP assigned to a patient, or None."""
+    return load_assignments(assignments_path).get(patient_username)
+
+
+def get_assignments_by_mhwp(assignments_path=ASSIGNMENTS_DATA_PATH):
+    """Return the current assignments as a dict of MHWP username -> list of patient usernames."""
+    by_mhwp = {}
+    for patient, mhwp in load_assignments(assignments_path).items():
+        by_mhwp.setdefault(mhwp, []).append(patient)
+    return by_mhwp
+
+
+def get_patients_for_mhwp(mhwp_username, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """Return the patients currently assigned to an MHWP."""
+    return [patient for patient, mhwp in load_assignments(assignments_path).items() if mhwp == mhwp_username]
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def _append_rows(rows, assignments_path):
+    """Append assignment rows in a single write, creating the file with a header if needed."""
+    with table_lock(assignments_path):
+        size_before = os.path.getsize(assignments_path) if os.path.exists(assignments_path) else 0
+        new_file = size_before == 0
+        needs_newline = not new_file and not _ends_with_newline(assignments_path)
+        with open(assignments_path, "a", newline='', encoding="utf-8") as file:
+            if needs_newline:
+                file.write("\n")
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(ASSIGNMENT_COLUMNS)
+            writer.writerows(rows)
+        record_write(assignments_path, len(rows), None if new_file else os.path.getsize(assignments_path) - size_before)
+
+
+def assign_patients(assignments, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """
+    Record new or changed assignments.
+    :param assignments: Dict of patient username -> MHWP username (None or "" to unassign)
+    Raises ValueError, before anything is written, if an MHWP username is unknown.
+    """
+    if not assignments:
+        return
+    username_to_id = load_directory()[1]
+    unknown = sorted({mhwp for mhwp in assignments.values() if mhwp and mhwp not in username_to_id})
+    if unknown:
+        raise ValueError(f"Unknown MHWP username(s): {', '.join(unknown)}")
+    rows = [(username_to_id[patient], username_to_id[mhwp] if mhwp else "")
+            for patient, mhwp in assignments.items() if patient in username_to_id]
+    _append_rows(rows, assignments_path)
+
+
+def assign_patient(patient_username, mhwp_username, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """Assign (or reassign) a single patient with one appended row."""
+    assign_patients({patient_username: mhwp_username}, assignments_path)
+
+
+def unassign_patient(patient_username, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """Remove a patient's assignment with one appended row."""
+    assign_patients({patient_username: None}, assignments_path)
+
+
+def write_assignments(assignments, assignments_path=ASSIGNMENTS_DATA_PATH):
+    """
+    Replace the whole store with one row per patient. The file is replaced atomically.
+    :param assignments: Dict of patient username -> MHWP username
+    :return: The rows written, sorted by patient
+    """
+    rows = sorted((patient, mhwp) for patient, mhwp in assignments.items() if mhwp)
+    username_to_id = load_directory()[1]
+    temp_path = f"{assignments_path}.tmp"
+    with table_lock(assignments_path):
+        with open(temp_path, "w", newline='', encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(ASSIGNMENT_COLUMNS)
+            writer.writerows((username_to_id[patient], username_to_id[mhwp]) for patient, mhwp in rows
+                             if patient in username_to_id and mhwp in username_to_id)
+        os.replace(temp_path, assignments_path)
+    record_write(assignments_path, len(rows))
+    return rows
+
+
+def compact_assignments(assignments_path=ASSIGNMENTS_DATA_PATH):
+    """Fold the assignment log down to the current assignment of each patient."""
+    with table_lock(assignments_path):
+        # Read under the lock, so assignments appended since the caller looked are kept
+        return write_assignments(load_assignments(assignments_path), assignments_path)
@@ -0,0 +1,197 @@
+import os
+import csv
+import numpy as np
+import pandas as pd
+from utils.user_directory import load_directory, load_username_categories, assign_user_ids
+from utils.instrumentation import record_read, record_write
+from utils.table_lock import table_lock
+from utils.schemas import get_schema, read_options, apply_schema, format_dates
+
+# Tables store users by user_id (see utils/user_directory.py) but the application
+# works with usernames. read_table/write_table translate the foreign key columns
+# at the file boundary, so callers keep using the username column names below.
+# Username columns are Categoricals over the whole user directory (see
+# load_username_categories), so each row holds a small integer code.
+FOREIGN_KEYS = {
+    "user_id": "username",
+    "patient_id": "patient_username",
+    "mhwp_id": "mhwp_username"
+}
+USERNAME_COLUMNS = {name: key for key, name in FOREIGN_KEYS.items()}
+# Rows per chunk when a table is streamed (see iter_matching_rows)
+CHUNK_ROWS = 50000
+
+
+def _is_directory(columns):
+    """The user directory holds both user_id and username and is stored as-is."""
+    return "user_id" in columns and "username" in columns
+
+
+def _username_codes(ids, codes_by_id):
+    ids = pd.to_numeric(ids, errors="coerce").to_numpy(dtype="float64")
+    known = ~np.isnan(ids) & (ids >= 0) & (ids < len(codes_by_id))
+    codes = np.full(len(ids), -1, dtype=codes_by_id.dtype)
+    codes[known] = codes_by_id[ids[known].astype(np.int64)]
+    return codes
+
+
+def to_usernames(df):
+    """Replace the *_id foreign key columns of a stored table with categorical username columns."""
+    if _is_directory(df.columns):
+        return df
+    renames = {key: name for key, name in FOREIGN_KEYS.items() if key in df.columns}
+    if not renames:
+        return df
+    dtype, codes_by_id = load_username_categories()
+    for key in renames:
+        df[key] = pd.Categorical.from_codes(_username_codes(df[key], codes_by_id), dtype=dtype)
+    return df.rename(columns=renames)
+
+
+def to_user_ids(df):
+    """Replace the username columns of an application frame with *_id foreign key columns."""
+    if _is_directory(df.columns):
+        return assign_user_ids(df)
+    columns = [name for name in USERNAME_COLUMNS if name in df.columns]
+    if not columns:
+        return df
+    username_to_id = load_directory()[1]
+    df = df.copy()
+    for name in columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            # Look up each category once, then expand by the codes
+            category_ids = pd.Series(df[name].cat.categories).map(username_to_id).to_numpy(dtype="float64")
+            codes = df[name].cat.codes.to_numpy()
+            ids = np.where(codes >= 0, category_ids[codes], np.nan)
+            df[name] = pd.Series(ids, index=df.index).astype("Int64")
+        else:
+            df[name] = df[name].map(username_to_id).astype("Int64")
+    return df.rename(columns={name: USERNAME_COLUMNS[name] for name in columns})
+
+
+def read_table(file_path, parse_dates=False, **kwargs):
+    """
+    Read a CSV table with its user foreign keys resolved to usernames and the column types
+    of its schema (utils/schemas.py) applied.
+    :param parse_dates: Parse the schema's date columns to datetimes, with their stored format
+    Accepts the same keyword arguments as pd.read_csv.
+    """
+    schema = get_schema(file_path)
+    if schema and "dtype" not in kwargs:
+        kwargs["dtype"] = read_options(schema, kwargs.get("usecols"))
+    df = pd.read_csv(file_path, **kwargs)
+    record_read(file_path, len(df))
+    return apply_schema(to_usernames(df), schema, parse_dates)
+
+
+def concat_tables(frames, schema):
+    """Concatenate frames of one table, keeping columns categorical when their categories differ between frames."""
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    for column in schema.get("categories", {}):
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return apply_schema(df, schema)
+
+
+def iter_matching_rows(file_path, column, value, chunksize=CHUNK_ROWS, **kwargs):
+    """
+    Stream a table CHUNK_ROWS rows at a time and yield, for each chunk, the rows whose column equals value,
+    converted as read_table would. Only one chunk is held in memory at a time, whatever the file size.
+    For a username column the stored user id is compared, so other users' rows are never converted.
+    Accepts the same keyword arguments as pd.read_csv.
+    """
+    schema = get_schema(file_path)
+    if schema and "dtype" not in kwargs:
+        kwargs["dtype"] = read_options(schema, kwargs.get("usecols"))
+    key = USERNAME_COLUMNS.get(column)
+    user_id = load_directory()[1].get(value) if key else None
+    reader = pd.read_csv(file_path, chunksize=chunksize, **kwargs)
+    rows = 0
+    try:
+        for chunk in reader:
+            rows += len(chunk)
+            if key in chunk.columns:
+                matches = chunk[pd.to_numeric(chunk[key], errors="coerce") == user_id]
+            else:
+                matches = chunk[chunk[column] == value]
+            yield apply_schema(to_usernames(matches.copy()), schema)
+    finally:
+        reader.close()
+        record_read(file_path, rows)
+
+
+def read_matching_rows(file_path, column, value, chunksize=CHUNK_ROWS, **kwargs):
+    """
+    Read only the rows of a table whose column equals value (see iter_matching_rows), streaming the file
+    in chunks so peak memory is bounded by the chunk size and the number of matches.
+    Tables with a byte-offset index on the column (see utils/offset_index.py) parse only the matching rows.
+    """
+    if not kwargs:
+        from utils.offset_index import is_indexed, read_indexed_rows
+        if is_indexed(file_path, column):
+            df = read_indexed_rows(file_path, column, value)
+            if df is not None:
+                return df
+    frames = list(iter_matching_rows(file_path, column, value, chunksize, **kwargs))
+    matched = [frame for frame in frames if not frame.empty]
+    return concat_tables(matched or frames[:1], get_schema(file_path)).reset_index(drop=True)
+
+
+def write_table(df, file_path, **kwargs):
+    """
+    Write a table, storing usernames as user ids. The file is replaced atomically.
+    Accepts the same keyword arguments as DataFrame.to_csv (index defaults to False).
+    """
+    kwargs.setdefault("index", False)
+    temp_path = f"{file_path}.tmp"
+    to_user_ids(format_dates(df, get_schema(file_path))).to_csv(temp_path, **kwargs)
+    os.replace(temp_path, file_path)
+    record_write(file_path, len(df))
+
+
+def append_table(df, file_path):
+    """
+    Append rows to a table, writing the header only if the file is new.
+    Columns are written in the order of the existing header.
+    """
+    df = to_user_ids(format_dates(df, get_schema(file_path)))
+    # Under the table's lock, so a background rewrite of the file cannot drop these rows
+    with table_lock(file_path):
+        size_before = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        new_file = size_before == 0
+        if not new_file:
+            with open(file_path, "r", encoding="utf-8", newline='') as file:
+                header = next(csv.reader(file), None)
+            if header:
+                df = df.reindex(columns=header)
+        df.to_csv(file_path, mode='a', header=new_file, index=False)
+        record_write(file_path, len(df), os.path.getsize(file_path) - size_before)
+    # Index the new rows if the table has a byte-offset index
+    from utils.offset_index import index_path, update_offset_index
+    if os.path.exists(index_path(file_path)):
+        update_offset_index(file_path)
+
+
+def read_records(file_path):
+    """
+    Read a table as a list of dicts of strings (like csv.DictReader) with usernames resolved.
+    """
+    id_to_username = load_directory()[0]
+    with open(file_path, "r", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        if _is_directory(reader.fieldnames or []):
+            return list(reader)
+        keys = [key for key in FOREIGN_KEYS if key in (reader.fieldnames or [])]
+        records = []
+        for row in reader:
+            for key in keys:
+                value = row.pop(key)
+                try:
+                    row[FOREIGN_KEYS[key]] = id_to_username.get(int(float(value)), "")
+                except (TypeError, ValueError):
+                    row[FOREIGN_KEYS[key]] = ""
+            records.append(row)
+    record_read(file_path, len(records))
+    return records
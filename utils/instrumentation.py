@@ -0,0 +1,215 @@
+import os
+import time
+import atexit
+import cProfile
+import functools
+import threading
+from tabulate import tabulate
+from config import DATA_DIR
+
+# Per-action timing and CSV I/O counters, switched on with `python main.py --profile`.
+# Every CSV read or write in the application goes through utils/data_store.py or calls
+# record_read/record_write directly, and service entry points are wrapped with
+# @instrument. I/O is credited to every instrumented call that is running, so each
+# action's numbers include the calls it makes.
+# When profiling is off, both the decorator and the recorders return immediately.
+#
+# An entry point can also declare an I/O budget, e.g.
+#   @instrument(max_reads_per_table=1)
+# Calls that go over budget are recorded as violations, which fail the benchmark suite
+# and are listed in the --profile summary; with BREEZE_STRICT_IO=1 they also raise
+# IOBudgetExceeded.
+
+STAT_FIELDS = ["calls", "seconds", "reads", "writes", "bytes_read", "bytes_written", "rows_read", "rows_written"]
+
+_enabled = False
+_strict = False
+_local = threading.local()  # Each thread (e.g. the job scheduler's) keeps its own stack of running actions
+_action_stats = {}
+_budget_violations = []
+_profiler = None
+
+
+class IOBudgetExceeded(AssertionError):
+    """Raised in strict mode when an action reads or writes a table more often than its budget allows."""
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_instrumentation(strict=None):
+    """
+    Start collecting stats.
+    :param strict: Raise IOBudgetExceeded on budget violations (default: BREEZE_STRICT_IO environment variable)
+    """
+    global _enabled, _strict
+    _enabled = True
+    _strict = os.environ.get("BREEZE_STRICT_IO") == "1" if strict is None else strict
+
+
+def reset_stats():
+    _action_stats.clear()
+    _budget_violations.clear()
+
+
+def get_stats():
+    """Return a copy of the collected stats: action name -> {field: value, "tables": {file: {"reads", "writes"}}}."""
+    return {
+        action: {**stats, "tables": {table: dict(counts) for table, counts in stats["tables"].items()}}
+        for action, stats in _action_stats.items()
+    }
+
+
+def get_budget_violations():
+    """Return the budget violations recorded so far as messages."""
+    return list(_budget_violations)
+
+
+def _new_stats():
+    return {**dict.fromkeys(STAT_FIELDS, 0), "tables": {}}
+
+
+def _check_budget(action, tables, max_reads_per_table, max_writes_per_table):
+    over = [
+        f"{table} read {counts['reads']} times (budget {max_reads_per_table})"
+        for table, counts in tables.items()
+        if max_reads_per_table is not None and counts["reads"] > max_reads_per_table
+    ] + [
+        f"{table} written {counts['writes']} times (budget {max_writes_per_table})"
+        for table, counts in tables.items()
+        if max_writes_per_table is not None and counts["writes"] > max_writes_per_table
+    ]
+    if not over:
+        return
+    message = f"{action}: " + "; ".join(over)
+    _budget_violations.append(message)
+    if _strict:
+        raise IOBudgetExceeded(message)
+
+
+def instrument(func=None, name=None, max_reads_per_table=None, max_writes_per_table=None):
+    """
+    Record wall time and CSV I/O for each call of a service entry point.
+    Usable as @instrument or @instrument(name="action name", max_reads_per_table=1, ...).
+    """
+    if func is None:
+        return functools.partial(instrument, name=name, max_reads_per_table=max_reads_per_table,
+                                 max_writes_per_table=max_writes_per_table)
+    action = name or func.__name__
+    has_budget = max_reads_per_table is not None or max_writes_per_table is not None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        stats = _action_stats.setdefault(action, _new_stats())
+        call = {"stats": stats, "tables": {}}
+        active_calls = _active_calls()
+        active_calls.append(call)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+            stats["calls"] += 1
+            active_calls.pop()
+        if has_budget:
+            _check_budget(action, call["tables"], max_reads_per_table, max_writes_per_table)
+        return result
+    return wrapper
+
+
+def _active_calls():
+    try:
+        return _local.calls
+    except AttributeError:
+        _local.calls = []
+        return _local.calls
+
+
+def _table_name(file_path):
+    """Files in the data directory are named relative to it, so partitions read as e.g. mood_data/2024-12.csv."""
+    relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(DATA_DIR))
+    if relative.startswith(os.pardir):
+        return os.path.basename(file_path)
+    return relative.replace(os.sep, "/")
+
+
+def _credit(file_path, **counts):
+    active_calls = _active_calls()
+    table = _table_name(file_path)
+    kind = "reads" if "reads" in counts else "writes"
+    # The same action can be on the stack more than once when it recurses; credit its stats once
+    for stats in {id(call["stats"]): call["stats"] for call in active_calls}.values():
+        for field, value in counts.items():
+            stats[field] += value
+        stats["tables"].setdefault(table, {"reads": 0, "writes": 0})[kind] += 1
+    for call in active_calls:
+        call["tables"].setdefault(table, {"reads": 0, "writes": 0})[kind] += 1
+
+
+def record_read(file_path, rows=0, nbytes=None):
+    """Count one file read by the running actions."""
+    if not _enabled or not _active_calls():
+        return
+    if nbytes is None:
+        try:
+            nbytes = os.path.getsize(file_path)
+        except OSError:
+            nbytes = 0
+    _credit(file_path, reads=1, rows_read=rows, bytes_read=nbytes)
+
+
+def record_write(file_path, rows=0, nbytes=None):
+    """Count one file write by the running actions (nbytes defaults to the file size)."""
+    if not _enabled or not _active_calls():
+        return
+    if nbytes is None:
+        try:
+            nbytes = os.path.getsize(file_path)
+        except OSError:
+            nbytes = 0
+    _credit(file_path, writes=1, rows_written=rows, bytes_written=nbytes)
+
+
+def print_summary():
+    """Print the per-action table, slowest first."""
+    if not _action_stats:
+        print("\nProfile: no instrumented actions were run.")
+        return
+    rows = [
+        [action, stats["calls"], f"{stats['seconds'] * 1000:.1f}", f"{stats['seconds'] * 1000 / stats['calls']:.1f}",
+         stats["reads"], stats["writes"], f"{stats['bytes_read'] / 1024:.1f}", stats["rows_read"], stats["rows_written"]]
+        for action, stats in sorted(_action_stats.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        if stats["calls"]
+    ]
+    print("\nProfile summary (I/O includes nested actions; interactive actions include time spent waiting for input):")
+    print(tabulate(rows, headers=["Action", "Calls", "Total ms", "Avg ms", "CSV reads", "CSV writes",
+                                  "KiB read", "Rows read", "Rows written"], tablefmt="grid"))
+    if _budget_violations:
+        print("\nI/O budget violations:")
+        for message in _budget_violations:
+            print(f"- {message}")
+
+
+def start_profiling(prof_path=None):
+    """
+    Turn on instrumentation for the rest of the process and print the summary at exit.
+    :param prof_path: Optional file for a cProfile dump (open with pstats or snakeviz)
+    """
+    global _profiler
+    enable_instrumentation()
+    if prof_path:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_finish_profiling, prof_path)
+
+
+def _finish_profiling(prof_path=None):
+    if _profiler:
+        _profiler.disable()
+        _profiler.dump_stats(prof_path)
+    print_summary()
+    if prof_path:
+        print(f"cProfile output saved to {prof_path}")
@@ -1,6 +1,6 @@
-import pandas as pd
 from tabulate import tabulate
 from config import *
+from utils.data_store import read_table
 import time
 
 def list_all_users(role_type, mhwp_data_path=MHWP_DATA_PATH, patients_data_path=PATIENTS_DATA_PATH):
@@ -10,10 +10,10 @@ def list_all_users(role_type, mhwp_data_path=MHWP_DATA_PATH, patients_data_path=
     Returns selected username or None if cancelled.
     """
     if role_type == 'mhwp':
-        df = pd.read_csv(mhwp_data_path)
+        df = read_table(mhwp_data_path)
         headers = ['#', 'Username', 'Status', 'Major']
     else:
-        df = pd.read_csv(patients_data_path)
+        df = read_table(patients_data_path)
         headers = ['#', 'Username', 'Status', 'Symptoms']
         
     users = df.to_dict('records')
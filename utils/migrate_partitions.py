@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from utils.partitioned_store import PARTITIONED_TABLES, is_partitioned, split_table
+
+# One-off migration of the time-series tables (see utils/partitioned_store.py)
+# from a single file to monthly partitions.
+
+
+def migrate_to_partitions(data_dir=DATA_DIR, silent=False):
+    """
+    Split mood_data.csv and patient_journaling.csv into monthly partitions.
+    Tables that are already split are left untouched, so this is safe to run at every start.
+    :return: List of migrated file names
+    """
+    migrated = []
+    for file in PARTITIONED_TABLES:
+        file_path = os.path.join(data_dir, file)
+        if not os.path.exists(file_path):
+            continue
+        if is_partitioned(file_path):
+            if not silent:
+                print(f"Warning: {file} exists next to its partitions and was left as it is.")
+            continue
+        if split_table(file_path):
+            migrated.append(file)
+
+    if migrated and not silent:
+        print(f"Split into monthly partitions: {', '.join(migrated)}")
+    return migrated
+
+
+if __name__ == "__main__":
+    migrate_to_partitions(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
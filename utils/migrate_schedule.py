@@ -0,0 +1,35 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from utils.data_store import read_table
+from utils.schedule_store import write_schedule
+
+# One-off migration of the generated schedule (one row per MHWP day in
+# mhwp_schedule.csv) to exceptions to the weekly templates (see utils/schedule_store.py).
+
+
+def migrate_to_schedule_exceptions(data_dir=DATA_DIR, silent=False):
+    """
+    Record every slot of mhwp_schedule.csv that differs from its template as a schedule exception,
+    then remove the file. Once the file is gone this does nothing, so it is safe to run at every start.
+    :return: List of migrated file names
+    """
+    schedule_path = os.path.join(data_dir, "mhwp_schedule.csv")
+    if not os.path.exists(schedule_path):
+        return []
+    try:
+        recorded = write_schedule(read_table(schedule_path), schedule_path)
+    except pd.errors.EmptyDataError:
+        recorded = 0
+    os.remove(schedule_path)
+
+    if not silent:
+        print(f"Converted mhwp_schedule.csv into {recorded} schedule exceptions.")
+    return ["mhwp_schedule.csv"]
+
+
+if __name__ == "__main__":
+    migrate_to_schedule_exceptions(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
@@ -0,0 +1,78 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from utils.user_directory import assign_user_ids
+
+# One-off migration from username foreign keys to user ids.
+# Maps each table to its username columns and the id column that replaces them.
+TABLE_FOREIGN_KEYS = {
+    'patients.csv': {'username': 'user_id'},
+    'mhwp.csv': {'username': 'user_id'},
+    'mood_data.csv': {'username': 'user_id'},
+    'appointments.csv': {'patient_username': 'patient_id', 'mhwp_username': 'mhwp_id'},
+    'assignments.csv': {'patient_username': 'patient_id', 'mhwp_username': 'mhwp_id'},
+    'comments.csv': {'patient_username': 'patient_id', 'mhwp_username': 'mhwp_id'},
+    'mental_assessments.csv': {'patient_username': 'patient_id', 'mhwp_username': 'mhwp_id'},
+    'patient_notes.csv': {'patient_username': 'patient_id', 'mhwp_username': 'mhwp_id'},
+    'patient_journaling.csv': {'patient_username': 'patient_id'},
+    'mhwp_schedule.csv': {'mhwp_username': 'mhwp_id'},
+    'mhwp_schedule_template.csv': {'mhwp_username': 'mhwp_id'},
+    'mhwp_capacity.csv': {'mhwp_username': 'mhwp_id'}
+}
+# Username snapshot columns that are derived from assignments.csv and no longer stored
+DROPPED_COLUMNS = {
+    'patients.csv': ['assigned_mhwp'],
+    'mhwp.csv': ['assigned_patients']
+}
+
+
+def migrate_to_user_ids(data_dir=DATA_DIR, silent=False):
+    """
+    Give every user an immutable user_id and replace username foreign keys with it.
+    Tables that are already migrated are left untouched, so this is safe to run at every start.
+    :return: List of migrated file names
+    """
+    migrated = []
+    user_data_path = os.path.join(data_dir, 'user_data.csv')
+    if not os.path.exists(user_data_path):
+        return migrated
+
+    user_df = pd.read_csv(user_data_path)
+    if 'user_id' not in user_df.columns or user_df['user_id'].isna().any():
+        user_df = assign_user_ids(user_df)
+        user_df.to_csv(user_data_path, index=False, na_rep='')
+        migrated.append('user_data.csv')
+    username_to_id = dict(zip(user_df['username'], user_df['user_id']))
+
+    for file, columns in TABLE_FOREIGN_KEYS.items():
+        file_path = os.path.join(data_dir, file)
+        try:
+            df = pd.read_csv(file_path)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            continue
+        pending = {old: new for old, new in columns.items() if old in df.columns}
+        dropped = [col for col in DROPPED_COLUMNS.get(file, []) if col in df.columns]
+        if not pending and not dropped:
+            continue
+
+        unknown = set()
+        for old in pending:
+            names = df[old].dropna().astype(str)
+            unknown.update(names[~names.isin(username_to_id.keys())])
+            df[old] = df[old].map(username_to_id).astype('Int64')
+        if unknown and not silent:
+            print(f"Warning: {file} refers to unknown users {sorted(unknown)}; their ids are left blank.")
+        df = df.drop(columns=dropped).rename(columns=pending)
+        df.to_csv(file_path, index=False, na_rep='')
+        migrated.append(file)
+
+    if migrated and not silent:
+        print(f"Migrated to user ids: {', '.join(migrated)}")
+    return migrated
+
+
+if __name__ == "__main__":
+    migrate_to_user_ids(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
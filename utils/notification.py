@@ -5,6 +5,8 @@ import csv
 import configparser
 import os
 import sys
+from config import USER_DATA_PATH
+from utils.instrumentation import record_read
 
 def load_email_config(config_file="email_config.ini"):
     """
@@ -63,16 +65,18 @@ def send_email_notification(recipient_email, subject, message, config_file="emai
     except Exception as e:
         print(f"Failed to send email notification: {e}")
 
-def get_email_by_username(username, file_path="data/user_data.csv"):
+def get_email_by_username(username, file_path=USER_DATA_PATH):
     """
     Retrieve the email address for a given username from user_data.csv.
     """
     try:
         with open(file_path, 'r', encoding='utf-8') as file:
             reader = csv.DictReader(file)
-            for row in reader:
+            for rows_read, row in enumerate(reader, 1):
                 if row['username'] == username:
+                    record_read(file_path, rows_read)
                     return row['email']
+        record_read(file_path)
     except FileNotFoundError:
         print(f"Error: User data file '{file_path}' not found.")
     except Exception as e:
@@ -0,0 +1,288 @@
+import os
+import io
+import sys
+import csv
+import mmap
+import zlib
+import struct
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from utils.data_store import USERNAME_COLUMNS, to_usernames
+from utils.user_directory import load_directory
+from utils.schemas import get_schema, read_options, apply_schema
+from utils.instrumentation import record_read, record_write
+from utils.table_lock import table_lock
+
+# Byte-offset indexes for the append-mostly history tables. Next to each data file
+# (e.g. data/comments.csv, data/mood_data/2024-12.csv) a binary sidecar with the same
+# name and an .idx extension lists, for every row, the user id of the table's key
+# column and the row's byte offset and length. read_matching_rows() looks a user up
+# in the sidecar and parses only that user's rows out of a memory-mapped file, instead
+# of scanning the table; read_indexed_records() returns them as stored, without a frame.
+#
+# The sidecar starts with a header: the data file's inode, how many of its bytes are
+# indexed, a checksum of the last indexed bytes and the number of entries. Appends
+# (append_table) extend the index with the new rows only; a file that was rewritten
+# (new inode or different bytes) is re-indexed in full on its next use. Updates hold
+# the data file's table lock (utils/table_lock.py). Indexes are built on first use,
+# and can be checked or rebuilt with
+#   python main.py data verify-offsets | rebuild-offsets
+#   python utils/offset_index.py [verify|rebuild] [data_dir]
+
+# Table file name -> stored key column the index is built on
+INDEXED_TABLES = {
+    "mood_data.csv": "user_id",
+    "patient_journaling.csv": "patient_id",
+    "comments.csv": "mhwp_id",
+    "mental_assessments.csv": "patient_id"
+}
+HEADER = struct.Struct("<qqqq")  # inode, indexed bytes, crc32 of the last CHECK_BYTES indexed bytes, entries
+ENTRY = np.dtype([("user_id", "<i8"), ("offset", "<i8"), ("length", "<i8")])
+CHECK_BYTES = 4096
+# Key of rows whose key column is blank or not a number; never equal to a user id
+MISSING_KEY = np.iinfo("<i8").min
+
+
+def index_path(file_path):
+    """Sidecar of a data file, e.g. data/comments.idx for data/comments.csv."""
+    return f"{os.path.splitext(file_path)[0]}.idx"
+
+
+def _table_name(file_path):
+    """Table of a data file; partitions (e.g. mood_data/2024-12.csv) belong to their directory's table."""
+    name = os.path.basename(file_path)
+    if name in INDEXED_TABLES:
+        return name
+    return os.path.basename(os.path.dirname(file_path)) + ".csv"
+
+
+def index_key(file_path):
+    """Stored key column of an indexed data file, or None if the file is not indexed."""
+    return INDEXED_TABLES.get(_table_name(file_path))
+
+
+def is_indexed(file_path, column):
+    """True if reads of the file filtered on this username column can use the index."""
+    key = index_key(file_path)
+    return key is not None and USERNAME_COLUMNS.get(column) == key
+
+
+def _checksum(data, end):
+    return zlib.crc32(data[max(0, end - CHECK_BYTES):end])
+
+
+def _scan(data, start, end, key_position):
+    """
+    Index the complete rows in data[start:end]. A row ends at a newline outside double quotes,
+    so quoted fields may hold newlines. Returns (entries, end of the last complete row).
+    """
+    entries = []
+    pos = start
+    while pos < end:
+        stop = data.find(b"\n", pos, end)
+        while stop >= 0 and data[pos:stop].count(b'"') % 2:
+            stop = data.find(b"\n", stop + 1, end)  # Newline inside a quoted field
+        if stop < 0:
+            break  # Incomplete last row: indexed once it is finished
+        row = data[pos:stop + 1]
+        if b'"' in row:
+            fields = next(csv.reader([row.decode("utf-8")]), [])
+        else:
+            fields = row.rstrip(b"\r\n").split(b",")
+        try:
+            user_id = int(float(fields[key_position]))
+        except (IndexError, ValueError):
+            user_id = MISSING_KEY
+        entries.append((user_id, pos, stop + 1 - pos))
+        pos = stop + 1
+    return np.array(entries, dtype=ENTRY), pos
+
+
+def _header_end(data, size):
+    """Byte offset just past the header line."""
+    stop = data.find(b"\n", 0, size)
+    return size if stop < 0 else stop + 1
+
+
+def _key_position(data, header_end, key):
+    header = next(csv.reader([data[:header_end].decode("utf-8")]), [])
+    return header.index(key) if key in header else None
+
+
+def _read_header(idx_path):
+    try:
+        with open(idx_path, "rb") as file:
+            return HEADER.unpack(file.read(HEADER.size))
+    except (FileNotFoundError, struct.error):
+        return None
+
+
+def _is_current(header, stat, data):
+    """True if the sidecar describes a prefix of the data file as it is now (only appended to since)."""
+    if header is None:
+        return False
+    inode, indexed, checksum, _ = header
+    return inode == stat.st_ino and indexed <= stat.st_size and _checksum(data, indexed) == checksum
+
+
+def _build(file_path, key):
+    """Index the whole file and write the sidecar atomically. Returns the entries, or None if the key column is missing."""
+    stat = os.stat(file_path)
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = _header_end(data, len(data))
+        key_position = _key_position(data, start, key)
+        if key_position is None:
+            return None
+        entries, indexed = _scan(data, start, len(data), key_position)
+        checksum = _checksum(data, indexed)
+    record_read(file_path, len(entries), stat.st_size)
+    idx_path = index_path(file_path)
+    temp_path = f"{idx_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(stat.st_ino, indexed, checksum, len(entries)))
+        file.write(entries.tobytes())
+    os.replace(temp_path, idx_path)
+    record_write(idx_path, len(entries))
+    return entries
+
+
+def update_offset_index(file_path, rebuild=False):
+    """
+    Bring a data file's index up to date and return its entries (user_id, offset, length), or None
+    if the file is not an indexed table or has no key column. Rows appended since the last update
+    are scanned and added; a rewritten file, or rebuild=True, re-indexes the whole file.
+    """
+    key = index_key(file_path)
+    if key is None:
+        return None
+    # Under the data file's lock: two catch-ups at once would each append the same entries, and a
+    # reader could see a header counting entries not written yet
+    with table_lock(file_path):
+        idx_path = index_path(file_path)
+        header = None if rebuild else _read_header(idx_path)
+        stat = os.stat(file_path)
+        if stat.st_size == 0:
+            return np.empty(0, dtype=ENTRY)
+        with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if not _is_current(header, stat, data):
+                return _build(file_path, key)
+            _, indexed, _, count = header
+            new_entries = np.empty(0, dtype=ENTRY)
+            if indexed < stat.st_size:
+                header_end = _header_end(data, stat.st_size)
+                new_entries, new_indexed = _scan(data, indexed, stat.st_size, _key_position(data, header_end, key))
+                record_read(file_path, len(new_entries), new_indexed - indexed)
+                if len(new_entries):
+                    # Entries first, then the header that counts them: an interrupted update only leaves unused bytes
+                    with open(idx_path, "r+b") as index_file:
+                        index_file.truncate(HEADER.size + count * ENTRY.itemsize)
+                        index_file.seek(0, os.SEEK_END)
+                        index_file.write(new_entries.tobytes())
+                        index_file.seek(0)
+                        index_file.write(HEADER.pack(stat.st_ino, new_indexed, _checksum(data, new_indexed), count + len(new_entries)))
+                    record_write(idx_path, len(new_entries), len(new_entries) * ENTRY.itemsize)
+                    count += len(new_entries)
+        entries = np.fromfile(idx_path, dtype=ENTRY, count=count, offset=HEADER.size)
+        record_read(idx_path, len(entries))
+        return entries
+
+
+def read_indexed_rows(file_path, column, value):
+    """
+    Read the rows of an indexed data file whose username column equals value (see read_table),
+    parsing only those rows. The index is brought up to date first.
+    A username that is not in the directory has no rows: the frame holds only the file's columns.
+    Returns None if the file cannot be indexed.
+    """
+    schema = get_schema(file_path)
+    user_id = load_directory()[1].get(value)
+    entries = update_offset_index(file_path)
+    if entries is None:
+        return None
+    rows = entries[:0] if user_id is None else entries[entries["user_id"] == user_id]
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise pd.errors.EmptyDataError(f"{file_path} is empty")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header = data[:_header_end(data, len(data))]
+            body = b"".join(data[offset:offset + length] for offset, length in zip(rows["offset"], rows["length"]))
+    df = pd.read_csv(io.BytesIO(header + body), dtype=read_options(schema))
+    record_read(file_path, len(df), len(body))
+    return apply_schema(to_usernames(df), schema)
+
+
+def read_indexed_records(file_path, key, user_id):
+    """
+    The rows of an indexed data file whose stored key column (e.g. patient_id) equals user_id, as
+    dicts of the stored strings in file order. For a handful of rows this is much cheaper than
+    read_indexed_rows, as no frame is built. Returns None if the file is not indexed on that column.
+    """
+    if index_key(file_path) != key:
+        return None
+    entries = update_offset_index(file_path)
+    if entries is None:
+        return None
+    rows = entries[entries["user_id"] == int(user_id)]
+    if not len(rows):
+        return []
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = data[:_header_end(data, len(data))]
+        body = b"".join(data[offset:offset + length] for offset, length in zip(rows["offset"], rows["length"]))
+    records = list(csv.DictReader(io.StringIO((header + body).decode("utf-8"), newline='')))
+    record_read(file_path, len(records), len(body))
+    return records
+
+
+def indexed_files(data_dir=DATA_DIR):
+    """Every data file of the indexed tables, including the monthly partitions."""
+    from utils.partitioned_store import table_files
+    return [path for table in INDEXED_TABLES for path in table_files(os.path.join(data_dir, table))]
+
+
+def verify_offset_indexes(data_dir=DATA_DIR):
+    """
+    Compare every index with a fresh scan of its data file.
+    :return: Dict of data file -> "ok", "behind" (rows to add on next use), "missing" or "mismatch"
+    """
+    results = {}
+    for file_path in indexed_files(data_dir):
+        header = _read_header(index_path(file_path))
+        if header is None:
+            results[file_path] = "missing"
+            continue
+        inode, indexed, checksum, count = header
+        stored = np.fromfile(index_path(file_path), dtype=ENTRY, count=count, offset=HEADER.size)
+        stat = os.stat(file_path)
+        expected = None
+        if stat.st_size and inode == stat.st_ino and indexed <= stat.st_size:
+            with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = _header_end(data, len(data))
+                key_position = _key_position(data, start, index_key(file_path))
+                if key_position is not None and checksum == _checksum(data, indexed):
+                    expected, _ = _scan(data, start, indexed, key_position)
+        if expected is None or not np.array_equal(stored, expected):
+            results[file_path] = "mismatch"
+        else:
+            results[file_path] = "behind" if indexed < stat.st_size else "ok"
+    return results
+
+
+def rebuild_offset_indexes(data_dir=DATA_DIR):
+    """Re-index every data file of the indexed tables. :return: Number of files indexed"""
+    files = indexed_files(data_dir)
+    for file_path in files:
+        update_offset_index(file_path, rebuild=True)
+    return len(files)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    directory = sys.argv[2] if len(sys.argv) > 2 else DATA_DIR
+    if command == "rebuild":
+        print(f"Rebuilt the byte-offset indexes of {rebuild_offset_indexes(directory)} files.")
+    else:
+        for path, status in verify_offset_indexes(directory).items():
+            print(f"{os.path.relpath(path, directory)}: {status}")
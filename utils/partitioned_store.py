@@ -0,0 +1,245 @@
+import os
+import re
+import csv
+import pandas as pd
+from datetime import date, datetime
+from utils.data_store import read_table, write_table, append_table, concat_tables, read_matching_rows
+from utils.schemas import get_schema, apply_schema
+from utils.instrumentation import record_read, record_write
+from utils.table_lock import table_lock
+
+# Time-series tables are stored as one file per month of their time column, e.g.
+# data/mood_data/2024-12.csv, plus a manifest (data/mood_data/manifest.csv) with each
+# partition's row count and first and last timestamp. Reads for a time range only open
+# the partitions that overlap it, and appends only touch the partition of the new
+# rows' month. Callers keep passing the table's .csv path (e.g. MOOD_DATA_PATH); a
+# table that utils/migrate_partitions.py has not split yet is read from that file.
+# Rows whose timestamp has no month go to an "undated" partition, which is only read
+# when no range is given.
+
+# Table file name -> time column ("YYYY-MM-DD HH:MM:SS" strings)
+PARTITIONED_TABLES = {"mood_data.csv": "timestamp", "patient_journaling.csv": "timestamp"}
+MANIFEST_COLUMNS = ["partition", "rows", "first", "last"]
+UNDATED = "undated"
+_MONTH = re.compile(r"^\d{4}-\d{2}")
+
+
+def partition_dir(table_path):
+    """Directory holding a table's partitions, e.g. data/mood_data for data/mood_data.csv."""
+    return os.path.splitext(table_path)[0]
+
+
+def _manifest_path(table_path):
+    return os.path.join(partition_dir(table_path), "manifest.csv")
+
+
+def _partition_path(table_path, partition):
+    return os.path.join(partition_dir(table_path), f"{partition}.csv")
+
+
+def _time_column(table_path):
+    return PARTITIONED_TABLES[os.path.basename(table_path)]
+
+
+def is_partitioned(table_path):
+    return os.path.exists(_manifest_path(table_path))
+
+
+def load_manifest(table_path):
+    """Return the table's partitions, oldest first, as dicts with the MANIFEST_COLUMNS."""
+    manifest_path = _manifest_path(table_path)
+    with open(manifest_path, "r", encoding="utf-8", newline='') as file:
+        entries = [{**row, "rows": int(row["rows"])} for row in csv.DictReader(file)]
+    record_read(manifest_path, len(entries))
+    return sorted(entries, key=lambda entry: entry["partition"])
+
+
+def save_manifest(table_path, entries):
+    """Replace the manifest atomically."""
+    manifest_path = _manifest_path(table_path)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        writer.writerows(sorted(entries, key=lambda entry: entry["partition"]))
+    os.replace(temp_path, manifest_path)
+    record_write(manifest_path, len(entries))
+
+
+def _bound(value, end=False):
+    """Turn a range bound (date, datetime or string) into a string comparable with stored timestamps."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        value = value.strftime("%Y-%m-%d")
+    # A bare end date includes the whole day
+    return f"{value} 23:59:59" if end and len(value) == 10 else value
+
+
+def _partition_keys(times):
+    """Partition ("YYYY-MM" or "undated") of each timestamp."""
+    if pd.api.types.is_datetime64_any_dtype(times):
+        times = times.dt.strftime("%Y-%m-%d %H:%M:%S")
+    times = times.astype(str)
+    return times.str[:7].where(times.str.match(_MONTH), UNDATED)
+
+
+def table_files(table_path, start=None, end=None, newest_first=False):
+    """
+    Files holding a table's rows between start and end (inclusive, either may be None):
+    the overlapping partitions, or the single table file if it has not been split.
+    """
+    if not is_partitioned(table_path):
+        return [table_path] if os.path.exists(table_path) else []
+    start, end = _bound(start), _bound(end, end=True)
+    entries = [
+        entry for entry in load_manifest(table_path)
+        if (entry["partition"] == UNDATED and start is None and end is None)
+        or (entry["partition"] != UNDATED and (start is None or entry["last"] >= start)
+            and (end is None or entry["first"] <= end))
+    ]
+    paths = [_partition_path(table_path, entry["partition"]) for entry in entries]
+    return paths[::-1] if newest_first else paths
+
+
+def _in_range(df, column, start, end):
+    start, end = _bound(start), _bound(end, end=True)
+    if start is None and end is None:
+        return df
+    times = df[column].astype(str)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times <= end
+    return df[mask]
+
+
+def read_partitioned(table_path, start=None, end=None, parse_dates=False, **kwargs):
+    """
+    Read a partitioned table (see read_table), keeping only the rows between start and end.
+    Only the partitions overlapping the range are read.
+    :param start: First date or timestamp to include (date, datetime or string), or None
+    :param end: Last date or timestamp to include; a "YYYY-MM-DD" string includes that whole day
+    Raises FileNotFoundError if the table has no rows stored at all.
+    """
+    schema = get_schema(table_path)
+    paths = table_files(table_path, start, end)
+    if not paths:
+        # Nothing in range: return the table's columns without rows
+        paths = table_files(table_path)[:1]
+        if not paths:
+            raise FileNotFoundError(f"No data stored for {os.path.basename(table_path)}")
+        kwargs["nrows"] = 0
+    df = concat_tables([read_table(path, **kwargs) for path in paths], schema)
+    df = _in_range(df, _time_column(table_path), start, end).reset_index(drop=True)
+    return apply_schema(df, schema, parse_dates)
+
+
+def read_user_rows(table_path, column, value, start=None, end=None, parse_dates=False):
+    """
+    Read the rows of a partitioned table whose column (usually a username column) equals value,
+    optionally only between start and end (see read_partitioned). Each partition in range is streamed
+    in chunks, so memory use depends on the user's rows rather than on the table size.
+    Raises FileNotFoundError if the table has no rows stored at all.
+    """
+    schema = get_schema(table_path)
+    paths = table_files(table_path, start, end) or table_files(table_path)[:1]
+    if not paths:
+        raise FileNotFoundError(f"No data stored for {os.path.basename(table_path)}")
+    frames = [read_matching_rows(path, column, value) for path in paths]
+    df = concat_tables([frame for frame in frames if not frame.empty] or frames[:1], schema)
+    df = _in_range(df, _time_column(table_path), start, end).reset_index(drop=True)
+    return apply_schema(df, schema, parse_dates)
+
+
+def read_recent(table_path, column, value, limit):
+    """
+    Return the newest `limit` rows whose column equals value, newest first.
+    Partitions are read from the newest back, stopping once enough rows are found.
+    """
+    time_column = _time_column(table_path)
+    schema = get_schema(table_path)
+    frames, found = [], 0
+    for path in table_files(table_path, newest_first=True):
+        df = read_matching_rows(path, column, value)
+        frames.append(df)
+        found += len(df)
+        if found >= limit:
+            break
+    if not frames:
+        raise FileNotFoundError(f"No data stored for {os.path.basename(table_path)}")
+    df = concat_tables(frames, schema).sort_values(time_column, ascending=False, kind="stable")
+    return apply_schema(df.head(limit).reset_index(drop=True), schema)
+
+
+def append_partitioned(df, table_path):
+    """Append rows to a table, writing only the partitions of their months and the manifest."""
+    # Under the table's lock, so a concurrent append that adds a month can't drop this one's manifest entry
+    with table_lock(table_path):
+        if not is_partitioned(table_path) and os.path.exists(table_path):
+            append_table(df, table_path)  # Not split yet
+            return
+        os.makedirs(partition_dir(table_path), exist_ok=True)
+        entries = {entry["partition"]: entry for entry in load_manifest(table_path)} if is_partitioned(table_path) else {}
+        time_column = _time_column(table_path)
+        for partition, rows in df.groupby(_partition_keys(df[time_column]), sort=True):
+            append_table(rows, _partition_path(table_path, partition))
+            _update_entry(entries, partition, rows[time_column])
+        save_manifest(table_path, entries.values())
+
+
+def _update_entry(entries, partition, times):
+    if partition == UNDATED:
+        first = last = ""
+    else:
+        if pd.api.types.is_datetime64_any_dtype(times):
+            times = times.dt.strftime("%Y-%m-%d %H:%M:%S")
+        first, last = str(times.min()), str(times.max())
+    entry = entries.setdefault(partition, {"partition": partition, "rows": 0, "first": first, "last": last})
+    entry["rows"] += len(times)
+    if partition != UNDATED:
+        entry["first"], entry["last"] = min(entry["first"], first), max(entry["last"], last)
+
+
+def write_partitioned(df, table_path):
+    """Replace a whole table with the rows of df, splitting them by month."""
+    with table_lock(table_path):
+        os.makedirs(partition_dir(table_path), exist_ok=True)
+        old = {entry["partition"] for entry in load_manifest(table_path)} if is_partitioned(table_path) else set()
+        entries = {}
+        time_column = _time_column(table_path)
+        for partition, rows in df.groupby(_partition_keys(df[time_column]), sort=True):
+            write_table(rows, _partition_path(table_path, partition))
+            _update_entry(entries, partition, rows[time_column])
+        save_manifest(table_path, entries.values())
+        for partition in old - set(entries):
+            os.remove(_partition_path(table_path, partition))
+        if os.path.exists(table_path):
+            os.remove(table_path)
+
+
+def split_table(table_path):
+    """
+    Split a single-file table into monthly partitions and remove the file.
+    Rows are copied as stored, in file order. A table without rows is left as it is.
+    :return: Number of partitions written
+    """
+    with table_lock(table_path):
+        df = pd.read_csv(table_path, dtype=str, keep_default_na=False)
+        record_read(table_path, len(df))
+        if df.empty:
+            return 0
+        os.makedirs(partition_dir(table_path), exist_ok=True)
+        entries = {}
+        time_column = _time_column(table_path)
+        for partition, rows in df.groupby(_partition_keys(df[time_column]), sort=True):
+            path = _partition_path(table_path, partition)
+            rows.to_csv(path, index=False)
+            record_write(path, len(rows))
+            _update_entry(entries, partition, rows[time_column])
+        save_manifest(table_path, entries.values())
+        os.remove(table_path)
+        return len(entries)
@@ -0,0 +1,409 @@
+import os
+import csv
+import heapq
+import bisect
+import functools
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+from config import *
+from utils.user_directory import load_directory
+from utils.data_store import to_usernames
+from utils.instrumentation import record_read, record_write
+from utils.table_lock import table_lock
+
+# MHWP schedules are computed, not stored. The schedule's name (SCHEDULE_DATA_PATH,
+# data/mhwp_schedule.csv) has two files next to it:
+#   mhwp_schedule_template.csv    each MHWP's weekly template, one row per weekday;
+#   mhwp_schedule_exceptions.csv  the slots that differ from the template on one date:
+#                                 leave (□), added slots (■), bookings (▲) and
+#                                 confirmed appointments (●).
+# A day's slots are its weekday's template with that day's exceptions applied. The
+# schedule can therefore be read for any dates without the files growing, and a
+# template edit applies at once to every day that has no exception for that slot.
+#
+# The exceptions file is an append-only log, like assignments.csv: the last row for an
+# (MHWP, date, slot) wins, and an empty value means the slot follows the template again.
+# compact_schedule() folds the log and drops past dates; it and the appends hold the
+# log's table lock (utils/table_lock.py). Both files are parsed once per
+# change; single days are looked up through an LRU cache (day_availability).
+# read_schedule() builds a range of days in the layout of the old materialised
+# mhwp_schedule.csv, and write_schedule() records the slots of such a frame that changed.
+# free_slots() walks one MHWP's available slots in time order, for the clinic-wide
+# earliest-slot search (model/admin_management/slot_search.py).
+
+SCHEDULE_HORIZON_DAYS = 28  # Days read from today when no end date is given
+SEARCH_HORIZON_DAYS = 365  # Days free_slots() looks ahead before giving up
+EXCEPTION_COLUMNS = ["mhwp_id", "Date", "slot", "value"]
+CLOSED = "□"  # Slots of days the template does not cover
+
+_template_cache = {}
+_exception_cache = {}
+_exception_day_cache = {}
+
+
+def template_path(schedule_path=SCHEDULE_DATA_PATH):
+    """Weekly templates of a schedule, e.g. data/mhwp_schedule_template.csv."""
+    return f"{os.path.splitext(schedule_path)[0]}_template.csv"
+
+
+def exceptions_path(schedule_path=SCHEDULE_DATA_PATH):
+    """Exceptions log of a schedule, e.g. data/mhwp_schedule_exceptions.csv."""
+    return f"{os.path.splitext(schedule_path)[0]}_exceptions.csv"
+
+
+def schedule_exists(schedule_path=SCHEDULE_DATA_PATH):
+    """True if any MHWP has set up a template or recorded schedule exceptions."""
+    return os.path.exists(template_path(schedule_path)) or os.path.exists(exceptions_path(schedule_path))
+
+
+def _file_signature(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def _to_day(value):
+    """A date, datetime or date string (YYYY/MM/DD or YYYY-MM-DD) as YYYY/MM/DD."""
+    if isinstance(value, str):
+        return value.strip().replace("-", "/")
+    return pd.Timestamp(value).strftime("%Y/%m/%d")
+
+
+def _weekday(day):
+    return datetime.strptime(day, "%Y/%m/%d").weekday()
+
+
+def _slot_column(slot, slots):
+    if slot in slots:
+        return slot
+    return next((column for column in slots if column.split(" ")[0] == slot), None)
+
+
+def load_templates(schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Load the weekly templates as (slot columns, dict of mhwp_id -> {weekday: tuple of glyphs}).
+    The parsed file is cached until it changes.
+    """
+    path = template_path(schedule_path)
+    signature = _file_signature(path)
+    cached = _template_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1], cached[2]
+
+    slots = [f"{hour:02d}:00-{hour + 1:02d}:00 ({i})" for i, hour in enumerate(range(set_start_hour, set_end_hour))]
+    templates = {}
+    if signature:
+        rows_read = 0
+        with open(path, "r", encoding="utf-8", newline='') as file:
+            reader = csv.DictReader(file)
+            slots = [column for column in reader.fieldnames or [] if "(" in column] or slots
+            for row in reader:
+                rows_read += 1
+                try:
+                    mhwp_id, weekday = int(float(row["mhwp_id"])), int(float(row["weekday"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                templates.setdefault(mhwp_id, {})[weekday] = tuple(row.get(slot) or CLOSED for slot in slots)
+        record_read(path, rows_read, signature[1])
+    _template_cache[path] = (signature, slots, templates)
+    return slots, templates
+
+
+def _fold(exceptions, rows):
+    """Apply log rows (mhwp_id, date, slot, value) to parsed exceptions; an empty value clears the slot."""
+    for mhwp_id, day, slot, value in rows:
+        changes = exceptions.setdefault((mhwp_id, day), {})
+        if value:
+            changes[slot] = value
+        else:
+            changes.pop(slot, None)
+            if not changes:
+                del exceptions[(mhwp_id, day)]
+
+
+def load_exceptions(schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Load the exceptions log folded to a dict of (mhwp_id, YYYY/MM/DD) -> {slot column: glyph}.
+    The parsed log is cached until the file changes.
+    """
+    path = exceptions_path(schedule_path)
+    signature = _file_signature(path)
+    cached = _exception_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    exceptions, rows = {}, []
+    if signature:
+        with open(path, "r", encoding="utf-8", newline='') as file:
+            for row in csv.DictReader(file):
+                try:
+                    rows.append((int(float(row["mhwp_id"])), row["Date"], row["slot"], row["value"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        _fold(exceptions, rows)
+        record_read(path, len(rows), signature[1])
+    _exception_cache[path] = (signature, exceptions, len(rows))
+    return exceptions
+
+
+def _append_exceptions(rows, schedule_path):
+    """Append log rows in a single write, creating the file with a header if needed."""
+    path = exceptions_path(schedule_path)
+    with table_lock(path):
+        signature = _file_signature(path)
+        cached = _exception_cache.get(path)
+        size_before = signature[1] if signature else 0
+        new_file = size_before == 0
+        needs_newline = not new_file and not _ends_with_newline(path)
+        with open(path, "a", newline='', encoding="utf-8") as file:
+            if needs_newline:
+                file.write("\n")
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(EXCEPTION_COLUMNS)
+            writer.writerows(rows)
+        record_write(path, len(rows), os.path.getsize(path) - size_before)
+        # Keep the parsed log current instead of reading the file again
+        if cached and cached[0] == signature:
+            _fold(cached[1], rows)
+            _exception_cache[path] = (_file_signature(path), cached[1], cached[2] + len(rows))
+
+
+@functools.lru_cache(maxsize=65536)
+def _day_glyphs(schedule_path, signatures, mhwp_id, day):
+    """Slots of one MHWP day, or None. signatures (of both files) is only part of the cache key."""
+    slots, templates = load_templates(schedule_path)
+    base = templates.get(mhwp_id, {}).get(_weekday(day))
+    changes = load_exceptions(schedule_path).get((mhwp_id, day))
+    if base is None and not changes:
+        return None
+    glyphs = list(base or (CLOSED,) * len(slots))
+    for slot, value in (changes or {}).items():
+        if slot in slots:
+            glyphs[slots.index(slot)] = value
+    return tuple(glyphs)
+
+
+def day_availability(mhwp_username, day, schedule_path=SCHEDULE_DATA_PATH):
+    """
+    One MHWP's slots on one date, from the template and that day's exceptions.
+    :param day: Date or date string (YYYY/MM/DD)
+    :return: Dict of slot column -> glyph, or None if the MHWP has no schedule that day
+    """
+    mhwp_id = load_directory()[1].get(str(mhwp_username))
+    if mhwp_id is None:
+        return None
+    signatures = (_file_signature(template_path(schedule_path)), _file_signature(exceptions_path(schedule_path)))
+    glyphs = _day_glyphs(schedule_path, signatures, mhwp_id, _to_day(day))
+    if glyphs is None:
+        return None
+    return dict(zip(load_templates(schedule_path)[0], glyphs))
+
+
+def slot_column(timeslot, schedule_path=SCHEDULE_DATA_PATH):
+    """Schedule column of a time slot such as "09:00-10:00", or None if there is no such slot."""
+    return _slot_column(timeslot, load_templates(schedule_path)[0])
+
+
+def _exception_days(schedule_path):
+    """Sorted dates with exceptions of each MHWP (mhwp_id -> list of YYYY/MM/DD), rebuilt when the log changes."""
+    exceptions = load_exceptions(schedule_path)
+    path = exceptions_path(schedule_path)
+    signature = _exception_cache[path][0]
+    cached = _exception_day_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    days = {}
+    for mhwp_id, day in exceptions:
+        days.setdefault(mhwp_id, []).append(day)
+    for mhwp_days in days.values():
+        mhwp_days.sort()
+    _exception_day_cache[path] = (signature, days)
+    return days
+
+
+@functools.lru_cache(maxsize=8)
+def _slot_starts(slots):
+    """Start time of each slot column, e.g. 09:00 for "09:00-10:00 (0)"."""
+    return tuple(datetime.strptime(slot.split("-")[0], "%H:%M").time() for slot in slots)
+
+
+def free_slots(mhwp_username, after=None, schedule_path=SCHEDULE_DATA_PATH, max_days=SEARCH_HORIZON_DAYS):
+    """
+    Yield one MHWP's available (■) slots in time order as (start datetime, slot column), from after
+    (default: now) up to max_days ahead. Only the weekdays the template opens and the dates with
+    exceptions are looked at, one day at a time, so stopping early costs nothing.
+    """
+    mhwp_id = load_directory()[1].get(str(mhwp_username))
+    if mhwp_id is None:
+        return
+    after = pd.Timestamp(after if after is not None else datetime.now()).to_pydatetime()
+    slots, templates = load_templates(schedule_path)
+    starts = _slot_starts(tuple(slots))
+    open_weekdays = {weekday for weekday, glyphs in templates.get(mhwp_id, {}).items() if "■" in glyphs}
+    signatures = (_file_signature(template_path(schedule_path)), _file_signature(exceptions_path(schedule_path)))
+
+    first = after.date()
+    last = first + timedelta(days=max_days)
+    exception_days = _exception_days(schedule_path).get(mhwp_id, [])
+    exception_days = (date.fromisoformat(day.replace("/", "-"))
+                      for day in exception_days[bisect.bisect_left(exception_days, first.strftime("%Y/%m/%d")):])
+    template_days = (first + timedelta(days=n) for n in range(max_days + 1)
+                     if (first + timedelta(days=n)).weekday() in open_weekdays) if open_weekdays else ()
+
+    previous = None
+    for day in heapq.merge(template_days, exception_days):
+        if day > last:
+            return
+        if day == previous:
+            continue  # An open weekday that also has exceptions
+        previous = day
+        glyphs = _day_glyphs(schedule_path, signatures, mhwp_id, day.strftime("%Y/%m/%d"))
+        for glyph, slot, start in zip(glyphs or (), slots, starts):
+            if glyph == "■" and datetime.combine(day, start) >= after:
+                yield datetime.combine(day, start), slot
+
+
+def read_schedule(schedule_path=SCHEDULE_DATA_PATH, mhwps=None, start_date=None, end_date=None, parse_dates=False):
+    """
+    Compute the schedule for a range of dates, in the layout of the old mhwp_schedule.csv: one row per
+    MHWP day (mhwp_username, Date, Day and one column per slot) for days with a template or exceptions.
+    :param mhwps: MHWP usernames, or None for every MHWP
+    :param start_date: First date (default: today)
+    :param end_date: Last date (default: SCHEDULE_HORIZON_DAYS days from the first)
+    :param parse_dates: Return Date as datetimes instead of YYYY/MM/DD strings
+    """
+    slots, templates = load_templates(schedule_path)
+    exceptions = load_exceptions(schedule_path)
+    start = pd.Timestamp(_to_day(start_date if start_date is not None else datetime.now().date()).replace("/", "-"))
+    end = (pd.Timestamp(_to_day(end_date).replace("/", "-")) if end_date is not None
+           else start + pd.Timedelta(days=SCHEDULE_HORIZON_DAYS - 1))
+    days = pd.date_range(start, end, freq="D")
+    day_strings = days.strftime("%Y/%m/%d").to_numpy()
+
+    window = {}
+    if len(days):
+        window = {key: changes for key, changes in exceptions.items() if day_strings[0] <= key[1] <= day_strings[-1]}
+    ids = set(templates) | {mhwp_id for mhwp_id, _ in window}
+    if mhwps is not None:
+        username_to_id = load_directory()[1]
+        ids &= {username_to_id[str(name)] for name in mhwps if str(name) in username_to_id}
+    ids = np.array(sorted(ids), dtype=np.int64)
+
+    # Each MHWP's week, expanded to the requested days by weekday
+    week = np.full((len(ids), 7, len(slots)), CLOSED, dtype=object)
+    has_day = np.zeros((len(ids), 7), dtype=bool)
+    for i, mhwp_id in enumerate(ids):
+        for weekday, glyphs in templates.get(mhwp_id, {}).items():
+            if 0 <= weekday < 7:
+                week[i, weekday] = glyphs
+                has_day[i, weekday] = True
+    weekdays = days.weekday.to_numpy()
+    values = week[:, weekdays, :]
+    present = has_day[:, weekdays]
+
+    # Then that window's exceptions
+    positions = {mhwp_id: i for i, mhwp_id in enumerate(ids)}
+    day_positions = {day: d for d, day in enumerate(day_strings)}
+    slot_positions = {slot: s for s, slot in enumerate(slots)}
+    for (mhwp_id, day), changes in window.items():
+        i, d = positions.get(mhwp_id), day_positions.get(day)
+        if i is None or d is None:
+            continue
+        present[i, d] = True
+        for slot, value in changes.items():
+            if slot in slot_positions:
+                values[i, d, slot_positions[slot]] = value
+
+    m, d = np.nonzero(present)
+    df = pd.DataFrame(values[m, d].reshape(len(m), len(slots)), columns=slots).astype(str)
+    df.insert(0, "Day", days.strftime("%A").to_numpy()[d])
+    df.insert(0, "Date", days[d] if parse_dates else day_strings[d])
+    df.insert(0, "mhwp_id", ids[m])
+    return to_usernames(df)
+
+
+def update_slots(changes, schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Set single slots with one append to the exceptions log. A slot set to its template's glyph
+    follows the template again.
+    :param changes: Iterable of (mhwp_username, date, slot column or time such as "09:00-10:00", glyph)
+    :return: Number of slots recorded
+    """
+    slots, templates = load_templates(schedule_path)
+    username_to_id = load_directory()[1]
+    rows = []
+    for mhwp, day, slot, value in changes:
+        mhwp_id, column = username_to_id.get(str(mhwp)), _slot_column(slot, slots)
+        if mhwp_id is None or column is None:
+            continue
+        day = _to_day(day)
+        base = templates.get(mhwp_id, {}).get(_weekday(day))
+        template_glyph = base[slots.index(column)] if base else CLOSED
+        rows.append((mhwp_id, day, column, "" if value == template_glyph else value))
+    if rows:
+        _append_exceptions(rows, schedule_path)
+    return len(rows)
+
+
+def write_schedule(schedule_df, schedule_path=SCHEDULE_DATA_PATH):
+    """
+    Save a schedule frame (see read_schedule) by recording only the slots that differ from the
+    computed schedule. Rows that were not changed cost nothing.
+    :return: Number of slots recorded
+    """
+    slots = [column for column in schedule_df.columns if "(" in column]
+    if schedule_df.empty or not slots:
+        return 0
+    frame = pd.DataFrame({
+        "mhwp_username": schedule_df["mhwp_username"].astype(str).to_numpy(),
+        "Date": schedule_df["Date"].map(_to_day).to_numpy()
+    }).join(schedule_df[slots].astype(str).reset_index(drop=True))
+    current = read_schedule(schedule_path, frame["mhwp_username"].unique(), frame["Date"].min(), frame["Date"].max())
+    current = current.assign(mhwp_username=current["mhwp_username"].astype(str))[["mhwp_username", "Date"] + slots]
+    merged = frame.merge(current, on=["mhwp_username", "Date"], how="left", suffixes=("", " current"))
+
+    changes = []
+    for slot in slots:
+        changed = merged[slot] != merged[f"{slot} current"].fillna(CLOSED)
+        rows = merged.loc[changed]
+        changes.extend(zip(rows["mhwp_username"], rows["Date"], [slot] * len(rows), rows[slot]))
+    return update_slots(changes, schedule_path)
+
+
+def compact_schedule(schedule_path=SCHEDULE_DATA_PATH, today=None):
+    """
+    Rewrite the exceptions log with one row per exception, dropping dates before today.
+    The file is left alone if there is nothing to drop.
+    :return: Number of rows kept
+    """
+    path = exceptions_path(schedule_path)
+    if not os.path.exists(path):
+        return 0
+    today = _to_day(today or datetime.now().date())
+    # Folded under the log's lock, so a slot appended while the rewrite is built is not lost
+    with table_lock(path):
+        exceptions = load_exceptions(schedule_path)
+        kept = {key: changes for key, changes in exceptions.items() if key[1] >= today}
+        rows = sorted((mhwp_id, day, slot, value) for (mhwp_id, day), changes in kept.items()
+                      for slot, value in changes.items())
+        if len(rows) == _exception_cache[path][2]:
+            return len(rows)  # Already one row per exception, none of them past
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", newline='', encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(EXCEPTION_COLUMNS)
+            writer.writerows(rows)
+        os.replace(temp_path, path)
+        record_write(path, len(rows))
+        _exception_cache[path] = (_file_signature(path), kept, len(rows))
+    return len(rows)
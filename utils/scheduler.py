@@ -0,0 +1,165 @@
+import os
+import time
+import heapq
+import random
+import threading
+from config import LOCK_DIR
+from utils.instrumentation import instrument
+
+# In-process scheduler for periodic maintenance jobs. Jobs are kept in a heap ordered
+# by their next run time and run one at a time on a daemon thread, so the menus never
+# wait for them. Each run:
+#   - is delayed by a random jitter, so several running copies of the program don't
+#     all hit the data files at the same moment;
+#   - takes a lock file in LOCK_DIR, so only one process runs a job at a time (a copy
+#     that finds the lock taken skips that run);
+#   - is timed, and the result is kept in the job's metrics (see get_job_stats).
+
+JOB_FIELDS = ["runs", "failures", "skipped", "total_seconds", "last_seconds", "last_started", "last_error"]
+
+_jobs = {}
+_job_stats = {}
+_heap = []
+_heap_lock = threading.Lock()
+_wakeup = threading.Event()
+_stopping = threading.Event()
+_thread = None
+
+
+def register_job(name, func, interval, jitter=0.1, stale_lock_after=None):
+    """
+    Register a periodic job.
+    :param func: Function called with no arguments
+    :param interval: Seconds between runs
+    :param jitter: Fraction of the interval by which each run is randomly delayed
+    :param stale_lock_after: Seconds after which another process's lock is considered abandoned (default: interval)
+    """
+    _jobs[name] = {
+        "func": instrument(func, name=f"job:{name}"),
+        "interval": interval,
+        "jitter": jitter,
+        "stale_lock_after": stale_lock_after or interval
+    }
+    _job_stats.setdefault(name, {**dict.fromkeys(JOB_FIELDS, 0), "last_started": None, "last_error": None})
+    if _thread and _thread.is_alive():
+        _schedule(name, time.time())
+
+
+def get_jobs():
+    """Return the registered jobs: name -> {"interval", "jitter"}."""
+    return {name: {"interval": job["interval"], "jitter": job["jitter"]} for name, job in _jobs.items()}
+
+
+def get_job_stats():
+    """Return a copy of the run-time metrics of every registered job."""
+    return {name: dict(stats) for name, stats in _job_stats.items()}
+
+
+def _schedule(name, after):
+    job = _jobs[name]
+    delay = random.uniform(0, job["interval"] * job["jitter"])
+    with _heap_lock:
+        heapq.heappush(_heap, (after + delay, name))
+    _wakeup.set()
+
+
+def _lock_path(name):
+    return os.path.join(LOCK_DIR, f"{name}.lock")
+
+
+def _acquire_lock(name, stale_after):
+    """Create the job's lock file. Returns False if another process holds it."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    path = _lock_path(name)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < stale_after:
+                    return False
+                os.remove(path)  # Left behind by a process that died mid-run
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as file:
+            file.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _release_lock(name):
+    try:
+        os.remove(_lock_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def run_job(name):
+    """
+    Run a registered job now, under its lock, and update its metrics.
+    :return: True if the job ran successfully, False if it failed or another process was running it
+    """
+    job, stats = _jobs[name], _job_stats[name]
+    if not _acquire_lock(name, job["stale_lock_after"]):
+        stats["skipped"] += 1
+        return False
+    stats["last_started"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    start = time.perf_counter()
+    try:
+        job["func"]()
+        stats["last_error"] = None
+        return True
+    except Exception as e:
+        stats["failures"] += 1
+        stats["last_error"] = f"{type(e).__name__}: {e}"
+        return False
+    finally:
+        elapsed = time.perf_counter() - start
+        stats["runs"] += 1
+        stats["last_seconds"] = elapsed
+        stats["total_seconds"] += elapsed
+        _release_lock(name)
+
+
+def _run_loop():
+    while not _stopping.is_set():
+        # Cleared before looking at the heap, so a job scheduled meanwhile still wakes the wait below
+        _wakeup.clear()
+        with _heap_lock:
+            due_at, name = _heap[0] if _heap else (None, None)
+            if due_at is not None and due_at <= time.time():
+                heapq.heappop(_heap)
+            else:
+                name = None
+        if name is None:
+            _wakeup.wait(None if due_at is None else max(due_at - time.time(), 0))
+            continue
+        run_job(name)
+        _schedule(name, time.time() + _jobs[name]["interval"])
+
+
+def start_scheduler(run_now=False):
+    """
+    Start running the registered jobs on a background thread.
+    :param run_now: Run every job (after its jitter) right away instead of one interval from now
+    """
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stopping.clear()
+    now = time.time()
+    with _heap_lock:
+        _heap.clear()
+    for name, job in _jobs.items():
+        _schedule(name, now if run_now else now + job["interval"])
+    _thread = threading.Thread(target=_run_loop, name="breeze-scheduler", daemon=True)
+    _thread.start()
+
+
+def stop_scheduler(timeout=5):
+    """Stop the background thread, waiting for a running job to finish."""
+    _stopping.set()
+    _wakeup.set()
+    if _thread:
+        _thread.join(timeout)
@@ -0,0 +1,125 @@
+import os
+import pandas as pd
+
+# Column types of each data file, applied by utils/data_store.py when a table is read:
+#   "dtypes": columns read with a fixed type instead of letting pandas infer one
+#             (e.g. free text stays text even when every value is empty or numeric);
+#   "categories": columns read as pandas Categoricals. The listed values are always
+#                 categories (so e.g. status can be set to "completed" on any frame);
+#                 other values found in the file are kept as extra categories;
+#   "dates": date and time columns with their stored format. They stay strings unless
+#            the caller asks read_table for parse_dates=True, and datetime columns are
+#            written back in this format.
+# Tables are keyed by file name, so the schemas apply to generated datasets too.
+
+APPOINTMENT_STATUSES = ["pending", "confirmed", "completed", "cancelled"]
+ACCOUNT_STATUSES = ["active", "inactive"]
+ROLES = ["patient", "mhwp", "admin"]
+MOOD_COLORS = ["Green", "Blue", "Yellow", "Orange", "Red"]
+MAJORS = ["Emotional Management", "Behavioral Therapy", "Severe Disorders", "General Wellbeing"]
+SYMPTOMS = ["Anxiety", "Depression", "PTSD", "Bipolar Disorder", "OCD", "ADHD", "Eating Disorder",
+            "Substance Abuse", "Schizophrenia", "Borderline Personality Disorder", "Other/General Wellbeing"]
+NOTE_CONDITIONS = ["Anxiety", "Depression", "Autism", "Stress"]
+
+DATE_FORMAT = "%Y/%m/%d"
+ISO_DATE_FORMAT = "%Y-%m-%d"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+TABLE_SCHEMAS = {
+    "user_data.csv": {
+        "dtypes": {"password": "str", "email": "str", "emergency_email": "str"},
+        "categories": {"role": ROLES}
+    },
+    "patients.csv": {
+        "categories": {"account_status": ACCOUNT_STATUSES, "symptoms": SYMPTOMS},
+        "dates": {"registration_date": ISO_DATE_FORMAT}
+    },
+    "mhwp.csv": {
+        "categories": {"account_status": ACCOUNT_STATUSES, "major": MAJORS},
+        "dates": {"registration_date": ISO_DATE_FORMAT}
+    },
+    "appointments.csv": {
+        "dtypes": {"timeslot": "str"},
+        "categories": {"status": APPOINTMENT_STATUSES},
+        "dates": {"date": DATE_FORMAT}
+    },
+    # Archive segments (see utils/appointment_archive.py) hold appointments rows
+    "appointments_archive.csv": {
+        "dtypes": {"timeslot": "str"},
+        "categories": {"status": APPOINTMENT_STATUSES},
+        "dates": {"date": DATE_FORMAT}
+    },
+    "completed_appointments.csv": {
+        "dtypes": {"timeslot": "str", "commented": "bool", "recorded": "bool"},
+        "dates": {"date": DATE_FORMAT}
+    },
+    # Generated schedules of older data directories, read once by utils/migrate_schedule.py
+    "mhwp_schedule.csv": {
+        "dtypes": {"Day": "str"},
+        "dates": {"Date": DATE_FORMAT}
+    },
+    "mood_data.csv": {
+        "categories": {"color_code": MOOD_COLORS},
+        "dates": {"timestamp": TIMESTAMP_FORMAT}
+    },
+    "patient_journaling.csv": {
+        "dtypes": {"entry": "str"},
+        "dates": {"timestamp": TIMESTAMP_FORMAT}
+    },
+    "mental_assessments.csv": {
+        "categories": {"status": []},
+        "dates": {"date": ISO_DATE_FORMAT}
+    },
+    "patient_notes.csv": {
+        "dtypes": {"notes": "str"},
+        "categories": {"condition": NOTE_CONDITIONS},
+        "dates": {"date": ISO_DATE_FORMAT}
+    },
+    "comments.csv": {
+        "dtypes": {"rating": "float64", "comment": "str"},
+        "dates": {"timestamp": TIMESTAMP_FORMAT, "appointment_datetime": TIMESTAMP_FORMAT}
+    }
+}
+
+
+def get_schema(file_path):
+    """Return the schema of a data file, or an empty schema for files without one."""
+    schema = TABLE_SCHEMAS.get(os.path.basename(file_path))
+    if schema is None:
+        # Partitions (e.g. mood_data/2024-12.csv, see utils/partitioned_store.py) use their table's schema
+        schema = TABLE_SCHEMAS.get(os.path.basename(os.path.dirname(file_path)) + ".csv", {})
+    return schema
+
+
+def read_options(schema, usecols=None):
+    """Return the dtype argument for pd.read_csv: fixed dtypes plus "category" for categorical columns."""
+    dtypes = {**schema.get("dtypes", {}), **dict.fromkeys(schema.get("categories", {}), "category")}
+    if usecols is not None and not callable(usecols):
+        dtypes = {column: dtype for column, dtype in dtypes.items() if column in usecols}
+    return dtypes
+
+
+def apply_schema(df, schema, parse_dates=False):
+    """Add the declared categories to categorical columns and optionally parse the date columns."""
+    for column, categories in schema.get("categories", {}).items():
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            missing = [value for value in categories if value not in df[column].cat.categories]
+            if missing:
+                df[column] = df[column].cat.add_categories(missing)
+    if parse_dates:
+        for column, date_format in schema.get("dates", {}).items():
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format=date_format, errors="coerce")
+    return df
+
+
+def format_dates(df, schema):
+    """Return the frame with its datetime columns formatted as stored strings."""
+    columns = [column for column in schema.get("dates", {})
+               if column in df.columns and pd.api.types.is_datetime64_any_dtype(df[column])]
+    if not columns:
+        return df
+    df = df.copy()
+    for column in columns:
+        df[column] = df[column].dt.strftime(schema["dates"][column])
+    return df
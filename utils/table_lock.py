@@ -0,0 +1,83 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Per-table write locks. Foreground appends and the background rewrites of the same
+# data file (log compaction, the completion sweep, archival) run at the same time:
+# the UI on the main thread, the maintenance jobs on the scheduler thread (see
+# utils/scheduler.py) or in another copy of the program. A rewrite reads the file,
+# builds the new contents and replaces the file; an append that lands in between is
+# lost. Both therefore hold the table's lock, and a rewrite re-reads the file under
+# the lock before replacing it.
+#
+# The lock is a file next to the table (e.g. data/appointments.csv.lock), created
+# with O_EXCL so it also works between processes. Within a process it is reentrant,
+# so a locked section can call functions that take the same lock. A lock file older
+# than STALE_SECONDS was left by a process that died and is taken over.
+
+LOCK_TIMEOUT = 30  # Seconds to wait for a table lock before giving up
+STALE_SECONDS = 120
+POLL_SECONDS = 0.01
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def lock_path(file_path):
+    """Lock file of a table, e.g. data/appointments.csv.lock."""
+    return f"{file_path}.lock"
+
+
+def _local_lock(path):
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = {"lock": threading.RLock(), "depth": 0}
+        return _locks[path]
+
+
+def _acquire_file(path, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, "w") as file:
+                file.write(str(os.getpid()))
+            return
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > STALE_SECONDS:
+                    os.remove(path)  # Left behind by a process that died while holding it
+                    continue
+            except FileNotFoundError:
+                continue
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"{path} is held by another process")
+        time.sleep(POLL_SECONDS)
+
+
+@contextmanager
+def table_lock(file_path, timeout=LOCK_TIMEOUT):
+    """
+    Hold a table's write lock for the duration of a with block.
+    Raises TimeoutError if another process holds it for longer than timeout seconds.
+    """
+    path = lock_path(os.path.abspath(file_path))
+    local = _local_lock(path)
+    if not local["lock"].acquire(timeout=timeout):
+        raise TimeoutError(f"{path} is held by another thread")
+    try:
+        if local["depth"] == 0:
+            _acquire_file(path, timeout)
+        local["depth"] += 1
+        try:
+            yield
+        finally:
+            local["depth"] -= 1
+            if local["depth"] == 0:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    finally:
+        local["lock"].release()
@@ -0,0 +1,119 @@
+import os
+import csv
+import numpy as np
+import pandas as pd
+from config import USER_DATA_PATH
+from utils.instrumentation import record_read, record_write
+
+# user_data.csv is the user directory. Every other table refers to users by their
+# immutable integer user_id; the username is an ordinary attribute of the user's
+# row here, so renaming a user only changes that one row.
+_directory_cache = {}
+_categories_cache = {}
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_user_id(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_directory(user_data_path=USER_DATA_PATH):
+    """
+    Load the user directory as two dicts: user_id -> username and username -> user_id.
+    The parsed directory is cached until the file changes.
+    """
+    if not os.path.exists(user_data_path):
+        return {}, {}
+
+    signature = _file_signature(user_data_path)
+    cached = _directory_cache.get(user_data_path)
+    if cached and cached[0] == signature:
+        return cached[1], cached[2]
+
+    id_to_username, username_to_id = {}, {}
+    with open(user_data_path, "r", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            user_id = _parse_user_id(row.get("user_id"))
+            username = (row.get("username") or "").strip()
+            if user_id is None or not username:
+                continue
+            id_to_username[user_id] = username
+            username_to_id[username] = user_id
+
+    _directory_cache[user_data_path] = (signature, id_to_username, username_to_id)
+    record_read(user_data_path, len(id_to_username), signature[1])
+    return id_to_username, username_to_id
+
+
+def load_username_categories(user_data_path=USER_DATA_PATH):
+    """
+    Return the username categorical dtype shared by every table, and an array mapping
+    user_id -> category code (-1 for ids not in the directory).
+    Username columns read through read_table all use this dtype, so filters such as
+    df["patient_username"] == name compare integer codes instead of strings.
+    Categories are sorted, so sorting by a username column is still alphabetical.
+    """
+    id_to_username = load_directory(user_data_path)[0]
+    cached = _categories_cache.get(user_data_path)
+    if cached and cached[0] is id_to_username:
+        return cached[1], cached[2]
+
+    usernames = sorted(id_to_username.values())
+    code_of = {username: code for code, username in enumerate(usernames)}
+    codes_by_id = np.full(max(id_to_username, default=-1) + 1, -1, dtype=np.int32)
+    for user_id, username in id_to_username.items():
+        codes_by_id[user_id] = code_of[username]
+    dtype = pd.CategoricalDtype(usernames)
+    _categories_cache[user_data_path] = (id_to_username, dtype, codes_by_id)
+    return dtype, codes_by_id
+
+
+def get_user_id(username, user_data_path=USER_DATA_PATH):
+    """Return the user_id of a username, or None."""
+    return load_directory(user_data_path)[1].get(username)
+
+
+def get_username(user_id, user_data_path=USER_DATA_PATH):
+    """Return the current username of a user_id, or None."""
+    return load_directory(user_data_path)[0].get(_parse_user_id(user_id))
+
+
+def assign_user_ids(user_df):
+    """
+    Give every row of a user directory frame without a user_id the next free id.
+    :return: The frame with an integer user_id as its first column
+    """
+    user_df = user_df.copy()
+    if "user_id" not in user_df.columns:
+        user_df.insert(0, "user_id", pd.NA)
+    ids = pd.to_numeric(user_df["user_id"], errors="coerce")
+    missing = ids.isna()
+    if missing.any():
+        next_id = int(ids.max()) + 1 if ids.notna().any() else 1
+        ids[missing] = range(next_id, next_id + int(missing.sum()))
+    user_df["user_id"] = ids.astype("int64")
+    return user_df[["user_id"] + [col for col in user_df.columns if col != "user_id"]]
+
+
+def rename_user(old_username, new_username, user_data_path=USER_DATA_PATH):
+    """
+    Rename a user. Only the user's own row in the directory changes.
+    :return: True if renamed, False if the old name is unknown or the new name is taken
+    """
+    user_df = pd.read_csv(user_data_path)
+    record_read(user_data_path, len(user_df))
+    if new_username in user_df["username"].values or old_username not in user_df["username"].values:
+        return False
+    user_df.loc[user_df["username"] == old_username, "username"] = new_username
+    temp_path = f"{user_data_path}.tmp"
+    user_df.to_csv(temp_path, index=False, na_rep='')
+    os.replace(temp_path, user_data_path)
+    record_write(user_data_path, len(user_df))
+    return True